@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Callable, List, Optional, Sequence, Union
+
+import structlog
+
+from receipt_reader.types import Invoice
+
+from .metrics import batch_size, batch_wait_seconds
+
+log = structlog.get_logger()
+
+# An upload's path on disk, or its bytes when it was kept in memory
+Source = Union[str, bytes]
+BatchParser = Callable[[Sequence[Source]], List[Invoice]]
+
+
+@dataclass
+class _Pending:
+    source: Source
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=perf_counter)
+
+
+class BatchingEngine:
+    """
+    Collects concurrently submitted parse requests into micro-batches.
+
+    Each of ``dispatchers`` threads takes the first pending request, then keeps
+    collecting until either ``max_batch_size`` requests are pending or
+    ``max_wait_ms`` have passed, and hands the whole batch to ``parse_batch``.
+    With several dispatchers, one collects the next batch while the others
+    wait on theirs, so ``parse_batch`` runs up to ``dispatchers`` batches at once.
+    """
+
+    def __init__(
+        self, parse_batch: BatchParser, *, max_batch_size: int, max_wait_ms: float, dispatchers: int = 1
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if dispatchers < 1:
+            raise ValueError("dispatchers must be at least 1")
+        self._parse_batch = parse_batch
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait_ms / 1000
+        self._dispatchers = dispatchers
+        self._queue: Queue[Optional[_Pending]] = Queue()
+        self._threads: List[Thread] = []
+        self._lock = Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if not self._threads:
+                for index in range(self._dispatchers):
+                    thread = Thread(target=self._run, name=f"batching-engine-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def stop(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+        # One sentinel per dispatcher; each stops after taking one
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def submit(self, source: Source) -> Future:
+        self.start()
+        pending = _Pending(source)
+        self._queue.put(pending)
+        return pending.future
+
+    def parse(self, source: Source) -> Invoice:
+        return self.submit(source).result()
+
+    def _collect(self, first: _Pending) -> List[_Pending]:
+        batch = [first]
+        deadline = first.enqueued_at + self._max_wait
+        while len(batch) < self._max_batch_size:
+            timeout = deadline - perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=timeout)
+            except Empty:
+                break
+            if pending is None:
+                # Re-queue the sentinel so the run loop stops after this batch
+                self._queue.put(None)
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            batch_size.observe(len(batch))
+            batch_wait_seconds.observe(perf_counter() - first.enqueued_at)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        try:
+            invoices = self._parse_batch([pending.source for pending in batch])
+        except Exception as exc:
+            if len(batch) > 1:
+                # Retry one by one so a single unreadable image does not fail its batch mates
+                log.warning("batch_failed", batch_size=len(batch), error=str(exc))
+                for pending in batch:
+                    self._dispatch([pending])
+                return
+            batch[0].future.set_exception(exc)
+            return
+        for pending, invoice in zip(batch, invoices):
+            pending.future.set_result(invoice)
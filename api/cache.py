@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+from receipt_reader.types import Invoice
+
+
+class ResultCache:
+    """
+    Content-addressed cache of parse results.
+
+    Entries are keyed by the upload's content hash plus the model version, so
+    a model upgrade never serves stale results. The in-memory tier is an LRU of
+    ``max_entries`` invoices; the optional disk tier keeps serialized invoices
+    in ``disk_dir`` and evicts the least recently used files once their total
+    size exceeds ``disk_max_bytes``.
+    """
+
+    def __init__(
+        self,
+        *,
+        model_version: str,
+        max_entries: int,
+        disk_dir: Optional[Path] = None,
+        disk_max_bytes: int = 0,
+    ) -> None:
+        self._model_version = model_version
+        self._max_entries = max_entries
+        self._memory: OrderedDict[str, Invoice] = OrderedDict()
+        self._disk_dir = disk_dir
+        self._disk_max_bytes = disk_max_bytes
+        self._disk_sizes: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = Lock()
+        if disk_dir is not None:
+            disk_dir.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def key(self, content_hash: str) -> str:
+        return f"{self._model_version}-{content_hash}"
+
+    def get(self, key: str) -> Optional[Invoice]:
+        with self._lock:
+            invoice = self._memory.get(key)
+            if invoice is not None:
+                self._memory.move_to_end(key)
+                return invoice
+            invoice = self._read_disk(key)
+            if invoice is not None:
+                self._put_memory(key, invoice)
+            return invoice
+
+    def put(self, key: str, invoice: Invoice) -> None:
+        with self._lock:
+            self._put_memory(key, invoice)
+            self._write_disk(key, invoice)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            for key in list(self._disk_sizes):
+                self._evict_disk(key)
+
+    def _put_memory(self, key: str, invoice: Invoice) -> None:
+        if self._max_entries <= 0:
+            return
+        self._memory[key] = invoice
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key: str) -> Path:
+        assert self._disk_dir is not None
+        return self._disk_dir / f"{key}.json"
+
+    def _load_disk_index(self) -> None:
+        files = sorted(self._disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            self._disk_sizes[path.stem] = path.stat().st_size
+            self._disk_bytes += self._disk_sizes[path.stem]
+
+    def _read_disk(self, key: str) -> Optional[Invoice]:
+        if self._disk_dir is None or key not in self._disk_sizes:
+            return None
+        try:
+            invoice = Invoice.parse_raw(self._disk_path(key).read_bytes())
+        except (OSError, ValueError):
+            self._evict_disk(key)
+            return None
+        self._disk_sizes.move_to_end(key)
+        self._disk_path(key).touch()
+        return invoice
+
+    def _write_disk(self, key: str, invoice: Invoice) -> None:
+        if self._disk_dir is None or self._disk_max_bytes <= 0:
+            return
+        data = invoice.json().encode()
+        self._disk_path(key).write_bytes(data)
+        self._disk_bytes += len(data) - self._disk_sizes.get(key, 0)
+        self._disk_sizes[key] = len(data)
+        self._disk_sizes.move_to_end(key)
+        while self._disk_bytes > self._disk_max_bytes and len(self._disk_sizes) > 1:
+            self._evict_disk(next(iter(self._disk_sizes)))
+
+    def _evict_disk(self, key: str) -> None:
+        self._disk_bytes -= self._disk_sizes.pop(key, 0)
+        self._disk_path(key).unlink(missing_ok=True)
+
+
+class SingleFlight:
+    """
+    Tracks in-flight parses by cache key so identical uploads share one inference.
+
+    The first job for a key becomes the leader; later jobs for the same key are
+    recorded as followers and resolved with the leader's outcome.
+    """
+
+    def __init__(self) -> None:
+        self._followers: Dict[str, List[str]] = {}
+        self._lock = Lock()
+
+    def join(self, key: str, job_id: str) -> bool:
+        """Registers ``job_id`` for ``key`` and returns True if it is the leader."""
+        with self._lock:
+            followers = self._followers.get(key)
+            if followers is None:
+                self._followers[key] = []
+                return True
+            followers.append(job_id)
+            return False
+
+    def release(self, key: str) -> List[str]:
+        """Ends the flight for ``key`` and returns the ids of its followers."""
+        with self._lock:
+            return self._followers.pop(key, [])
+
+    def reset(self) -> None:
+        with self._lock:
+            self._followers.clear()
@@ -9,5 +9,81 @@ MAX_FILE_SIZE = MAX_FILE_SIZE_BYTES  # Alias for compatibility
 ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/jpg", "image/tiff"}
 RATE_LIMIT = os.environ.get("RATE_LIMIT", "15/minute")
 
+# Inference backend ("torch" or "onnx"); ONNX graphs are exported once into ONNX_MODEL_DIR
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", str(UPLOADS_DIR.parent / "receipt-parser-onnx"))
+# When set, the torch backend keeps its weights here as safetensors and memory-maps them, so
+# worker processes on a host share one copy; unset, every process reads its own copy
+TORCH_WEIGHTS_DIR = os.getenv("TORCH_WEIGHTS_DIR") or None
+
+# Decoding budget and early stopping
+DECODE_MAX_NEW_TOKENS = int(os.getenv("DECODE_MAX_NEW_TOKENS", 512))
+DECODE_REPETITION_MAX_NGRAM = int(os.getenv("DECODE_REPETITION_MAX_NGRAM", 8))
+DECODE_REPETITION_MIN_REPEATS = int(os.getenv("DECODE_REPETITION_MIN_REPEATS", 4))
+
+# Interval of keep-alive comments on idle Server-Sent Event streams
+EVENT_STREAM_HEARTBEAT_SECONDS = float(os.getenv("EVENT_STREAM_HEARTBEAT_SECONDS", 15))
+
+# POST /receipts?sync=true: how long to wait for the result before answering 202, and how
+# many sync requests may wait at once before further ones are answered 202 straight away
+SYNC_TIMEOUT_SECONDS = float(os.getenv("SYNC_TIMEOUT_SECONDS", 10))
+SYNC_MAX_WAITERS = int(os.getenv("SYNC_MAX_WAITERS", 32))
+
+# Upper bound of the ?wait= long-poll timeout on GET /receipts/{job_id}
+LONG_POLL_MAX_SECONDS = float(os.getenv("LONG_POLL_MAX_SECONDS", 60))
+# How often a waiting long poll re-reads the job from a job store shared between processes
+# (sqlite), to notice jobs finished by another process; this one is only notified of its own.
+# 0 disables it. Process-local stores are never re-read.
+LONG_POLL_RECHECK_SECONDS = float(os.getenv("LONG_POLL_RECHECK_SECONDS", 1))
+
+# Load and warm up the model at startup; /health/ready reports 503 until done
+MODEL_EAGER_LOAD = os.getenv("MODEL_EAGER_LOAD", "false").lower() in ("1", "true", "yes")
+
+# Inference batching settings (a max batch size of 1 disables micro-batching)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 1))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 20))
+
+# Batch uploads (POST /receipts/batch): files per request, receipts per inference chunk,
+# and how long a request waits for queue space before failing the remaining receipts
+BATCH_UPLOAD_RATE_LIMIT = os.environ.get("BATCH_UPLOAD_RATE_LIMIT", "5/minute")
+BATCH_UPLOAD_MAX_FILES = int(os.getenv("BATCH_UPLOAD_MAX_FILES", 500))
+BATCH_UPLOAD_CHUNK_SIZE = int(os.getenv("BATCH_UPLOAD_CHUNK_SIZE", 8))
+BATCH_UPLOAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BATCH_UPLOAD_QUEUE_TIMEOUT_SECONDS", 30))
+
+# Job executor settings
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+INFERENCE_WORKER_MODE = os.getenv("INFERENCE_WORKER_MODE", "thread")  # "thread" or "process"
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 64))
+# Batch uploads queue in a separate, lower-priority lane with its own capacity
+BATCH_JOB_QUEUE_SIZE = int(os.getenv("BATCH_JOB_QUEUE_SIZE", 64))
+# Jobs are shared fairly between tenants (the "tenant" field of the upload metadata);
+# TENANT_WEIGHTS gives some tenants a larger share, e.g. "acme=2,globex=0.5"
+TENANT_WEIGHTS = os.getenv("TENANT_WEIGHTS", "")
+
+# estimated_seconds and Retry-After come from a moving average of parse times;
+# the initial value is used until the first job finishes
+ESTIMATE_INITIAL_SECONDS = float(os.getenv("ESTIMATE_INITIAL_SECONDS", 5))
+ESTIMATE_EWMA_ALPHA = float(os.getenv("ESTIMATE_EWMA_ALPHA", 0.2))
+
+# Uploads up to this size are parsed straight from memory (0 writes every upload to disk);
+# once this many jobs are queued, new uploads are spilled to disk regardless of size
+UPLOAD_MEMORY_THRESHOLD_BYTES = int(os.getenv("UPLOAD_MEMORY_THRESHOLD_BYTES", 0))
+UPLOAD_SPILL_QUEUE_DEPTH = int(os.getenv("UPLOAD_SPILL_QUEUE_DEPTH", 16))
+
+# Job store settings ("memory" or "sqlite")
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory")
+JOB_STORE_PATH = Path(os.getenv("JOB_STORE_PATH", str(UPLOADS_DIR / "jobs.sqlite3")))
+
+# Job retention settings (0 disables a limit)
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", 3600))
+JOB_MAX_COUNT = int(os.getenv("JOB_MAX_COUNT", 10_000))
+JOB_MAX_BYTES = int(os.getenv("JOB_MAX_BYTES", 256 * 1024 * 1024))  # 256 MB
+JOB_REAP_INTERVAL_SECONDS = float(os.getenv("JOB_REAP_INTERVAL_SECONDS", 30))
+
+# Result cache settings (the disk tier is only enabled when RESULT_CACHE_DIR is set)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_DIR = Path(os.environ["RESULT_CACHE_DIR"]) if os.getenv("RESULT_CACHE_DIR") else None
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 100 * 1024 * 1024))  # 100 MB
+
 # Create the uploads directory if it doesn't exist
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
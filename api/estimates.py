@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import math
+from threading import Lock
+
+
+class ThroughputEstimator:
+    """
+    Estimates how long new jobs take from the parse times of recent ones.
+
+    Parse durations feed an exponentially weighted moving average, so the
+    estimate follows changes in load or receipt size within a few jobs. Until
+    the first job finishes, ``initial_seconds`` is used.
+    """
+
+    def __init__(self, *, alpha: float = 0.2, initial_seconds: float = 5.0) -> None:
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self._alpha = alpha
+        self._seconds_per_job = initial_seconds
+        self._lock = Lock()
+
+    def observe(self, duration: float) -> None:
+        """Records the parse time of one job."""
+        if duration <= 0:
+            # Cache hits and coalesced jobs did no inference and would skew the average
+            return
+        with self._lock:
+            self._seconds_per_job += self._alpha * (duration - self._seconds_per_job)
+
+    def seconds_per_job(self) -> float:
+        with self._lock:
+            return self._seconds_per_job
+
+    def estimate(self, jobs_ahead: int, workers: int) -> int:
+        """
+        Seconds until a job finishes when ``jobs_ahead`` jobs are queued or
+        running before it: they drain across ``workers``, then the job itself runs.
+        """
+        per_job = self.seconds_per_job()
+        return math.ceil(per_job * (1 + max(jobs_ahead, 0) / max(workers, 1)))
+
+    def retry_after(self, workers: int) -> int:
+        """Seconds until a worker is likely to free a queue slot."""
+        return max(1, math.ceil(self.seconds_per_job() / max(workers, 1)))
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import AsyncIterator, Dict, Optional, Set
+
+from .jobs import TERMINAL_STATUSES, JobEvent
+from .metrics import event_subscribers, long_poll_waiters
+
+# Order of job statuses, used to drop events older than what a subscriber has seen
+STATUS_ORDER = {"queued": 0, "processing": 1, "completed": 2, "failed": 2}
+
+
+@dataclass(eq=False)
+class Subscription:
+    """Events for one job or one group, delivered on the subscriber's event loop."""
+
+    job_id: Optional[str]
+    group_id: Optional[str]
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
+@dataclass(eq=False)
+class _FinishWatch:
+    """One asyncio event per job and loop, shared by all requests waiting on that job."""
+
+    event: asyncio.Event = field(default_factory=asyncio.Event)
+    waiters: int = 0
+
+
+class JobEventBroker:
+    """
+    Fans job store events out to asyncio subscribers.
+
+    ``publish`` is registered as a job store listener and runs on whichever
+    thread changed the job; each event is handed to the subscriber's loop with
+    ``call_soon_threadsafe``. Group membership is learnt from the ``queued``
+    event a job emits when it is created, and forgotten once the job finishes.
+    """
+
+    def __init__(self) -> None:
+        self._by_job: Dict[str, Set[Subscription]] = {}
+        self._by_group: Dict[str, Set[Subscription]] = {}
+        self._job_groups: Dict[str, str] = {}
+        self._finish_watches: Dict[str, Dict[asyncio.AbstractEventLoop, _FinishWatch]] = {}
+        self._lock = Lock()
+
+    def subscribe(self, *, job_id: Optional[str] = None, group_id: Optional[str] = None) -> Subscription:
+        """Subscribes to one job or one group; must be called from the consuming event loop."""
+        if (job_id is None) == (group_id is None):
+            raise ValueError("Subscribe to exactly one of job_id or group_id")
+        subscription = Subscription(job_id=job_id, group_id=group_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            if job_id is not None:
+                self._by_job.setdefault(job_id, set()).add(subscription)
+            else:
+                self._by_group.setdefault(group_id, set()).add(subscription)
+        event_subscribers.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            index, key = (
+                (self._by_job, subscription.job_id)
+                if subscription.job_id is not None
+                else (self._by_group, subscription.group_id)
+            )
+            subscribers = index.get(key)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del index[key]
+        event_subscribers.dec()
+
+    @asynccontextmanager
+    async def watch_finished(self, job_id: str) -> AsyncIterator[asyncio.Event]:
+        """
+        Yields an event that is set once ``job_id`` completes or fails. Read the
+        job after entering the context, so a job finishing in between is not missed.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            watch = self._finish_watches.setdefault(job_id, {}).setdefault(loop, _FinishWatch())
+            watch.waiters += 1
+        long_poll_waiters.inc()
+        try:
+            yield watch.event
+        finally:
+            long_poll_waiters.dec()
+            with self._lock:
+                watch.waiters -= 1
+                watches = self._finish_watches.get(job_id)
+                if watch.waiters == 0 and watches is not None and watches.get(loop) is watch:
+                    del watches[loop]
+                    if not watches:
+                        del self._finish_watches[job_id]
+
+    def publish(self, event: JobEvent) -> None:
+        finish_watches = {}
+        with self._lock:
+            if event.group_id is not None:
+                self._job_groups[event.job_id] = event.group_id
+            if event.status in TERMINAL_STATUSES:
+                group_id = self._job_groups.pop(event.job_id, None)
+                finish_watches = self._finish_watches.pop(event.job_id, {})
+            else:
+                group_id = self._job_groups.get(event.job_id)
+            targets = list(self._by_job.get(event.job_id, ()))
+            if group_id is not None:
+                targets.extend(self._by_group.get(group_id, ()))
+        for subscription in targets:
+            self._call_soon(subscription.loop, subscription.queue.put_nowait, event)
+        for loop, watch in finish_watches.items():
+            self._call_soon(loop, watch.event.set)
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The subscriber's loop has closed; it cleans up when its request ends
+            pass
+
+    def reset(self) -> None:
+        with self._lock:
+            self._job_groups.clear()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional
+
+import structlog
+
+from .metrics import model_load_seconds, model_warmup_seconds
+from .workers import JobExecutor
+
+log = structlog.get_logger()
+
+
+@dataclass
+class ModelReadiness:
+    """
+    Tracks whether the model has been loaded and warmed up.
+
+    When ``required`` is False (lazy loading) the service is always considered
+    ready and the model is loaded on the first parse instead.
+    """
+
+    required: bool
+    loaded: bool = False
+    warmed: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return not self.required or self.warmed
+
+    def warm_up(self, executor: JobExecutor) -> None:
+        try:
+            load_seconds, warmup_seconds = executor.warm_up()
+        except Exception as exc:
+            self.error = str(exc)
+            log.error("model_warmup_failed", error=self.error)
+            return
+        model_load_seconds.set(load_seconds)
+        model_warmup_seconds.set(warmup_seconds)
+        self.loaded = self.warmed = True
+        self.error = None
+        log.info("model_warmed_up", load_seconds=round(load_seconds, 3), warmup_seconds=round(warmup_seconds, 3))
+
+    def payload(self) -> dict:
+        payload = {
+            "status": "ready" if self.ready else "starting",
+            "model_loaded": self.loaded,
+            "model_warmed": self.warmed,
+        }
+        if self.error:
+            payload["error"] = self.error
+        return payload
@@ -1,16 +1,29 @@
 from __future__ import annotations
 
+import json
+import sqlite3
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from threading import Lock
-from time import perf_counter
-from typing import Dict, Literal, Optional
+from threading import Event, Lock, Thread, local
+from time import perf_counter, time
+from itertools import islice, takewhile
+from typing import Callable, Dict, Iterable, List, Literal, NamedTuple, Optional
 from uuid import uuid4
 
+import structlog
+
 from receipt_reader.types import Invoice
 
-from .metrics import job_queue_depth
+from .serialization import result_bodies
 
 JobStatus = Literal["queued", "processing", "completed", "failed"]
+JOB_STATUSES = ("queued", "processing", "completed", "failed")
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Rough per-job bookkeeping cost (dataclass, dict slot, ids) on top of the payloads
+_JOB_OVERHEAD_BYTES = 600
+
+log = structlog.get_logger()
 
 
 from pathlib import Path
@@ -20,60 +33,612 @@ from pathlib import Path
 class Job:
     id: str = field(default_factory=lambda: str(uuid4()))
     status: JobStatus = "queued"
-    result: Optional[Invoice] = None
+    result_json: Optional[bytes] = None
     error: Optional[str] = None
     metadata: Optional[dict] = None
     duration_seconds: Optional[float] = None
     source_path: Optional[Path] = None
+    content_hash: Optional[str] = None
+    finished_at: Optional[float] = None
+    group_id: Optional[str] = None
+    # What has been decoded so far, while the job is processing
+    partial_json: Optional[bytes] = None
+    # Body of GET /receipts/{job_id} once the job has completed
+    response_json: Optional[bytes] = None
+
+    @property
+    def result(self) -> Optional[Invoice]:
+        """The parsed invoice, decoded on demand from its compact JSON form."""
+        if self.result_json is None:
+            return None
+        return Invoice.parse_raw(self.result_json)
+
+    def estimated_size(self) -> int:
+        size = _JOB_OVERHEAD_BYTES + len(self.error or "")
+        for payload in (self.result_json, self.partial_json, self.response_json):
+            size += len(payload or b"")
+        if self.metadata:
+            size += len(json.dumps(self.metadata))
+        return size
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    Limits on how many finished jobs a store keeps.
 
+    Finished jobs are dropped ``ttl_seconds`` after they complete or fail, and
+    the oldest finished jobs are evicted first whenever the store holds more
+    than ``max_jobs`` jobs or more than ``max_bytes`` of estimated job data.
+    Queued and processing jobs are never evicted. A limit of 0 disables it.
+    """
+
+    ttl_seconds: float = 0
+    max_jobs: int = 0
+    max_bytes: int = 0
+
+
+class JobStoreStats(NamedTuple):
+    jobs: int
+    estimated_bytes: int
+
+
+class JobEvent(NamedTuple):
+    """
+    A job status transition. ``group_id`` is only set on the ``queued`` event
+    sent when the job is created.
+    """
+
+    job_id: str
+    status: JobStatus
+    group_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+JobListener = Callable[[JobEvent], None]
+
+
+class JobStore(ABC):
+    """
+    Interface shared by the job store backends.
+
+    Listeners added with :meth:`add_listener` are called with a
+    :class:`JobEvent` for every job created and every status transition, on
+    the thread that made the change. When the store is ``shared`` between
+    processes, that only covers the changes made by this process.
+    """
+
+    shared = False
 
-class JobStore:
     def __init__(self) -> None:
+        self._listeners: List[JobListener] = []
+
+    def add_listener(self, listener: JobListener) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, events: Iterable[JobEvent]) -> None:
+        for listener in self._listeners:
+            for event in events:
+                try:
+                    listener(event)
+                except Exception as exc:  # pragma: no cover - a broken listener must not fail the job
+                    log.warning("job_listener_failed", job_id=event.job_id, error=str(exc))
+
+    @abstractmethod
+    def create(self, *, metadata: Optional[dict] = None, group_id: Optional[str] = None) -> Job:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def attach_upload(self, job_id: str, *, source_path: Optional[Path], content_hash: Optional[str]) -> Job:
+        ...
+
+    @abstractmethod
+    def mark_processing_many(self, job_ids: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def set_partial(self, job_id: str, invoice: Invoice) -> None:
+        """Stores the partial result of a processing job; ignored once the job has finished."""
+
+    @abstractmethod
+    def mark_completed_many(self, job_ids: Iterable[str], *, invoice: Invoice, duration: float) -> None:
+        ...
+
+    @abstractmethod
+    def mark_failed_many(self, job_ids: Iterable[str], *, error: str) -> None:
+        ...
+
+    @abstractmethod
+    def count_by_status(self, group_id: Optional[str] = None) -> Dict[str, int]:
+        """Counts jobs per status, across the store or within one group."""
+
+    @abstractmethod
+    def list_group(self, group_id: str, *, offset: int = 0, limit: int = 50) -> List[Job]:
+        """Returns a page of a group's jobs in the order they were created."""
+
+    @abstractmethod
+    def stats(self) -> JobStoreStats:
+        ...
+
+    @abstractmethod
+    def purge(self, *, now: Optional[float] = None) -> int:
+        """Applies the retention policy and returns the number of evicted jobs."""
+
+    @abstractmethod
+    def delete(self, job_id: str) -> None:
+        """Removes a job, such as one created for an upload that was then turned away."""
+
+    @abstractmethod
+    def reset(self) -> None:
+        ...
+
+    def mark_processing(self, job_id: str) -> Job:
+        self.mark_processing_many([job_id])
+        return self._require(job_id)
+
+    def mark_completed(self, job_id: str, *, invoice: Invoice, duration: float) -> Job:
+        self.mark_completed_many([job_id], invoice=invoice, duration=duration)
+        return self._require(job_id)
+
+    def mark_failed(self, job_id: str, *, error: str) -> Job:
+        self.mark_failed_many([job_id], error=error)
+        return self._require(job_id)
+
+    def _require(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+
+class InMemoryJobStore(JobStore):
+    """Process-local job store; the default backend."""
+
+    def __init__(self, retention: RetentionPolicy = RetentionPolicy()) -> None:
+        super().__init__()
         self._jobs: Dict[str, Job] = {}
+        self._sizes: Dict[str, int] = {}
+        # Job ids per group, kept in creation order
+        self._groups: Dict[str, Dict[str, None]] = {}
+        # Ids of finished jobs, oldest first, so eviction does not scan every job
+        self._finished: Dict[str, None] = {}
+        self._bytes = 0
+        self._retention = retention
         self._lock = Lock()
 
-    def create(self, *, metadata: Optional[dict] = None) -> Job:
-        job = Job(metadata=metadata)
+    def create(self, *, metadata: Optional[dict] = None, group_id: Optional[str] = None) -> Job:
+        job = Job(metadata=metadata, group_id=group_id)
         with self._lock:
             self._jobs[job.id] = job
-            job_queue_depth.inc()
+            if group_id is not None:
+                self._groups.setdefault(group_id, {})[job.id] = None
+            self._track(job)
+            if self._over_limits():
+                self._evict_over_limits()
+        self._notify([JobEvent(job.id, "queued", group_id=group_id)])
         return job
 
     def get(self, job_id: str) -> Optional[Job]:
         with self._lock:
             return self._jobs.get(job_id)
 
-    def mark_processing(self, job_id: str) -> Job:
+    def attach_upload(self, job_id: str, *, source_path: Optional[Path], content_hash: Optional[str]) -> Job:
         with self._lock:
             job = self._jobs[job_id]
-            job.status = "processing"
-            job_queue_depth.dec()
+            job.source_path = source_path
+            job.content_hash = content_hash
             return job
 
-    def mark_completed(self, job_id: str, *, invoice: Invoice, duration: float) -> Job:
+    def _track(self, job: Job) -> None:
+        size = job.estimated_size()
+        self._bytes += size - self._sizes.get(job.id, 0)
+        self._sizes[job.id] = size
+
+    def _track_finished(self, job_id: str) -> None:
+        # A job finished again moves to the end, keeping the index ordered by finished_at
+        self._finished.pop(job_id, None)
+        self._finished[job_id] = None
+
+    def mark_processing_many(self, job_ids: Iterable[str]) -> None:
+        job_ids = list(job_ids)
         with self._lock:
-            job = self._jobs[job_id]
-            job.status = "completed"
-            job.result = invoice
-            job.duration_seconds = duration
-            return job
+            for job_id in job_ids:
+                job = self._jobs[job_id]
+                job.status = "processing"
+        self._notify([JobEvent(job_id, "processing") for job_id in job_ids])
 
-    def mark_failed(self, job_id: str, *, error: str) -> Job:
+    def set_partial(self, job_id: str, invoice: Invoice) -> None:
+        partial_json = invoice.json().encode()
         with self._lock:
-            job = self._jobs[job_id]
-            job.status = "failed"
-            job.error = error
-            job_queue_depth.dec()
-            return job
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "processing":
+                return
+            job.partial_json = partial_json
+            self._track(job)
+
+    def mark_completed_many(self, job_ids: Iterable[str], *, invoice: Invoice, duration: float) -> None:
+        job_ids = list(job_ids)
+        result_json = invoice.json().encode()
+        responses = result_bodies(job_ids, invoice, duration)
+        now = time()
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs[job_id]
+                job.status = "completed"
+                job.result_json = result_json
+                job.response_json = responses[job_id]
+                job.partial_json = None
+                job.duration_seconds = duration
+                job.finished_at = now
+                self._track(job)
+                self._track_finished(job_id)
+        self._notify([JobEvent(job_id, "completed") for job_id in job_ids])
+
+    def mark_failed_many(self, job_ids: Iterable[str], *, error: str) -> None:
+        job_ids = list(job_ids)
+        now = time()
+        with self._lock:
+            for job_id in job_ids:
+                job = self._jobs[job_id]
+                job.status = "failed"
+                job.error = error
+                job.partial_json = None
+                job.finished_at = now
+                self._track(job)
+                self._track_finished(job_id)
+        self._notify([JobEvent(job_id, "failed", error=error) for job_id in job_ids])
+
+    def count_by_status(self, group_id: Optional[str] = None) -> Dict[str, int]:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        with self._lock:
+            if group_id is None:
+                jobs = self._jobs.values()
+            else:
+                jobs = [self._jobs[job_id] for job_id in self._groups.get(group_id, ())]
+            for job in jobs:
+                counts[job.status] += 1
+        return counts
+
+    def list_group(self, group_id: str, *, offset: int = 0, limit: int = 50) -> List[Job]:
+        with self._lock:
+            job_ids = islice(self._groups.get(group_id, ()), offset, offset + limit)
+            return [self._jobs[job_id] for job_id in job_ids]
+
+    def stats(self) -> JobStoreStats:
+        with self._lock:
+            return JobStoreStats(jobs=len(self._jobs), estimated_bytes=self._bytes)
+
+    def purge(self, *, now: Optional[float] = None) -> int:
+        now = time() if now is None else now
+        with self._lock:
+            evicted = 0
+            if self._retention.ttl_seconds > 0:
+                cutoff = now - self._retention.ttl_seconds
+                expired = list(takewhile(lambda job_id: self._jobs[job_id].finished_at <= cutoff, self._finished))
+                for job_id in expired:
+                    self._drop(job_id)
+                evicted += len(expired)
+            return evicted + self._evict_over_limits()
+
+    def _over_limits(self) -> bool:
+        policy = self._retention
+        return (policy.max_jobs > 0 and len(self._jobs) > policy.max_jobs) or (
+            policy.max_bytes > 0 and self._bytes > policy.max_bytes
+        )
+
+    def _evict_over_limits(self) -> int:
+        evicted = 0
+        while self._finished and self._over_limits():
+            self._drop(next(iter(self._finished)))
+            evicted += 1
+        return evicted
+
+    def _drop(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id)
+        self._bytes -= self._sizes.pop(job_id, 0)
+        self._finished.pop(job_id, None)
+        if job.group_id is not None:
+            members = self._groups[job.group_id]
+            del members[job_id]
+            if not members:
+                del self._groups[job.group_id]
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._drop(job_id)
 
     def reset(self) -> None:
         with self._lock:
             self._jobs.clear()
-            job_queue_depth.set(0)
+            self._sizes.clear()
+            self._groups.clear()
+            self._finished.clear()
+            self._bytes = 0
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    metadata TEXT,
+    duration_seconds REAL,
+    source_path TEXT,
+    content_hash TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    group_id TEXT,
+    partial TEXT,
+    response BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, updated_at);
+"""
+# Columns missing from databases created by earlier versions
+_ADDED_COLUMNS = {
+    "group_id": "ALTER TABLE jobs ADD COLUMN group_id TEXT",
+    "partial": "ALTER TABLE jobs ADD COLUMN partial TEXT",
+    "response": "ALTER TABLE jobs ADD COLUMN response BLOB",
+}
+_CREATE_GROUP_INDEX = "CREATE INDEX IF NOT EXISTS jobs_group_idx ON jobs (group_id)"
+
+# Statements are kept as constants so sqlite3's per-connection statement cache
+# reuses the prepared statement instead of re-parsing the SQL on every call.
+_INSERT_JOB = (
+    "INSERT INTO jobs (id, status, metadata, group_id, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?)"
+)
+_JOB_COLUMNS = (
+    "id, status, result, error, metadata, duration_seconds, source_path, content_hash, updated_at, group_id, partial, "
+    "response"
+)
+_SELECT_JOB = f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?"
+# Rowids grow with every insert, so they order a group's jobs by creation
+_SELECT_GROUP_PAGE = f"SELECT {_JOB_COLUMNS} FROM jobs WHERE group_id = ? ORDER BY rowid LIMIT ? OFFSET ?"
+_ATTACH_UPLOAD = "UPDATE jobs SET source_path = ?, content_hash = ?, updated_at = ? WHERE id = ?"
+_MARK_PROCESSING = "UPDATE jobs SET status = 'processing', updated_at = ? WHERE id = ?"
+_SET_PARTIAL = "UPDATE jobs SET partial = ?, updated_at = ? WHERE id = ? AND status = 'processing'"
+_MARK_COMPLETED = (
+    "UPDATE jobs SET status = 'completed', result = ?, response = ?, partial = NULL, duration_seconds = ?, "
+    "updated_at = ? WHERE id = ?"
+)
+_MARK_FAILED = "UPDATE jobs SET status = 'failed', error = ?, partial = NULL, updated_at = ? WHERE id = ?"
+_COUNT_BY_STATUS = "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+_COUNT_GROUP_BY_STATUS = "SELECT status, COUNT(*) FROM jobs WHERE group_id = ? GROUP BY status"
+_STATS = (
+    "SELECT COUNT(*), COALESCE(SUM(LENGTH(COALESCE(result, '')) + LENGTH(COALESCE(response, '')) "
+    "+ LENGTH(COALESCE(partial, '')) + LENGTH(COALESCE(error, '')) + LENGTH(COALESCE(metadata, '')) "
+    f"+ {_JOB_OVERHEAD_BYTES}), 0) FROM jobs"
+)
+_DELETE_EXPIRED = "DELETE FROM jobs WHERE status IN ('completed', 'failed') AND updated_at <= ?"
+_SELECT_FINISHED_OLDEST = (
+    "SELECT id, LENGTH(COALESCE(result, '')) + LENGTH(COALESCE(response, '')) + LENGTH(COALESCE(error, '')) "
+    f"+ LENGTH(COALESCE(metadata, '')) + {_JOB_OVERHEAD_BYTES} "
+    "FROM jobs WHERE status IN ('completed', 'failed') ORDER BY updated_at"
+)
+_DELETE_JOB = "DELETE FROM jobs WHERE id = ?"
+_DELETE_ALL = "DELETE FROM jobs"
+
+
+class SqliteJobStore(JobStore):
+    """
+    Job store backed by a SQLite database in WAL mode.
+
+    Several worker processes on one host can share the same database file, so
+    a job created by one uvicorn worker can be polled through any other, and
+    jobs survive restarts. Each thread gets its own connection.
+    """
+
+    shared = True
+
+    def __init__(self, path: Path, retention: RetentionPolicy = RetentionPolicy()) -> None:
+        super().__init__()
+        self._path = path
+        self._retention = retention
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = local()
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in _ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.execute(_CREATE_GROUP_INDEX)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5.0, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, *, metadata: Optional[dict] = None, group_id: Optional[str] = None) -> Job:
+        job = Job(metadata=metadata, group_id=group_id)
+        with self._connection() as conn:
+            now = time()
+            conn.execute(
+                _INSERT_JOB, (job.id, json.dumps(metadata) if metadata is not None else None, group_id, now, now)
+            )
+        self._notify([JobEvent(job.id, "queued", group_id=group_id)])
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._connection().execute(_SELECT_JOB, (job_id,)).fetchone()
+        if row is None:
+            return None
+        return self._row_to_job(row)
+
+    @staticmethod
+    def _row_to_job(row: tuple) -> Job:
+        (
+            job_id,
+            status,
+            result,
+            error,
+            metadata,
+            duration,
+            source_path,
+            content_hash,
+            updated_at,
+            group_id,
+            partial,
+            response,
+        ) = row
+        return Job(
+            id=job_id,
+            status=status,
+            result_json=result,
+            error=error,
+            metadata=json.loads(metadata) if metadata is not None else None,
+            duration_seconds=duration,
+            source_path=Path(source_path) if source_path is not None else None,
+            content_hash=content_hash,
+            finished_at=updated_at if status in TERMINAL_STATUSES else None,
+            group_id=group_id,
+            partial_json=partial,
+            response_json=response,
+        )
+
+    def attach_upload(self, job_id: str, *, source_path: Optional[Path], content_hash: Optional[str]) -> Job:
+        with self._connection() as conn:
+            conn.execute(
+                _ATTACH_UPLOAD,
+                (str(source_path) if source_path is not None else None, content_hash, time(), job_id),
+            )
+        return self._require(job_id)
+
+    def mark_processing_many(self, job_ids: Iterable[str]) -> None:
+        now = time()
+        rows = [(now, job_id) for job_id in job_ids]
+        with self._connection() as conn:
+            conn.executemany(_MARK_PROCESSING, rows)
+        self._notify([JobEvent(job_id, "processing") for _, job_id in rows])
+
+    def set_partial(self, job_id: str, invoice: Invoice) -> None:
+        with self._connection() as conn:
+            conn.execute(_SET_PARTIAL, (invoice.json().encode(), time(), job_id))
+
+    def mark_completed_many(self, job_ids: Iterable[str], *, invoice: Invoice, duration: float) -> None:
+        job_ids = list(job_ids)
+        now = time()
+        result = invoice.json().encode()
+        responses = result_bodies(job_ids, invoice, duration)
+        with self._connection() as conn:
+            conn.executemany(
+                _MARK_COMPLETED, [(result, responses[job_id], duration, now, job_id) for job_id in job_ids]
+            )
+        self._notify([JobEvent(job_id, "completed") for job_id in job_ids])
+
+    def mark_failed_many(self, job_ids: Iterable[str], *, error: str) -> None:
+        now = time()
+        rows = [(error, now, job_id) for job_id in job_ids]
+        with self._connection() as conn:
+            conn.executemany(_MARK_FAILED, rows)
+        self._notify([JobEvent(job_id, "failed", error=error) for _, _, job_id in rows])
+
+    def count_by_status(self, group_id: Optional[str] = None) -> Dict[str, int]:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        if group_id is None:
+            counts.update(self._connection().execute(_COUNT_BY_STATUS).fetchall())
+        else:
+            counts.update(self._connection().execute(_COUNT_GROUP_BY_STATUS, (group_id,)).fetchall())
+        return counts
+
+    def list_group(self, group_id: str, *, offset: int = 0, limit: int = 50) -> List[Job]:
+        rows = self._connection().execute(_SELECT_GROUP_PAGE, (group_id, limit, offset)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def stats(self) -> JobStoreStats:
+        jobs, estimated_bytes = self._connection().execute(_STATS).fetchone()
+        return JobStoreStats(jobs=jobs, estimated_bytes=estimated_bytes)
+
+    def purge(self, *, now: Optional[float] = None) -> int:
+        now = time() if now is None else now
+        policy = self._retention
+        evicted = 0
+        with self._connection() as conn:
+            if policy.ttl_seconds > 0:
+                evicted += conn.execute(_DELETE_EXPIRED, (now - policy.ttl_seconds,)).rowcount
+            if policy.max_jobs > 0 or policy.max_bytes > 0:
+                jobs, total_bytes = conn.execute(_STATS).fetchone()
+                doomed = []
+                for job_id, size in conn.execute(_SELECT_FINISHED_OLDEST):
+                    over_jobs = policy.max_jobs > 0 and jobs > policy.max_jobs
+                    over_bytes = policy.max_bytes > 0 and total_bytes > policy.max_bytes
+                    if not (over_jobs or over_bytes):
+                        break
+                    doomed.append((job_id,))
+                    jobs -= 1
+                    total_bytes -= size
+                conn.executemany(_DELETE_JOB, doomed)
+                evicted += len(doomed)
+        return evicted
+
+    def delete(self, job_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute(_DELETE_JOB, (job_id,))
+
+    def reset(self) -> None:
+        with self._connection() as conn:
+            conn.execute(_DELETE_ALL)
+
+
+class JobReaper:
+    """Background thread that periodically applies a store's retention policy."""
+
+    def __init__(self, store: JobStore, *, interval_seconds: float) -> None:
+        self._store = store
+        self._interval = interval_seconds
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = Thread(target=self._run, name="job-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                evicted = self._store.purge()
+            except Exception as exc:  # pragma: no cover - keep reaping on transient errors
+                log.warning("job_reaper_failed", error=str(exc))
+                continue
+            if evicted:
+                log.info("job_reaper_evicted", evicted=evicted)
+
+
+def create_job_store(
+    backend: str,
+    *,
+    path: Optional[Path] = None,
+    retention: RetentionPolicy = RetentionPolicy(),
+) -> JobStore:
+    """Factory to create the configured JobStore backend."""
+    if backend == "memory":
+        return InMemoryJobStore(retention)
+    if backend == "sqlite":
+        if path is None:
+            raise ValueError("The sqlite job store requires a database path")
+        return SqliteJobStore(path, retention)
+    raise ValueError(f"Unknown job store backend: {backend}")
 
 
 def timed(fn, *args, **kwargs):
     start = perf_counter()
     value = fn(*args, **kwargs)
     duration = perf_counter() - start
-    return value, duration
\ No newline at end of file
+    return value, duration
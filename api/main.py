@@ -1,44 +1,138 @@
+import asyncio
 import json
 import tempfile
 import uuid
+from collections import Counter
 from contextlib import asynccontextmanager
-from decimal import Decimal
 from pathlib import Path
-from typing import Optional
+from threading import BoundedSemaphore
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 
 import structlog
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from fastapi import (
-    BackgroundTasks,
     FastAPI,
     File,
     Form,
     HTTPException,
+    Query,
     Request,
     UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
     status,
 )
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 
-from receipt_reader.parser import parse_image
+from receipt_reader import parser
+from receipt_reader.decoding import DecodeSettings
+from receipt_reader.parser import MODEL_VERSION, parse_bytes, parse_image, parse_images, parse_text, partial_results
+from receipt_reader.stages import PER_RECEIPT_STAGES, STAGE_GENERATE
+from receipt_reader.types import Invoice
 
-from .config import MAX_FILE_SIZE_BYTES, RATE_LIMIT
-from .jobs import Job, JobStore, timed
+from .batching import BatchingEngine, Source
+from . import serialization
+from .cache import ResultCache, SingleFlight
+from .health import ModelReadiness
+from .config import (
+    BATCH_JOB_QUEUE_SIZE,
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    BATCH_UPLOAD_CHUNK_SIZE,
+    BATCH_UPLOAD_MAX_FILES,
+    BATCH_UPLOAD_QUEUE_TIMEOUT_SECONDS,
+    BATCH_UPLOAD_RATE_LIMIT,
+    DECODE_MAX_NEW_TOKENS,
+    DECODE_REPETITION_MAX_NGRAM,
+    DECODE_REPETITION_MIN_REPEATS,
+    ESTIMATE_EWMA_ALPHA,
+    ESTIMATE_INITIAL_SECONDS,
+    EVENT_STREAM_HEARTBEAT_SECONDS,
+    INFERENCE_BACKEND,
+    INFERENCE_WORKER_MODE,
+    INFERENCE_WORKERS,
+    JOB_MAX_BYTES,
+    JOB_MAX_COUNT,
+    JOB_QUEUE_SIZE,
+    JOB_REAP_INTERVAL_SECONDS,
+    JOB_STORE_BACKEND,
+    JOB_STORE_PATH,
+    JOB_TTL_SECONDS,
+    LONG_POLL_MAX_SECONDS,
+    LONG_POLL_RECHECK_SECONDS,
+    MAX_FILE_SIZE_BYTES,
+    MODEL_EAGER_LOAD,
+    ONNX_MODEL_DIR,
+    RATE_LIMIT,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_SIZE,
+    SYNC_MAX_WAITERS,
+    SYNC_TIMEOUT_SECONDS,
+    TENANT_WEIGHTS,
+    TORCH_WEIGHTS_DIR,
+    UPLOAD_SPILL_QUEUE_DEPTH,
+)
+from .estimates import ThroughputEstimator
+from .events import STATUS_ORDER, JobEventBroker, Subscription
+from .jobs import JOB_STATUSES, TERMINAL_STATUSES, Job, JobEvent, JobReaper, RetentionPolicy, create_job_store, timed
 from .logging import setup_logging
-from .metrics import instrumentator
-from .storage import get_storage_service
+from .metrics import (
+    admission_rejections,
+    decode_stops,
+    decode_tokens_per_second,
+    decoded_tokens,
+    instrumentator,
+    job_queue_depth,
+    job_store_bytes,
+    job_store_jobs,
+    jobs_in_flight,
+    parse_stage_seconds,
+    queue_saturation,
+    result_cache_requests,
+    seconds_per_job,
+    sync_fallbacks,
+    sync_waiters,
+    upload_memory_bytes,
+    worker_utilization,
+)
+from .scheduling import DEFAULT_TENANT, LANE_BATCH, LANE_INTERACTIVE, LANES, parse_tenant_weights
+from .storage import SavedUpload, get_storage_service, iter_upload_members
+from .tracing import job_span, parse_span, record_stages
+from .workers import JobExecutor, QueueFullError
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     setup_logging()
     FastAPIInstrumentor.instrument_app(app)
+    job_reaper.start()
+    if readiness.required:
+        # Warm up in the background so the process stays live while /health/ready reports 503
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(readiness.warm_up, job_executor))
     yield
+    job_reaper.stop()
+    job_executor.shutdown()
+    if batching_engine is not None:
+        batching_engine.stop()
+
 
+if INFERENCE_BACKEND == "onnx":
+    parser.set_backend(INFERENCE_BACKEND, model_dir=ONNX_MODEL_DIR)
+elif INFERENCE_BACKEND == "torch" and TORCH_WEIGHTS_DIR:
+    parser.set_backend(INFERENCE_BACKEND, weights_dir=TORCH_WEIGHTS_DIR)
+else:
+    parser.set_backend(INFERENCE_BACKEND)
+parser.set_decode_settings(
+    DecodeSettings(
+        max_new_tokens=DECODE_MAX_NEW_TOKENS,
+        repetition_max_ngram=DECODE_REPETITION_MAX_NGRAM,
+        repetition_min_repeats=DECODE_REPETITION_MIN_REPEATS,
+    )
+)
 
 limiter = Limiter(key_func=get_remote_address)
 app = FastAPI(lifespan=lifespan)
@@ -46,8 +140,39 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 instrumentator.instrument(app)
 instrumentator.expose(app)
-job_store = JobStore()
+job_store = create_job_store(
+    JOB_STORE_BACKEND,
+    path=JOB_STORE_PATH,
+    retention=RetentionPolicy(ttl_seconds=JOB_TTL_SECONDS, max_jobs=JOB_MAX_COUNT, max_bytes=JOB_MAX_BYTES),
+)
+job_reaper = JobReaper(job_store, interval_seconds=JOB_REAP_INTERVAL_SECONDS)
+event_broker = JobEventBroker()
+job_store.add_listener(event_broker.publish)
+job_store_jobs.set_function(lambda: job_store.stats().jobs)
+job_store_bytes.set_function(lambda: job_store.stats().estimated_bytes)
 storage_service = get_storage_service()
+upload_memory_bytes.set_function(lambda: storage_service.memory_bytes())
+# Batches run wherever inference runs (threads or worker processes), one per inference worker at a time
+batching_engine = (
+    BatchingEngine(
+        lambda sources: job_executor.parse_many(sources),
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        dispatchers=INFERENCE_WORKERS,
+    )
+    if BATCH_MAX_SIZE > 1
+    else None
+)
+result_cache = ResultCache(
+    model_version=MODEL_VERSION,
+    max_entries=RESULT_CACHE_SIZE,
+    disk_dir=RESULT_CACHE_DIR,
+    disk_max_bytes=RESULT_CACHE_MAX_BYTES,
+)
+in_flight = SingleFlight()
+readiness = ModelReadiness(required=MODEL_EAGER_LOAD)
+# Admission control for ?sync=true: requests beyond this many waiters are answered asynchronously
+sync_slots = BoundedSemaphore(SYNC_MAX_WAITERS)
 log = structlog.get_logger()
 
 
@@ -75,65 +200,655 @@ def _parse_metadata(raw: Optional[str]) -> Optional[dict]:
     return parsed
 
 
+def _tenant(metadata: Optional[dict]) -> str:
+    """Tenant a job is scheduled under, from the ``tenant`` field of the upload metadata."""
+    tenant = (metadata or {}).get("tenant")
+    return str(tenant) if tenant not in (None, "") else DEFAULT_TENANT
+
+
 def _job_status_payload(job: Job) -> dict:
     payload = {"job_id": job.id, "status": job.status}
     if job.error:
         payload["error"] = job.error
+    if job.partial_json is not None and job.status == "processing":
+        payload["partial"] = json.loads(job.partial_json)
     return payload
 
 
+def _job_result_body(job: Job) -> bytes:
+    """The completed job's response body, serialized when the job completed."""
+    if job.response_json is not None:
+        return job.response_json
+    # Jobs completed before response bodies were stored
+    assert job.result_json is not None, "job.result_json expected for completed jobs"
+    parsed = serialization.loads(job.result_json)
+    return serialization.result_body(job.id, parsed, serialization.result_meta(parsed["meta"], job.duration_seconds))
+
+
+def _job_result_response(job: Job, headers: Optional[dict] = None) -> Response:
+    return Response(content=_job_result_body(job), media_type="application/json", headers=headers)
+
+
 def _job_result_payload(job: Job) -> dict:
-    assert job.result is not None, "job.result expected for completed jobs"
+    return serialization.loads(_job_result_body(job))
+
+
+def _job_event_payload(event: JobEvent) -> dict:
+    payload = {"job_id": event.job_id, "status": event.status}
+    if event.error:
+        payload["error"] = event.error
+    return payload
+
+
+def _group_progress_payload(group_id: str, counts: dict) -> dict:
+    total = sum(counts.values())
+    finished = counts["completed"] + counts["failed"]
     return {
-        "job_id": job.id,
-        "status": "completed",
-        "parsed": jsonable_encoder(job.result, custom_encoder={Decimal: str}),
-        "meta": {
-            "processing_time_seconds": round(job.duration_seconds or 0.0, 3),
-            "model_version": "donut-base-finetuned-cord-v2",
-        },
+        "group_id": group_id,
+        "status": "completed" if finished == total else "processing",
+        "total": total,
+        "counts": counts,
     }
 
 
+def _group_member_payload(job: Job) -> dict:
+    if job.status == "completed":
+        return _job_result_payload(job)
+    return _job_status_payload(job)
+
+
+def _observe_decoding(invoice: Invoice) -> None:
+    decoding = invoice.meta.get("decoding")
+    if decoding:
+        decoded_tokens.observe(decoding["tokens"])
+        decode_stops.labels(reason=decoding["stop_reason"]).inc()
+    # Stages shared by a batch report the whole batch's time; count this receipt's share of it
+    batch_size = invoice.meta.get("batch_size", 1)
+    timings = {
+        stage: seconds if stage in PER_RECEIPT_STAGES else seconds / batch_size
+        for stage, seconds in (invoice.meta.get("timings") or {}).items()
+    }
+    for stage, seconds in timings.items():
+        parse_stage_seconds.labels(stage=stage).observe(seconds)
+    generate_seconds = timings.get(STAGE_GENERATE)
+    if decoding and decoding["tokens"] and generate_seconds:
+        decode_tokens_per_second.observe(decoding["tokens"] / generate_seconds)
+
+
+def _parse_source(source: Source) -> Invoice:
+    if isinstance(source, bytes):
+        return parse_bytes(source)
+    return parse_image(source)
+
+
+def _parse_sources(sources: Sequence[Source]) -> List[Invoice]:
+    return parse_images(sources)
+
+
 def process_job(job_id: str) -> None:
     job = job_store.get(job_id)
-    assert job and job.source_path, f"Job {job_id} or its source path not found"
+    assert job, f"Job {job_id} not found"
 
-    job_store.mark_processing(job.id)
+    with job_span("process_job", [job.id]):
+        job_store.mark_processing(job.id)
+        _parse_job(job)
+
+
+def process_job_chunk(job_ids: List[str]) -> None:
+    """Parses a chunk of a batch upload with a single inference call."""
+    with job_span("process_job_chunk", job_ids):
+        _parse_chunk([job for job in map(job_store.get, job_ids) if job is not None])
+
+
+def _parse_chunk(jobs: List[Job]) -> None:
+    job_store.mark_processing_many([job.id for job in jobs])
     try:
-        invoice, duration = timed(parse_image, str(job.source_path))
-        job_store.mark_completed(job.id, invoice=invoice, duration=duration)
+        sources = [storage_service.source(job.id, job.source_path) for job in jobs]
+        with parse_span([job.id for job in jobs]) as span, partial_results(
+            lambda index, partial: job_store.set_partial(jobs[index].id, partial)
+        ):
+            invoices, duration = timed(job_executor.parse_many, sources)
+            record_stages(span, invoices)
+    except Exception as exc:
+        if len(jobs) == 1:
+            _fail_job(jobs[0], str(exc))
+            storage_service.discard(jobs[0].id, jobs[0].source_path)
+            return
+        # Retry one by one so a single unreadable image does not fail its chunk mates
+        log.warning("job_chunk_failed", chunk_size=len(jobs), error=str(exc))
+        for job in jobs:
+            _parse_job(job)
+        return
+    for job, invoice in zip(jobs, invoices):
+        try:
+            _complete_job(job, invoice, duration, batch_size=len(jobs))
+        finally:
+            storage_service.discard(job.id, job.source_path)
+
+
+def _parse_job(job: Job) -> None:
+    try:
+        source = storage_service.source(job.id, job.source_path)
+        with parse_span([job.id]) as span, partial_results(lambda _, partial: job_store.set_partial(job.id, partial)):
+            parse = batching_engine.parse if batching_engine is not None else job_executor.parse
+            invoice, duration = timed(parse, source)
+            record_stages(span, [invoice])
     except Exception as exc:  # pragma: no cover - defensive guard
-        job_store.mark_failed(job.id, error=str(exc))
+        _fail_job(job, str(exc))
+    else:
+        _complete_job(job, invoice, duration, batch_size=invoice.meta.get("batch_size", 1))
     finally:
-        storage_service.cleanup(job.source_path)
+        storage_service.discard(job.id, job.source_path)
+
+
+def _complete_job(job: Job, invoice: Invoice, duration: float, *, batch_size: int = 1) -> None:
+    """
+    Stores the result of ``job`` and resolves its followers. If storing fails the
+    job is failed instead, so it never stays ``processing`` with its flight open.
+
+    ``duration`` is the wall-clock time of the parse, which took as long as the
+    whole batch of ``batch_size`` receipts it was part of; the throughput
+    estimate only counts the job's share of it.
+    """
+    try:
+        _observe_decoding(invoice)
+        throughput.observe(duration / batch_size)
+        _cache_result(job, invoice)
+        job_store.mark_completed(job.id, invoice=invoice, duration=duration)
+    except Exception as exc:
+        log.exception("job_completion_failed", job_id=job.id)
+        _fail_job(job, f"Storing the result failed: {exc}")
+    else:
+        _resolve_followers(job, invoice=invoice, duration=duration)
+
+
+def _cache_result(job: Job, invoice: Invoice) -> None:
+    # The cache only saves later parses; failing to write it must not fail the job
+    if not job.content_hash:
+        return
+    try:
+        result_cache.put(result_cache.key(job.content_hash), invoice)
+    except Exception as exc:
+        log.warning("result_cache_put_failed", job_id=job.id, error=str(exc))
+
+
+def _fail_job(job: Job, error: str) -> None:
+    try:
+        job_store.mark_failed(job.id, error=error)
+    finally:
+        _resolve_followers(job, error=error)
+
+
+def _resolve_followers(
+    job: Job,
+    *,
+    invoice: Optional[Invoice] = None,
+    duration: float = 0.0,
+    error: Optional[str] = None,
+) -> None:
+    """Completes the jobs that were coalesced onto ``job``'s in-flight parse."""
+    if not job.content_hash:
+        return
+    followers = in_flight.release(result_cache.key(job.content_hash))
+    if not followers:
+        return
+    if invoice is not None:
+        try:
+            job_store.mark_processing_many(followers)
+            job_store.mark_completed_many(followers, invoice=invoice, duration=duration)
+            return
+        except Exception as exc:
+            log.exception("follower_completion_failed", job_id=job.id, followers=len(followers))
+            error = f"Storing the result failed: {exc}"
+    job_store.mark_processing_many(followers)
+    job_store.mark_failed_many(followers, error=error or "Parsing failed")
+
+
+def _admit_upload(job: Job, saved: SavedUpload) -> Optional[Job]:
+    """
+    Serves ``job`` from the result cache or attaches it to an identical in-flight
+    job. Returns the job if it still has to be parsed, otherwise None.
+    """
+    job = job_store.attach_upload(job.id, source_path=saved.path, content_hash=saved.content_hash)
+    cache_key = result_cache.key(saved.content_hash)
+
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        result_cache_requests.labels(outcome="hit").inc()
+        storage_service.discard(job.id, saved.path)
+        job_store.mark_processing(job.id)
+        job_store.mark_completed(job.id, invoice=cached, duration=0.0)
+        return None
+
+    if not in_flight.join(cache_key, job.id):
+        result_cache_requests.labels(outcome="coalesced").inc()
+        storage_service.discard(job.id, saved.path)
+        return None
+
+    result_cache_requests.labels(outcome="miss").inc()
+    return job
+
+
+def _enqueue_upload(job: Job, saved: SavedUpload) -> None:
+    """Serves ``job`` from the result cache, attaches it to an identical in-flight job, or queues it."""
+    job = _admit_upload(job, saved)
+    if job is None:
+        return
+    try:
+        job_executor.submit(job.id, lane=LANE_INTERACTIVE, tenant=_tenant(job.metadata))
+    except QueueFullError as exc:
+        # No client was given this job's id, so drop it; followers coalesced onto it fail with it
+        _resolve_followers(job, error=str(exc))
+        storage_service.discard(job.id, saved.path)
+        job_store.delete(job.id)
+        raise _queue_full_error() from exc
+
+
+def _queue_full_error() -> HTTPException:
+    admission_rejections.inc()
+    return HTTPException(
+        status_code=503,
+        detail="Too many receipts in progress, try again later",
+        headers={"Retry-After": str(throughput.retry_after(job_executor.workers))},
+    )
+
+
+def _ingest_batch(files: List[UploadFile], metadata: Optional[dict], group_id: str) -> Tuple[List[dict], int]:
+    """
+    Creates one job per receipt of a batch upload and queues them in chunks of
+    ``BATCH_UPLOAD_CHUNK_SIZE``, each parsed with a single inference call.
+    Returns the created jobs and the number of receipts skipped over the limit.
+    """
+    created: List[Job] = []
+    names: List[str] = []
+    chunk: List[Job] = []
+    skipped = 0
+    queue_timeout = BATCH_UPLOAD_QUEUE_TIMEOUT_SECONDS
+    tenant = _tenant(metadata)
+
+    def submit_chunk() -> None:
+        nonlocal queue_timeout
+        try:
+            job_executor.submit_many([job.id for job in chunk], lane=LANE_BATCH, tenant=tenant, timeout=queue_timeout)
+        except QueueFullError as exc:
+            # Fail the rest of the batch straight away instead of waiting once per chunk
+            queue_timeout = 0
+            admission_rejections.inc(len(chunk))
+            for job in chunk:
+                _fail_job(job, str(exc))
+                storage_service.discard(job.id, job.source_path)
+        chunk.clear()
+
+    for upload in files:
+        for member in iter_upload_members(upload):
+            if len(created) >= BATCH_UPLOAD_MAX_FILES:
+                skipped += 1
+                continue
+            job = job_store.create(metadata=metadata, group_id=group_id)
+            created.append(job)
+            names.append(member.filename)
+            if member.error:
+                job_store.mark_failed(job.id, error=member.error)
+                continue
+            try:
+                spill = job_executor.queue_depth() >= UPLOAD_SPILL_QUEUE_DEPTH
+                saved = storage_service.save_file(
+                    job.id, member.file, filename=member.filename, content_type=member.content_type, spill=spill
+                )
+            except HTTPException as exc:
+                job_store.mark_failed(job.id, error=exc.detail)
+                continue
+            admitted = _admit_upload(job, saved)
+            if admitted is not None:
+                chunk.append(admitted)
+            if len(chunk) >= BATCH_UPLOAD_CHUNK_SIZE:
+                submit_chunk()
+    if chunk:
+        submit_chunk()
+
+    jobs = []
+    for job, filename in zip(created, names):
+        payload = _job_status_payload(job_store.get(job.id) or job)
+        payload["filename"] = filename
+        jobs.append(payload)
+    return jobs, skipped
+
+
+job_executor = JobExecutor(
+    process_job,
+    _parse_source,
+    workers=INFERENCE_WORKERS,
+    queue_size=JOB_QUEUE_SIZE,
+    # Enough threads waiting on the batching engine to fill a batch per inference worker
+    threads=INFERENCE_WORKERS * BATCH_MAX_SIZE,
+    batch_queue_size=BATCH_JOB_QUEUE_SIZE,
+    tenant_weights=parse_tenant_weights(TENANT_WEIGHTS),
+    mode=INFERENCE_WORKER_MODE,
+    chunk_handler=process_job_chunk,
+    parse_many=_parse_sources,
+)
+throughput = ThroughputEstimator(alpha=ESTIMATE_EWMA_ALPHA, initial_seconds=ESTIMATE_INITIAL_SECONDS)
+for _lane in LANES:
+    job_queue_depth.labels(lane=_lane).set_function(lambda lane=_lane: job_executor.pending_jobs(lane))
+    queue_saturation.labels(lane=_lane).set_function(
+        lambda lane=_lane: job_executor.queue_depth(lane) / max(job_executor.queue_size(lane), 1)
+    )
+jobs_in_flight.set_function(lambda: job_executor.running_jobs())
+worker_utilization.set_function(lambda: job_executor.busy_workers() / job_executor.threads)
+seconds_per_job.set_function(lambda: throughput.seconds_per_job())
 
 
 @app.post("/receipts", status_code=status.HTTP_202_ACCEPTED)
 @limiter.limit(RATE_LIMIT)
 async def upload_receipt(
     request: Request,
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     metadata: Optional[str] = Form(None),
+    sync: bool = Query(False),
 ):
     request.state.logger.info(
         "upload_receipt",
         filename=file.filename,
         content_type=file.content_type,
         metadata=metadata,
+        sync=sync,
     )
-    job = job_store.create(metadata=_parse_metadata(metadata))
-    job.source_path = storage_service.save_upload(job.id, file)
-    background_tasks.add_task(process_job, job.id)
+    # Turn uploads away before paying for reading, hashing and storing them
+    if job_executor.is_full(LANE_INTERACTIVE):
+        raise _queue_full_error()
+    # Hashing and storing the upload and writing the job block, so keep them off the event loop
+    job = await asyncio.to_thread(_ingest_upload, file, _parse_metadata(metadata))
+
+    if sync:
+        finished = await _wait_for_sync_result(request, job.id)
+        if finished is not None:
+            return finished
+    return await asyncio.to_thread(_accepted_response, request, job)
+
+
+def _ingest_upload(file: UploadFile, metadata: Optional[dict]) -> Job:
+    job = job_store.create(metadata=metadata)
+    # Keep small uploads in memory unless enough work is queued that they would sit there a while
+    spill = job_executor.queue_depth() >= UPLOAD_SPILL_QUEUE_DEPTH
+    _enqueue_upload(job, storage_service.save_upload(job.id, file, spill=spill))
+    return job
 
+
+async def _wait_for_sync_result(request: Request, job_id: str) -> Optional[Response]:
+    """
+    Waits up to ``SYNC_TIMEOUT_SECONDS`` for the job to finish and returns its
+    result response, or None to fall back to a 202 when the job is still
+    running or too many sync requests are already waiting.
+    """
+    if not sync_slots.acquire(blocking=False):
+        sync_fallbacks.labels(reason="saturated").inc()
+        request.state.logger.info("sync_upload_saturated", job_id=job_id)
+        return None
+    sync_waiters.inc()
+    try:
+        job = await _wait_until_finished(job_id, SYNC_TIMEOUT_SECONDS)
+    finally:
+        sync_waiters.dec()
+        sync_slots.release()
+
+    if job is None or job.status not in TERMINAL_STATUSES:
+        sync_fallbacks.labels(reason="timeout").inc()
+        return None
+    if job.status == "failed":
+        raise HTTPException(status_code=422, detail=job.error or "Parsing failed")
+    headers = {"Location": str(request.url_for("get_job_result", job_id=job.id))}
+    return _job_result_response(job, headers)
+
+
+def _accepted_response(request: Request, job: Job) -> JSONResponse:
     status_url = str(request.url_for("get_job_status", job_id=job.id))
     result_url = str(request.url_for("get_job_result", job_id=job.id))
     headers = {"Location": result_url}
-    body = {"job_id": job.id, "status_url": status_url, "estimated_seconds": 5}
+    body = {"job_id": job.id, "status_url": status_url, "estimated_seconds": _estimated_seconds(job.id)}
     return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=body, headers=headers)
 
 
+def _estimated_seconds(job_id: str) -> int:
+    """Seconds until ``job_id`` is likely done, from its queue position and recent parse times."""
+    job = job_store.get(job_id)
+    if job is None or job.status in TERMINAL_STATUSES:
+        return 0
+    if job.status == "processing":
+        return throughput.estimate(0, job_executor.workers)
+    # The job itself is among the pending ones; busy workers still have a job each ahead of it
+    jobs_ahead = max(job_executor.pending_jobs(LANE_INTERACTIVE) - 1, 0) + job_executor.busy_workers()
+    return throughput.estimate(jobs_ahead, job_executor.workers)
+
+
+@app.post("/receipts/batch", status_code=status.HTTP_202_ACCEPTED)
+@limiter.limit(BATCH_UPLOAD_RATE_LIMIT)
+async def upload_receipt_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    metadata: Optional[str] = Form(None),
+):
+    request.state.logger.info("upload_receipt_batch", files=len(files), metadata=metadata)
+    group_id = str(uuid.uuid4())
+    # Reading archives and writing uploads blocks, and may wait for queue space
+    jobs, skipped = await asyncio.to_thread(_ingest_batch, files, _parse_metadata(metadata), group_id)
+    if not jobs:
+        raise HTTPException(status_code=400, detail="No receipts found in upload")
+
+    status_url = str(request.url_for("get_group_status", group_id=group_id))
+    body = {"group_id": group_id, "status_url": status_url, "jobs": jobs, "skipped": skipped}
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=body, headers={"Location": status_url})
+
+
+@app.post("/receipts/text")
+@limiter.limit(RATE_LIMIT)
+async def upload_receipt_text(
+    request: Request,
+    text: str = Form(...),
+    metadata: Optional[str] = Form(None),
+):
+    """Parses already recognized receipt text with the rule-based parser; it is fast enough to answer inline."""
+    request.state.logger.info("upload_receipt_text", length=len(text), metadata=metadata)
+    if len(text.encode()) > MAX_FILE_SIZE_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Text size exceeds limit of {MAX_FILE_SIZE_BYTES / 1024 / 1024:.0f} MB",
+        )
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Receipt text is empty")
+
+    job = job_store.create(metadata=_parse_metadata(metadata))
+    job_store.mark_processing(job.id)
+    try:
+        invoice, duration = timed(parse_text, text)
+    except Exception as exc:
+        request.state.logger.exception("upload_receipt_text_failed", job_id=job.id)
+        job_store.mark_failed(job.id, error=str(exc) or "Parsing failed")
+        raise HTTPException(status_code=422, detail=str(exc) or "Parsing failed") from exc
+    job = job_store.mark_completed(job.id, invoice=invoice, duration=duration)
+    headers = {"Location": str(request.url_for("get_job_result", job_id=job.id))}
+    return _job_result_response(job, headers)
+
+
+@app.get("/health/ready")
+def get_readiness():
+    code = status.HTTP_200_OK if readiness.ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=code, content=readiness.payload())
+
+
+@app.get("/receipts/groups/{group_id}")
+def get_group_status(
+    request: Request,
+    group_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+):
+    request.state.logger.info("get_group_status", group_id=group_id, offset=offset, limit=limit)
+    counts = job_store.count_by_status(group_id=group_id)
+    total = sum(counts.values())
+    if total == 0:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    body = {
+        **_group_progress_payload(group_id, counts),
+        "offset": offset,
+        "limit": limit,
+        "jobs": [_group_member_payload(job) for job in job_store.list_group(group_id, offset=offset, limit=limit)],
+    }
+    if offset + limit < total:
+        body["next_url"] = str(request.url.include_query_params(offset=offset + limit, limit=limit))
+    return body
+
+
+# An event stream yields ("status" | "progress", payload) pairs, or (None, None) as a heartbeat
+EventStream = AsyncIterator[Tuple[Optional[str], Optional[dict]]]
+
+
+async def _next_event(subscription: Subscription):
+    try:
+        return await asyncio.wait_for(subscription.queue.get(), timeout=EVENT_STREAM_HEARTBEAT_SECONDS)
+    except asyncio.TimeoutError:
+        return None
+
+
+def _stored_events(jobs: List[Job]) -> List[JobEvent]:
+    return [JobEvent(job.id, job.status, error=job.error) for job in jobs]
+
+
+async def _job_events(subscription: Subscription, job: Job) -> EventStream:
+    """
+    Streams ``job``'s current status, then each transition until it finishes.
+    With a store shared between processes each heartbeat re-reads the job,
+    since a job finished by another process never notifies this one.
+    """
+    try:
+        job_id, last = job.id, job.status
+        yield "status", _job_status_payload(job)
+        while last not in TERMINAL_STATUSES:
+            event = await _next_event(subscription)
+            if event is None:
+                yield None, None
+                stored = job_store.get(job_id) if job_store.shared else None
+                if stored is None:
+                    continue
+                event = _stored_events([stored])[0]
+            # Skip transitions that happened before the job was read
+            if STATUS_ORDER[event.status] <= STATUS_ORDER[last]:
+                continue
+            last = event.status
+            yield "status", _job_event_payload(event)
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+async def _group_events(subscription: Subscription, group_id: str, jobs: List[Job]) -> EventStream:
+    """
+    Streams the group's counts, then every member transition and the updated
+    counts, until all finish. With a store shared between processes each
+    heartbeat compares the stored counts, and re-reads the members if they
+    moved on, as :func:`_job_events` re-reads its job.
+    """
+    try:
+        statuses = {job.id: job.status for job in jobs}
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update(Counter(statuses.values()))
+        progress = _group_progress_payload(group_id, counts)
+        yield "progress", progress
+        while progress["status"] != "completed":
+            event = await _next_event(subscription)
+            if event is None:
+                yield None, None
+                if not job_store.shared or job_store.count_by_status(group_id=group_id) == counts:
+                    continue
+                events = _stored_events(job_store.list_group(group_id, limit=len(statuses)))
+            else:
+                events = [event]
+            for event in events:
+                previous = statuses.get(event.job_id)
+                if previous is not None and STATUS_ORDER[event.status] <= STATUS_ORDER[previous]:
+                    continue
+                if previous is not None:
+                    counts[previous] -= 1
+                counts[event.status] += 1
+                statuses[event.job_id] = event.status
+                yield "status", _job_event_payload(event)
+                progress = _group_progress_payload(group_id, counts)
+                yield "progress", progress
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+def _open_job_events(job_id: str) -> EventStream:
+    # Subscribe before reading the job so no transition falls between the two
+    subscription = event_broker.subscribe(job_id=job_id)
+    job = job_store.get(job_id)
+    if not job:
+        event_broker.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_events(subscription, job)
+
+
+def _open_group_events(group_id: str) -> EventStream:
+    subscription = event_broker.subscribe(group_id=group_id)
+    total = sum(job_store.count_by_status(group_id=group_id).values())
+    if total == 0:
+        event_broker.unsubscribe(subscription)
+        raise HTTPException(status_code=404, detail="Group not found")
+    return _group_events(subscription, group_id, job_store.list_group(group_id, limit=total))
+
+
+async def _server_sent_events(events: EventStream) -> AsyncIterator[str]:
+    async for name, payload in events:
+        if name is None:
+            yield ": keep-alive\n\n"
+        else:
+            yield f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _send_websocket_events(websocket: WebSocket, open_events) -> None:
+    try:
+        events = open_events()
+    except HTTPException as exc:
+        await websocket.close(code=4404, reason=exc.detail)
+        return
+    await websocket.accept()
+    try:
+        async for name, payload in events:
+            if name is not None:
+                await websocket.send_json({"event": name, **payload})
+    except WebSocketDisconnect:
+        return
+    finally:
+        await events.aclose()
+    await websocket.close()
+
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.get("/receipts/groups/{group_id}/events")
+async def get_group_events(request: Request, group_id: str):
+    request.state.logger.info("get_group_events", group_id=group_id)
+    events = _open_group_events(group_id)
+    return StreamingResponse(_server_sent_events(events), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@app.websocket("/receipts/groups/{group_id}/ws")
+async def group_events_websocket(websocket: WebSocket, group_id: str):
+    await _send_websocket_events(websocket, lambda: _open_group_events(group_id))
+
+
+@app.get("/receipts/{job_id}/events")
+async def get_job_events(request: Request, job_id: str):
+    request.state.logger.info("get_job_events", job_id=job_id)
+    events = _open_job_events(job_id)
+    return StreamingResponse(_server_sent_events(events), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@app.websocket("/receipts/{job_id}/ws")
+async def job_events_websocket(websocket: WebSocket, job_id: str):
+    await _send_websocket_events(websocket, lambda: _open_job_events(job_id))
+
+
 @app.get("/receipts/{job_id}/status")
 def get_job_status(request: Request, job_id: str):
     request.state.logger.info("get_job_status", job_id=job_id)
@@ -143,15 +858,42 @@ def get_job_status(request: Request, job_id: str):
     return _job_status_payload(job)
 
 
+async def _wait_until_finished(job_id: str, timeout: float) -> Optional[Job]:
+    """
+    Returns the job once it has finished or ``timeout`` seconds have passed, as
+    read from the store at that point. A store shared between processes is
+    re-read every ``LONG_POLL_RECHECK_SECONDS`` as well, since jobs finished by
+    another process never notify this one.
+    """
+    recheck = LONG_POLL_RECHECK_SECONDS if job_store.shared else 0
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    async with event_broker.watch_finished(job_id) as finished:
+        job = job_store.get(job_id)
+        while job is not None and job.status not in TERMINAL_STATUSES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=min(remaining, recheck) if recheck > 0 else remaining)
+            except asyncio.TimeoutError:
+                pass
+            job = job_store.get(job_id)
+    return job
+
+
 @app.get("/receipts/{job_id}")
-def get_job_result(request: Request, job_id: str):
-    request.state.logger.info("get_job_result", job_id=job_id)
-    job = job_store.get(job_id)
+async def get_job_result(request: Request, job_id: str, wait: float = Query(0, ge=0)):
+    request.state.logger.info("get_job_result", job_id=job_id, wait=wait)
+    if wait > 0:
+        job = await _wait_until_finished(job_id, min(wait, LONG_POLL_MAX_SECONDS))
+    else:
+        job = job_store.get(job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
     if job.status == "completed":
-        return _job_result_payload(job)
+        return _job_result_response(job)
     if job.status == "failed":
         raise HTTPException(status_code=500, detail=job.error or "Parsing failed")
 
@@ -1,8 +1,127 @@
-from prometheus_client import Gauge
+from prometheus_client import Counter, Gauge, Histogram
 from prometheus_fastapi_instrumentator import Instrumentator
 
 job_queue_depth = Gauge(
-    "receipt_parser_job_queue_depth", "Number of jobs in the queue"
+    "receipt_parser_job_queue_depth", "Number of jobs waiting for a worker, by lane (interactive, batch)", ["lane"]
+)
+
+job_queue_wait_seconds = Histogram(
+    "receipt_parser_job_queue_wait_seconds",
+    "Time a job waited in the queue before a worker picked it up, by lane",
+    ["lane"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+jobs_in_flight = Gauge(
+    "receipt_parser_jobs_in_flight", "Jobs taken from the queue and being parsed by a worker"
+)
+
+queue_saturation = Gauge(
+    "receipt_parser_queue_saturation",
+    "Fraction of job queue slots in use by lane (1 means new uploads to the lane are rejected)",
+    ["lane"],
+)
+
+worker_utilization = Gauge(
+    "receipt_parser_worker_utilization", "Fraction of job worker threads busy with a job"
+)
+
+worker_unique_memory_bytes = Gauge(
+    "receipt_parser_worker_unique_memory_bytes",
+    "Memory used by an inference worker process alone (USS), by process id; pages shared with "
+    "other processes, such as memory-mapped weights, are not counted",
+    ["pid"],
+)
+
+seconds_per_job = Gauge(
+    "receipt_parser_seconds_per_job", "Moving average of parse time per job, used for estimated_seconds"
+)
+
+admission_rejections = Counter(
+    "receipt_parser_admission_rejections", "Uploads rejected with 503 because the job queue was full"
+)
+
+job_store_jobs = Gauge(
+    "receipt_parser_job_store_jobs", "Number of jobs held by the job store"
+)
+
+job_store_bytes = Gauge(
+    "receipt_parser_job_store_bytes", "Estimated bytes of job data held by the job store"
+)
+
+upload_memory_bytes = Gauge(
+    "receipt_parser_upload_memory_bytes", "Bytes of queued uploads held in memory instead of on disk"
+)
+
+event_subscribers = Gauge(
+    "receipt_parser_event_subscribers", "Open job event streams (Server-Sent Events and WebSocket)"
+)
+
+long_poll_waiters = Gauge(
+    "receipt_parser_long_poll_waiters", "Requests waiting for a job to finish (?wait= long polls)"
+)
+
+sync_waiters = Gauge(
+    "receipt_parser_sync_waiters", "Uploads with ?sync=true waiting for their result"
+)
+
+sync_fallbacks = Counter(
+    "receipt_parser_sync_fallbacks",
+    "?sync=true uploads answered with 202 instead, by reason (timeout, saturated)",
+    ["reason"],
+)
+
+batch_size = Histogram(
+    "receipt_parser_batch_size",
+    "Number of images per inference batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+batch_wait_seconds = Histogram(
+    "receipt_parser_batch_wait_seconds",
+    "Time the oldest request of a batch waited before the batch was dispatched",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+result_cache_requests = Counter(
+    "receipt_parser_result_cache_requests",
+    "Result cache lookups by outcome (hit, miss, coalesced)",
+    ["outcome"],
+)
+
+decoded_tokens = Histogram(
+    "receipt_parser_decoded_tokens",
+    "Number of tokens decoded per receipt",
+    buckets=(16, 32, 64, 128, 256, 384, 512, 768),
+)
+
+parse_stage_seconds = Histogram(
+    "receipt_parser_parse_stage_seconds",
+    "Time per receipt spent in each parse stage "
+    "(image_load, preprocess, generate, batch_decode, json_mapping, validation); "
+    "stages shared by an inference batch count each receipt's share",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+decode_tokens_per_second = Histogram(
+    "receipt_parser_decode_tokens_per_second",
+    "Tokens decoded per second of a receipt's share of generate time, per receipt",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+decode_stops = Counter(
+    "receipt_parser_decode_stops",
+    "Why decoding of a receipt stopped (eos, structure_closed, repetition, max_new_tokens)",
+    ["reason"],
+)
+
+model_load_seconds = Gauge(
+    "receipt_parser_model_load_seconds", "Time taken to load the model at startup"
+)
+
+model_warmup_seconds = Gauge(
+    "receipt_parser_model_warmup_seconds", "Time taken by the warm-up inference at startup"
 )
 
 instrumentator = Instrumentator()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import heapq
+from itertools import count
+from queue import Full
+from threading import Condition
+from time import monotonic
+from typing import Dict, Generic, List, Mapping, Optional, Tuple, TypeVar
+
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+# Lanes in priority order: a worker only takes batch work when no interactive job is queued
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+
+DEFAULT_TENANT = "default"
+
+T = TypeVar("T")
+
+
+def parse_tenant_weights(raw: str) -> Dict[str, float]:
+    """Parses ``"acme=2,globex=0.5"`` into a mapping of tenant to scheduling weight."""
+    weights = {}
+    for part in raw.split(","):
+        if not part.strip():
+            continue
+        tenant, _, weight = part.partition("=")
+        value = float(weight)
+        if value <= 0:
+            raise ValueError(f"Tenant weight must be positive: {part.strip()}")
+        weights[tenant.strip()] = value
+    return weights
+
+
+class _Lane:
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        # Entries are (finish tag, sequence, start tag, tenant, item)
+        self.heap: List[Tuple[float, int, float, str, object]] = []
+        self.virtual_time = 0.0
+        # Finish tag of the last queued item per tenant, for tenants with queued items
+        self.finish_tags: Dict[str, float] = {}
+
+
+class FairQueue(Generic[T]):
+    """
+    Bounded job queue with priority lanes and weighted fair queuing per tenant.
+
+    Lanes are served in the order of ``LANES`` and each has its own capacity,
+    so a large batch upload neither delays nor crowds out interactive uploads.
+    Within a lane, tenants share the workers in proportion to their weights:
+    every item gets a virtual finish tag of ``start + cost / weight``, where
+    ``start`` is the later of the lane's virtual time and the tenant's previous
+    finish tag, and items are taken in tag order. A tenant queuing thousands of
+    receipts therefore only gets ahead of the others by its weight, while an
+    idle tenant starts at the current virtual time instead of banking credit.
+    """
+
+    def __init__(self, sizes: Mapping[str, int], weights: Optional[Mapping[str, float]] = None) -> None:
+        self._lanes = {lane: _Lane(sizes[lane]) for lane in LANES}
+        self._weights = dict(weights or {})
+        self._sequence = count()
+        self._closed = False
+        self._condition = Condition()
+
+    def put(
+        self,
+        item: T,
+        *,
+        lane: str,
+        tenant: str = DEFAULT_TENANT,
+        cost: int = 1,
+        timeout: float = 0,
+    ) -> None:
+        """
+        Queues ``item`` for ``tenant``; ``cost`` is the number of jobs it holds.
+        Waits up to ``timeout`` seconds for space and raises ``queue.Full``.
+        """
+        queue = self._lanes[lane]
+        deadline = monotonic() + timeout
+        with self._condition:
+            while queue.maxsize > 0 and len(queue.heap) >= queue.maxsize:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise Full
+                self._condition.wait(remaining)
+            start = max(queue.virtual_time, queue.finish_tags.get(tenant, 0.0))
+            finish = start + cost / self._weights.get(tenant, 1.0)
+            queue.finish_tags[tenant] = finish
+            heapq.heappush(queue.heap, (finish, next(self._sequence), start, tenant, item))
+            self._condition.notify_all()
+
+    def get(self) -> Optional[T]:
+        """Blocks until an item is queued; returns None once closed and drained."""
+        with self._condition:
+            while True:
+                for queue in self._lanes.values():
+                    if queue.heap:
+                        finish, _, start, tenant, item = heapq.heappop(queue.heap)
+                        queue.virtual_time = max(queue.virtual_time, start)
+                        if queue.finish_tags.get(tenant) == finish:
+                            # The tenant has nothing else queued in this lane
+                            del queue.finish_tags[tenant]
+                        self._condition.notify_all()
+                        return item
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def qsize(self, lane: Optional[str] = None) -> int:
+        with self._condition:
+            if lane is not None:
+                return len(self._lanes[lane].heap)
+            return sum(len(queue.heap) for queue in self._lanes.values())
+
+    def maxsize(self, lane: str) -> int:
+        return self._lanes[lane].maxsize
+
+    def full(self, lane: str) -> bool:
+        queue = self._lanes[lane]
+        with self._condition:
+            return queue.maxsize > 0 and len(queue.heap) >= queue.maxsize
+
+    def close(self) -> None:
+        """Makes ``get`` return None once the queued items are taken."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def reopen(self) -> None:
+        with self._condition:
+            self._closed = False
@@ -0,0 +1,59 @@
+"""
+Response bodies of completed jobs, serialized once when the job completes.
+
+Clients poll completed jobs repeatedly, so the job store keeps the finished
+``GET /receipts/{job_id}`` body as bytes next to the result and the endpoint
+returns it as is, instead of decoding and re-encoding the invoice on every
+request. Encoding uses orjson; amounts are written as strings, like
+``Invoice.json()`` does.
+"""
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+
+from receipt_reader.parser import MODEL_VERSION
+from receipt_reader.types import Invoice
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=_default)
+
+
+def loads(data: bytes) -> Any:
+    return orjson.loads(data)
+
+
+def result_meta(invoice_meta: dict, duration: Optional[float]) -> dict:
+    """The ``meta`` block of a result: processing time, model and decoding details."""
+    meta = {
+        "processing_time_seconds": round(duration or 0.0, 3),
+        "model_version": invoice_meta.get("model_version", MODEL_VERSION),
+    }
+    decoding = invoice_meta.get("decoding")
+    if decoding:
+        meta["decoded_tokens"] = decoding["tokens"]
+        meta["stop_reason"] = decoding["stop_reason"]
+    timings = invoice_meta.get("timings")
+    if timings:
+        meta["stage_seconds"] = timings
+    return meta
+
+
+def result_body(job_id: str, parsed: dict, meta: dict) -> bytes:
+    return dumps({"job_id": job_id, "status": "completed", "parsed": parsed, "meta": meta})
+
+
+def result_bodies(job_ids: Iterable[str], invoice: Invoice, duration: float) -> Dict[str, bytes]:
+    """Bodies for jobs completed with the same invoice; the invoice is only converted once."""
+    parsed = invoice.dict()
+    meta = result_meta(invoice.meta, duration)
+    return {job_id: result_body(job_id, parsed, meta) for job_id in job_ids}
@@ -1,47 +1,177 @@
 from __future__ import annotations
-import shutil
-from pathlib import Path
+import hashlib
+import io
+import mimetypes
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from threading import Lock
+from typing import BinaryIO, Dict, Iterator, Optional, Union
 from fastapi import HTTPException, UploadFile
 from . import config
 
+@dataclass(frozen=True)
+class SavedUpload:
+    """An accepted upload; ``path`` is None while the bytes are held in memory."""
+
+    path: Optional[Path]
+    content_hash: str
+    size: int
+
+    @property
+    def in_memory(self) -> bool:
+        return self.path is None
+
+
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+
+
+@dataclass
+class UploadMember:
+    """One receipt of a batch upload; ``error`` is set when it was rejected."""
+
+    filename: str
+    content_type: Optional[str]
+    file: Optional[BinaryIO]
+    error: Optional[str] = None
+
+
+def iter_upload_members(upload: UploadFile) -> Iterator[UploadMember]:
+    """
+    Yields the receipts in a batch upload part: the file itself, or each file of
+    a zip archive. Archive members are decompressed one at a time while they
+    are read, so the archive is never unpacked as a whole.
+    """
+    filename = upload.filename or "receipt"
+    if upload.content_type not in ZIP_CONTENT_TYPES and not filename.lower().endswith(".zip"):
+        yield UploadMember(filename, upload.content_type, upload.file)
+        return
+    try:
+        archive = zipfile.ZipFile(upload.file)
+    except zipfile.BadZipFile:
+        yield UploadMember(filename, upload.content_type, None, error="Invalid zip archive")
+        return
+    with archive:
+        for info in archive.infolist():
+            name = PurePosixPath(info.filename)
+            # Skip folders and the resource forks macOS adds to archives
+            if info.is_dir() or name.name.startswith(".") or "__MACOSX" in name.parts:
+                continue
+            content_type, _ = mimetypes.guess_type(name.name)
+            with archive.open(info) as member:
+                yield UploadMember(info.filename, content_type, member)
+
+
 class StorageService:
-    def __init__(self, uploads_dir: Path):
+    """
+    Stores uploads until a worker parses them.
+
+    Uploads up to ``memory_threshold`` bytes are kept in memory and handed to
+    the parser as bytes; larger ones, and any upload saved with ``spill=True``,
+    are streamed to ``uploads_dir``. A threshold of 0 writes every upload to disk.
+    """
+
+    def __init__(self, uploads_dir: Path, memory_threshold: int = 0):
         self._uploads_dir = uploads_dir
         self._uploads_dir.mkdir(parents=True, exist_ok=True)
+        self._memory_threshold = memory_threshold
+        self._buffers: Dict[str, bytes] = {}
+        self._lock = Lock()
+
+    def save_upload(self, job_id: str, upload: UploadFile, *, spill: bool = False) -> SavedUpload:
+        return self.save_file(
+            job_id, upload.file, filename=upload.filename, content_type=upload.content_type, spill=spill
+        )
 
-    def save_upload(self, job_id: str, upload: UploadFile) -> Path:
-        self._validate_content_type(upload)
-        suffix = Path(upload.filename or "receipt").suffix or ".png"
+    def save_file(
+        self,
+        job_id: str,
+        file: BinaryIO,
+        *,
+        filename: Optional[str],
+        content_type: Optional[str],
+        spill: bool = False,
+    ) -> SavedUpload:
+        self._validate_content_type(content_type)
+        suffix = Path(filename or "receipt").suffix or ".png"
         destination = self._uploads_dir / f"{job_id}{suffix}"
+        threshold = 0 if spill else self._memory_threshold
 
         try:
-            self._stream_to_disk(upload, destination)
+            digest, size, data = self._spool(file, destination, threshold)
         except Exception as exc:
             destination.unlink(missing_ok=True)
             raise exc
 
-        return destination
+        if data is not None:
+            with self._lock:
+                self._buffers[job_id] = data
+            return SavedUpload(path=None, content_hash=digest, size=size)
+        return SavedUpload(path=destination, content_hash=digest, size=size)
+
+    def source(self, job_id: str, path: Optional[Path]) -> Union[bytes, str]:
+        """Returns what to hand the parser for ``job_id``: its bytes if held in memory, else its path."""
+        with self._lock:
+            data = self._buffers.get(job_id)
+        if data is not None:
+            return data
+        if path is None:
+            raise FileNotFoundError(f"No stored upload for job {job_id}")
+        return str(path)
+
+    def discard(self, job_id: str, path: Optional[Path]) -> None:
+        """Drops the stored upload of ``job_id``, in memory or on disk."""
+        with self._lock:
+            self._buffers.pop(job_id, None)
+        if path is not None:
+            self.cleanup(path)
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(len(data) for data in self._buffers.values())
 
     @staticmethod
     def cleanup(file_path: str | Path) -> None:
         Path(file_path).unlink(missing_ok=True)
 
-    def _validate_content_type(self, upload: UploadFile) -> None:
-        if upload.content_type not in config.ALLOWED_CONTENT_TYPES:
+    def _validate_content_type(self, content_type: Optional[str]) -> None:
+        if content_type not in config.ALLOWED_CONTENT_TYPES:
             raise HTTPException(status_code=400, detail="Invalid file type")
 
-    def _stream_to_disk(self, upload: UploadFile, destination: Path) -> None:
+    def _spool(self, file: BinaryIO, destination: Path, threshold: int) -> tuple[str, int, Optional[bytes]]:
+        """
+        Reads the upload into memory until it grows past ``threshold`` bytes,
+        then moves it to ``destination`` and streams the rest there. Returns the
+        SHA-256 hex digest, the size, and the bytes if the upload stayed in memory.
+        """
         size = 0
-        with destination.open("wb") as fh:
-            while chunk := upload.file.read(4096):
+        digest = hashlib.sha256()
+        buffer = io.BytesIO()
+        fh = None
+        try:
+            while chunk := file.read(4096):
                 size += len(chunk)
                 if size > config.MAX_FILE_SIZE:
                     raise HTTPException(
                         status_code=413,
                         detail=f"File size exceeds limit of {config.MAX_FILE_SIZE / 1024 / 1024:.0f} MB",
                     )
-                fh.write(chunk)
+                digest.update(chunk)
+                if fh is None and size > threshold:
+                    fh = destination.open("wb")
+                    fh.write(buffer.getbuffer())
+                    buffer = io.BytesIO()
+                (buffer if fh is None else fh).write(chunk)
+        finally:
+            if fh is not None:
+                fh.close()
+        if fh is None and threshold > 0:
+            return digest.hexdigest(), size, buffer.getvalue()
+        if fh is None:
+            # Empty upload with in-memory mode off: still leave a file behind
+            destination.touch()
+        return digest.hexdigest(), size, None
 
 def get_storage_service() -> StorageService:
     """Factory to create a StorageService with the latest config."""
-    return StorageService(config.UPLOADS_DIR)
+    return StorageService(config.UPLOADS_DIR, memory_threshold=config.UPLOAD_MEMORY_THRESHOLD_BYTES)
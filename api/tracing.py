@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from time import time_ns
+from typing import Iterator, Sequence
+
+from opentelemetry import trace
+
+from receipt_reader.parser import MODEL_VERSION
+from receipt_reader.stages import PER_RECEIPT_STAGES, STAGE_GENERATE, STAGES
+from receipt_reader.types import Invoice
+
+tracer = trace.get_tracer("receipt_parser")
+
+
+@contextmanager
+def job_span(name: str, job_ids: Sequence[str]) -> Iterator[trace.Span]:
+    """Span around a worker handling one job or a chunk of a batch upload."""
+    with tracer.start_as_current_span(name) as span:
+        if span.is_recording():
+            span.set_attribute("receipt.job_ids", list(job_ids))
+        yield span
+
+
+@contextmanager
+def parse_span(job_ids: Sequence[str]) -> Iterator[trace.Span]:
+    """Span around one inference call, parent of the stage spans added by :func:`record_stages`."""
+    with tracer.start_as_current_span("parse_receipts") as span:
+        if span.is_recording():
+            span.set_attribute("receipt.model_version", MODEL_VERSION)
+            span.set_attribute("receipt.batch_size", len(job_ids))
+        yield span
+
+
+def record_stages(span: trace.Span, invoices: Sequence[Invoice]) -> None:
+    """
+    Adds a child span per parse stage to ``span`` from the invoices' stage timings.
+
+    Inference may run in a worker process, so the stages are not traced live:
+    their durations come back in ``invoice.meta["timings"]`` and the spans are
+    laid out back to back, ending now. Does nothing unless ``span`` is recording.
+    """
+    if not invoices or not span.is_recording():
+        return
+    first = invoices[0]
+    seconds = dict(first.meta.get("timings") or {})
+    for stage in PER_RECEIPT_STAGES:
+        if stage in seconds:
+            seconds[stage] = sum((invoice.meta.get("timings") or {}).get(stage, 0.0) for invoice in invoices)
+    tokens = sum((invoice.meta.get("decoding") or {}).get("tokens", 0) for invoice in invoices)
+    span.set_attribute("receipt.decoded_tokens", tokens)
+
+    attributes = {"receipt.model_version": MODEL_VERSION}
+    image_size = first.meta.get("image_size")
+    if len(invoices) == 1 and image_size:
+        attributes["receipt.image.width"], attributes["receipt.image.height"] = image_size
+    stages = [stage for stage in STAGES if stage in seconds]
+    start = time_ns() - sum(int(seconds[stage] * 1e9) for stage in stages)
+    context = trace.set_span_in_context(span)
+    for stage in stages:
+        end = start + int(seconds[stage] * 1e9)
+        stage_attributes = dict(attributes)
+        if stage == STAGE_GENERATE:
+            stage_attributes["receipt.decoded_tokens"] = tokens
+        stage_span = tracer.start_span(f"parse.{stage}", context=context, start_time=start, attributes=stage_attributes)
+        stage_span.end(end_time=end)
+        start = end
@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from queue import Full
+from threading import Barrier, Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, List, Literal, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import structlog
+from opentelemetry import context as otel_context
+
+from receipt_reader import parser
+from receipt_reader.decoding import DecodeSettings
+from receipt_reader.types import Invoice
+
+from .batching import Source
+from .jobs import timed
+from .metrics import job_queue_wait_seconds, worker_unique_memory_bytes
+from .scheduling import DEFAULT_TENANT, LANE_BATCH, LANE_INTERACTIVE, LANES, FairQueue
+
+log = structlog.get_logger()
+
+WorkerMode = Literal["thread", "process"]
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept more work."""
+
+
+# Barrier shared by the pool processes, set by the pool initializer
+_pool_barrier: Optional[Barrier] = None
+
+
+def unique_memory_bytes(pid: int) -> Optional[int]:
+    """
+    Memory that process ``pid`` alone uses (its USS): its private pages, not
+    those shared with other processes such as memory-mapped model weights.
+    None where ``/proc`` does not report it.
+    """
+    try:
+        rollup = Path(f"/proc/{pid}/smaps_rollup").read_text()
+    except OSError:
+        return None
+    kilobytes = 0
+    for line in rollup.splitlines():
+        if line.startswith(("Private_Clean:", "Private_Dirty:")):
+            kilobytes += int(line.split()[1])
+    return kilobytes * 1024
+
+
+class WorkerStart(NamedTuple):
+    """What a pool process reports once its initializer has run."""
+
+    pid: int
+    # Load and warm-up durations, or None if warming up failed
+    timings: Optional[Tuple[float, float]]
+    error: Optional[str] = None
+
+
+def _init_worker(
+    backend: str,
+    backend_options: dict,
+    decode_settings: DecodeSettings,
+    started: Optional[multiprocessing.SimpleQueue] = None,
+    barrier: Optional[Barrier] = None,
+) -> None:
+    """Loads and warms the model once per worker process, then reports a :class:`WorkerStart` to ``started``."""
+    global _pool_barrier
+    _pool_barrier = barrier
+    parser.set_backend(backend, **backend_options)
+    parser.set_decode_settings(decode_settings)
+    report = WorkerStart(os.getpid(), None)
+    try:
+        report = WorkerStart(os.getpid(), _warm_up())
+    except Exception as exc:
+        # Surface the error from warm_up() and the first parse instead of breaking the pool
+        log.warning("worker_warm_up_failed", error=str(exc))
+        report = WorkerStart(os.getpid(), None, str(exc) or type(exc).__name__)
+    finally:
+        if started is not None:
+            started.put(report)
+
+
+def _join_pool() -> None:
+    """Blocks until every pool process runs this task, so the pool has to start all of them."""
+    assert _pool_barrier is not None, "_pool_barrier is set by _init_worker"
+    _pool_barrier.wait()
+
+
+def _parse_in_worker(source: Source) -> Invoice:
+    if isinstance(source, bytes):
+        return parser.parse_bytes(source)
+    return parser.parse_image(source)
+
+
+def _parse_many_in_worker(sources: Sequence[Source]) -> List[Invoice]:
+    return parser.parse_images(sources)
+
+
+def _warm_up() -> Tuple[float, float]:
+    """Loads and warms the model, returning the load and warm-up durations."""
+    _, load_seconds = timed(parser._get_model)
+    _, warmup_seconds = timed(parser.warm_up)
+    return load_seconds, warmup_seconds
+
+
+class _QueueItem(NamedTuple):
+    job_ids: Tuple[str, ...]
+    chunk: bool
+    lane: str
+    enqueued_at: float
+    # Trace context of the request that submitted the job, so its spans continue the request's trace
+    context: otel_context.Context
+
+
+class JobExecutor:
+    """
+    Runs parse jobs on dedicated worker threads, fed by a bounded queue of job ids.
+
+    The queue has an ``interactive`` lane for single uploads and a ``batch`` lane
+    for batch uploads, each bounded separately; workers drain the interactive
+    lane first and share each lane fairly between tenants (see :class:`FairQueue`).
+
+    In ``thread`` mode the workers run inference themselves. In ``process`` mode
+    each worker thread hands inference to a pool of worker processes, so the API
+    process only waits on results and stays responsive to status polls. The
+    memory each process running inference uses alone is exported as
+    ``receipt_parser_worker_unique_memory_bytes``.
+
+    Jobs submitted together with :meth:`submit_many` take one queue slot and are
+    handed to ``chunk_handler`` as a list, so they can share one inference batch.
+
+    ``threads`` worker threads (by default ``workers``) take jobs off the
+    queue. More threads than inference workers let handlers that wait on a
+    shared batch, such as a :class:`BatchingEngine`, fill it.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str], None],
+        parse: Callable[[Source], Invoice],
+        *,
+        workers: int,
+        queue_size: int,
+        threads: Optional[int] = None,
+        batch_queue_size: Optional[int] = None,
+        tenant_weights: Optional[Mapping[str, float]] = None,
+        mode: WorkerMode = "thread",
+        chunk_handler: Optional[Callable[[List[str]], None]] = None,
+        parse_many: Callable[[Sequence[Source]], List[Invoice]] = parser.parse_images,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if threads is not None and threads < 1:
+            raise ValueError("threads must be at least 1")
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown worker mode: {mode}")
+        self._handler = handler
+        self._chunk_handler = chunk_handler
+        self._parse = parse
+        self._parse_many = parse_many
+        self._workers = workers
+        self._threads_count = threads or workers
+        self._mode = mode
+        if batch_queue_size is None:
+            batch_queue_size = queue_size
+        self._queue: FairQueue[_QueueItem] = FairQueue(
+            {LANE_INTERACTIVE: queue_size, LANE_BATCH: batch_queue_size}, tenant_weights
+        )
+        self._threads: List[Thread] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # Pool processes report a WorkerStart here once warmed up
+        self._started_workers: Optional[multiprocessing.SimpleQueue] = None
+        self._pool_barrier: Optional[Barrier] = None
+        self._worker_pids: List[int] = []
+        self._worker_starts: Dict[int, WorkerStart] = {}
+        self._lock = Lock()
+        # Jobs waiting in each lane and jobs being handled (a chunk counts each of its jobs),
+        # and workers running a job or chunk
+        self._pending_jobs: Dict[str, int] = dict.fromkeys(LANES, 0)
+        self._running_jobs = 0
+        self._busy_workers = 0
+        self._counts_lock = Lock()
+
+    @property
+    def workers(self) -> int:
+        return self._workers
+
+    @property
+    def threads(self) -> int:
+        return self._threads_count
+
+    def queue_size(self, lane: str = LANE_INTERACTIVE) -> int:
+        return self._queue.maxsize(lane)
+
+    def queue_depth(self, lane: Optional[str] = None) -> int:
+        """Queued items of ``lane``, or of all lanes; a chunk is one item."""
+        return self._queue.qsize(lane)
+
+    def is_full(self, lane: str = LANE_INTERACTIVE) -> bool:
+        return self._queue.full(lane)
+
+    def pending_jobs(self, lane: Optional[str] = None) -> int:
+        """Jobs waiting in ``lane``, or in all lanes."""
+        with self._counts_lock:
+            if lane is not None:
+                return self._pending_jobs[lane]
+            return sum(self._pending_jobs.values())
+
+    def running_jobs(self) -> int:
+        """Jobs taken from the queue whose handler has not returned yet."""
+        with self._counts_lock:
+            return self._running_jobs
+
+    def busy_workers(self) -> int:
+        with self._counts_lock:
+            return self._busy_workers
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._queue.reopen()
+            if self._mode == "process":
+                context = multiprocessing.get_context("spawn")
+                self._started_workers = context.SimpleQueue()
+                self._pool_barrier = context.Barrier(self._workers)
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(
+                        *parser.backend_config(),
+                        parser.get_decode_settings(),
+                        self._started_workers,
+                        self._pool_barrier,
+                    ),
+                )
+            else:
+                self._track_worker(os.getpid())
+            for index in range(self._threads_count):
+                thread = Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            threads, self._threads = self._threads, []
+            process_pool, self._process_pool = self._process_pool, None
+            self._started_workers = None
+            pool_barrier, self._pool_barrier = self._pool_barrier, None
+            pool_pids = self._worker_pids if process_pool is not None else []
+            self._worker_pids = []
+            self._worker_starts = {}
+        if pool_barrier is not None:
+            # Release warm-up tasks still waiting for processes that will not come
+            pool_barrier.abort()
+        self._queue.close()
+        for thread in threads:
+            thread.join()
+        if process_pool is not None:
+            process_pool.shutdown()
+        for pid in pool_pids:
+            worker_unique_memory_bytes.remove(str(pid))
+
+    def worker_pids(self) -> List[int]:
+        """Processes running inference: the pool processes started (and warmed up) so far, or this process."""
+        self._collect_started_workers()
+        with self._lock:
+            return list(self._worker_pids)
+
+    def _collect_started_workers(self) -> None:
+        # The pool starts processes on demand, so new ones may have reported since the last call
+        with self._lock:
+            started = self._started_workers
+            while started is not None and not started.empty():
+                report = started.get()
+                self._worker_starts[report.pid] = report
+                self._track_worker(report.pid)
+
+    def _track_worker(self, pid: int) -> None:
+        if pid in self._worker_pids:
+            return
+        self._worker_pids.append(pid)
+        if unique_memory_bytes(pid) is not None:
+            worker_unique_memory_bytes.labels(pid=str(pid)).set_function(lambda: unique_memory_bytes(pid) or 0)
+
+    def submit(self, job_id: str, *, lane: str = LANE_INTERACTIVE, tenant: str = DEFAULT_TENANT) -> None:
+        self.start()
+        item = _QueueItem((job_id,), False, lane, perf_counter(), otel_context.get_current())
+        self._put(item, tenant=tenant, timeout=0)
+
+    def submit_many(
+        self,
+        job_ids: Sequence[str],
+        *,
+        lane: str = LANE_BATCH,
+        tenant: str = DEFAULT_TENANT,
+        timeout: float = 0,
+    ) -> None:
+        """
+        Queues ``job_ids`` as one chunk, waiting up to ``timeout`` seconds for
+        space in the lane before raising :class:`QueueFullError`.
+        """
+        if self._chunk_handler is None:
+            raise ValueError("submit_many requires a chunk_handler")
+        self.start()
+        item = _QueueItem(tuple(job_ids), True, lane, perf_counter(), otel_context.get_current())
+        self._put(item, tenant=tenant, timeout=timeout)
+
+    def _put(self, item: _QueueItem, *, tenant: str, timeout: float) -> None:
+        # Count the jobs first so a worker picking the item up never sees a negative count
+        with self._counts_lock:
+            self._pending_jobs[item.lane] += len(item.job_ids)
+        try:
+            self._queue.put(item, lane=item.lane, tenant=tenant, cost=len(item.job_ids), timeout=timeout)
+        except Full as exc:
+            with self._counts_lock:
+                self._pending_jobs[item.lane] -= len(item.job_ids)
+            raise QueueFullError(f"Job queue is full ({item.lane} lane)") from exc
+
+    def warm_up(self) -> Tuple[float, float]:
+        """
+        Loads and warms the model wherever inference runs and returns the
+        slowest load and warm-up durations in seconds.
+        """
+        self.start()
+        if self._process_pool is None:
+            return _warm_up()
+        # Each process warms itself up in the initializer. The pool starts processes on
+        # demand, so hold one task per worker at a barrier until every process is running.
+        futures = [self._process_pool.submit(_join_pool) for _ in range(self._workers)]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            self._pool_barrier.abort()
+            raise
+        self._collect_started_workers()
+        with self._lock:
+            reports = list(self._worker_starts.values())
+        failed = [report for report in reports if report.timings is None]
+        if failed:
+            raise RuntimeError(f"Worker {failed[0].pid} failed to warm up: {failed[0].error}")
+        return max(r.timings[0] for r in reports), max(r.timings[1] for r in reports)
+
+    def parse(self, source: Source) -> Invoice:
+        if self._process_pool is not None:
+            invoice = self._process_pool.submit(_parse_in_worker, source).result()
+            self._collect_started_workers()
+            return invoice
+        return self._parse(source)
+
+    def parse_many(self, sources: Sequence[Source]) -> List[Invoice]:
+        """Parses ``sources`` as one inference batch."""
+        if self._process_pool is not None:
+            invoices = self._process_pool.submit(_parse_many_in_worker, list(sources)).result()
+            self._collect_started_workers()
+            return invoices
+        return self._parse_many(sources)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            wait = perf_counter() - item.enqueued_at
+            for _ in item.job_ids:
+                job_queue_wait_seconds.labels(lane=item.lane).observe(wait)
+            with self._counts_lock:
+                self._pending_jobs[item.lane] -= len(item.job_ids)
+                self._running_jobs += len(item.job_ids)
+                self._busy_workers += 1
+            token = otel_context.attach(item.context)
+            try:
+                if item.chunk:
+                    self._chunk_handler(list(item.job_ids))
+                else:
+                    self._handler(item.job_ids[0])
+            except Exception as exc:  # pragma: no cover - handler reports its own failures
+                log.error("job_handler_crashed", job_ids=item.job_ids, error=str(exc))
+            finally:
+                otel_context.detach(token)
+                with self._counts_lock:
+                    self._running_jobs -= len(item.job_ids)
+                    self._busy_workers -= 1
@@ -0,0 +1,359 @@
+"""
+Load test of the upload, poll and result flow with a simulated model.
+
+Each client uploads a receipt, polls its status until it finishes, fetches
+the result and starts over, until the test duration is up. Inference runs on
+the ``simulated`` backend (see ``benchmarks.simulated``), so the test needs no
+model weights. By default the app runs in-process; ``--spawn`` starts it under
+a local uvicorn instead and ``--url`` targets a server that is already running:
+
+    python -m benchmarks.loadtest --clients 50 --duration 60
+    python -m benchmarks.loadtest --clients 200 --spawn --workers 4
+    INFERENCE_BACKEND=simulated uvicorn benchmarks.loadtest:app &
+    python -m benchmarks.loadtest --clients 500 --url http://127.0.0.1:8000
+
+The report covers throughput, latency percentiles from upload to result,
+error, 429 and 503 rates, and the server's memory growth.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import subprocess
+import sys
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from itertools import count
+from pathlib import Path
+from time import perf_counter
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import httpx
+import structlog
+
+from benchmarks import simulated
+
+UPLOAD_IMAGE = Path("tests/rewe.png")
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+def __getattr__(name: str):
+    # ``uvicorn benchmarks.loadtest:app`` serves the API with the simulated backend registered
+    if name == "app":
+        from api.main import app
+
+        return app
+    raise AttributeError(name)
+
+
+@dataclass
+class LoadTestOptions:
+    clients: int = 50
+    duration: float = 30.0
+    poll_interval: float = 0.5
+    # Wait on GET /receipts/{job_id}?wait= instead of polling the status endpoint
+    long_poll: bool = False
+    # Longest a client waits for one result before counting the job as timed out
+    result_timeout: float = 120.0
+
+
+@dataclass
+class _Stats:
+    started: float = field(default_factory=perf_counter)
+    latencies: List[float] = field(default_factory=list)
+    upload_latencies: List[float] = field(default_factory=list)
+    status_counts: Counter = field(default_factory=Counter)
+    failed_jobs: int = 0
+    timed_out_jobs: int = 0
+    memory_samples: List[int] = field(default_factory=list)
+
+    def record(self, response: httpx.Response) -> httpx.Response:
+        self.status_counts[str(response.status_code)] += 1
+        return response
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50, p90, p95, p99 and max of ``values``, rounded to milliseconds."""
+    if not values:
+        return dict.fromkeys(("p50", "p90", "p95", "p99", "max"))
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 3)
+
+    return {"p50": rank(0.5), "p90": rank(0.9), "p95": rank(0.95), "p99": rank(0.99), "max": round(ordered[-1], 3)}
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of process ``pid`` (default: this process), or None where /proc is unavailable."""
+    try:
+        status = Path(f"/proc/{pid or 'self'}/status").read_text()
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+class _Uploads:
+    """Receipt bytes made unique per upload, so the result cache never answers one."""
+
+    def __init__(self, image: Path = UPLOAD_IMAGE) -> None:
+        self._data = image.read_bytes()
+        self._counter = count()
+
+    def next(self) -> bytes:
+        # Image decoders ignore bytes after the end of the image
+        return self._data + b"loadtest-%d" % next(self._counter)
+
+
+async def _wait_for_result(http: httpx.AsyncClient, stats: _Stats, job_id: str, options: LoadTestOptions) -> str:
+    """Waits for the job and fetches its result; returns ``completed``, ``failed`` or ``timeout``."""
+    deadline = perf_counter() + options.result_timeout
+    while perf_counter() < deadline:
+        if options.long_poll:
+            wait = min(30.0, max(deadline - perf_counter(), 0.0))
+            response = stats.record(await http.get(f"/receipts/{job_id}", params={"wait": wait}))
+            if response.status_code == 200:
+                return "completed"
+            if response.status_code == 422:
+                return "failed"
+            continue
+        status = stats.record(await http.get(f"/receipts/{job_id}/status")).json().get("status")
+        if status in TERMINAL_STATUSES:
+            response = stats.record(await http.get(f"/receipts/{job_id}"))
+            return "completed" if response.status_code == 200 else "failed"
+        await asyncio.sleep(options.poll_interval)
+    return "timeout"
+
+
+async def _client(
+    http: httpx.AsyncClient, stats: _Stats, uploads: _Uploads, deadline: float, options: LoadTestOptions
+) -> None:
+    while perf_counter() < deadline:
+        started = perf_counter()
+        try:
+            files = {"file": ("receipt.png", uploads.next(), "image/png")}
+            response = stats.record(await http.post("/receipts", files=files))
+            stats.upload_latencies.append(perf_counter() - started)
+            if response.status_code != 202:
+                # Back off as told on 429 and 503, so rejected clients do not spin
+                retry_after = float(response.headers.get("Retry-After", 1))
+                await asyncio.sleep(min(retry_after, max(deadline - perf_counter(), 0.0)))
+                continue
+            outcome = await _wait_for_result(http, stats, response.json()["job_id"], options)
+        except httpx.HTTPError as exc:
+            stats.status_counts[type(exc).__name__] += 1
+            await asyncio.sleep(options.poll_interval)
+            continue
+        if outcome == "completed":
+            stats.latencies.append(perf_counter() - started)
+        elif outcome == "failed":
+            stats.failed_jobs += 1
+        else:
+            stats.timed_out_jobs += 1
+
+
+async def _sample_memory(stats: _Stats, pid: Optional[int], interval: float = 0.5) -> None:
+    while True:
+        rss = rss_bytes(pid)
+        if rss is None:
+            return
+        stats.memory_samples.append(rss)
+        await asyncio.sleep(interval)
+
+
+async def run_load(
+    http: httpx.AsyncClient, options: LoadTestOptions, *, server_pid: Optional[int] = None, measure_memory: bool = True
+) -> dict:
+    """Drives ``options.clients`` concurrent clients against ``http`` and returns the report."""
+    stats = _Stats()
+    uploads = _Uploads()
+    sampler = asyncio.create_task(_sample_memory(stats, server_pid)) if measure_memory else None
+    deadline = perf_counter() + options.duration
+    await asyncio.gather(*(_client(http, stats, uploads, deadline, options) for _ in range(options.clients)))
+    elapsed = perf_counter() - stats.started
+    if sampler is not None:
+        sampler.cancel()
+        rss = rss_bytes(server_pid)
+        if rss is not None:
+            stats.memory_samples.append(rss)
+    return _report(stats, options, elapsed)
+
+
+def _report(stats: _Stats, options: LoadTestOptions, elapsed: float) -> dict:
+    requests = sum(stats.status_counts.values())
+    rate_limited = stats.status_counts["429"]
+    rejected = stats.status_counts["503"]
+    errors = sum(n for code, n in stats.status_counts.items() if not code.startswith(("2", "3")))
+    memory = None
+    if stats.memory_samples:
+        start, end = stats.memory_samples[0], stats.memory_samples[-1]
+        memory = {"start_bytes": start, "end_bytes": end, "peak_bytes": max(stats.memory_samples), "growth_bytes": end - start}
+    return {
+        "clients": options.clients,
+        "duration_seconds": round(elapsed, 2),
+        "completed": len(stats.latencies),
+        "failed_jobs": stats.failed_jobs,
+        "timed_out_jobs": stats.timed_out_jobs,
+        "throughput_per_second": round(len(stats.latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_seconds": percentiles(stats.latencies),
+        "upload_latency_seconds": percentiles(stats.upload_latencies),
+        "requests": requests,
+        "status_counts": dict(stats.status_counts),
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "rate_limited_rate": round(rate_limited / requests, 4) if requests else 0.0,
+        "rejected_rate": round(rejected / requests, 4) if requests else 0.0,
+        "memory": memory,
+    }
+
+
+@contextmanager
+def _simulated_app(latency: str, rate_limits: bool) -> Iterator[object]:
+    """The API app in this process, parsing with the simulated backend."""
+    from api import main
+    from receipt_reader import parser
+
+    previous_backend = parser.backend_config()
+    parser.set_backend(simulated.SimulatedBackend.name, latency=latency)
+    limiter_enabled = main.limiter.enabled
+    # All in-process clients share one address, so per-client rate limits would throttle the whole test
+    main.limiter.enabled = rate_limits
+    try:
+        yield main.app
+    finally:
+        main.limiter.enabled = limiter_enabled
+        name, backend_options = previous_backend
+        parser.set_backend(name, **backend_options)
+
+
+def _http_client(base_url: str, options: LoadTestOptions, transport: Optional[httpx.AsyncBaseTransport] = None):
+    limits = httpx.Limits(max_connections=options.clients, max_keepalive_connections=options.clients)
+    timeout = httpx.Timeout(options.result_timeout + 30, connect=10)
+    return httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=timeout)
+
+
+def run_in_process(options: LoadTestOptions, *, latency: str = simulated.DEFAULT_LATENCY, rate_limits: bool = False) -> dict:
+    """Runs the load test against ``api.main:app`` in this process."""
+
+    async def _run() -> dict:
+        with _simulated_app(latency, rate_limits) as app:
+            transport = httpx.ASGITransport(app=app)
+            async with _http_client("http://loadtest", options, transport) as http:
+                return await run_load(http, options)
+
+    return asyncio.run(_run())
+
+
+@asynccontextmanager
+async def _spawned_server(port: int, env: Dict[str, str]) -> AsyncIterator[subprocess.Popen]:
+    command = [sys.executable, "-m", "uvicorn", "benchmarks.loadtest:app", "--port", str(port), "--log-level", "warning"]
+    server = subprocess.Popen(command, env={**os.environ, **env})
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+            for _ in range(100):
+                try:
+                    if (await http.get("/health/live")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                await asyncio.sleep(0.2)
+            else:
+                raise RuntimeError("uvicorn did not become ready")
+        yield server
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def run_spawned(options: LoadTestOptions, *, port: int, env: Dict[str, str]) -> dict:
+    """Starts the API under a local uvicorn with the simulated backend and runs the load test against it."""
+
+    async def _run() -> dict:
+        async with _spawned_server(port, {"INFERENCE_BACKEND": simulated.SimulatedBackend.name, **env}) as server:
+            async with _http_client(f"http://127.0.0.1:{port}", options) as http:
+                return await run_load(http, options, server_pid=server.pid)
+
+    return asyncio.run(_run())
+
+
+def run_remote(options: LoadTestOptions, url: str) -> dict:
+    """Runs the load test against a server that is already running; memory is not measured."""
+
+    async def _run() -> dict:
+        async with _http_client(url, options) as http:
+            return await run_load(http, options, measure_memory=False)
+
+    return asyncio.run(_run())
+
+
+def _print_report(report: dict) -> None:
+    print(f"clients            {report['clients']}")
+    print(f"duration           {report['duration_seconds']} s")
+    print(f"completed          {report['completed']} ({report['throughput_per_second']}/s)")
+    print(f"failed / timed out {report['failed_jobs']} / {report['timed_out_jobs']}")
+    for label, key in (("latency", "latency_seconds"), ("upload latency", "upload_latency_seconds")):
+        values = "  ".join(f"{name} {value}" for name, value in report[key].items())
+        print(f"{label:<18} {values}")
+    print(f"requests           {report['requests']} {report['status_counts']}")
+    print(
+        f"error rate         {report['error_rate']:.2%} "
+        f"(429: {report['rate_limited_rate']:.2%}, 503: {report['rejected_rate']:.2%})"
+    )
+    memory = report["memory"]
+    if memory:
+        print(f"memory             {memory['start_bytes'] / 2**20:.1f} MiB -> {memory['end_bytes'] / 2**20:.1f} MiB "
+              f"(peak {memory['peak_bytes'] / 2**20:.1f} MiB)")
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--clients", type=int, default=50)
+    arg_parser.add_argument("--duration", type=float, default=30.0, help="seconds to keep starting new uploads")
+    arg_parser.add_argument("--latency", default=simulated.DEFAULT_LATENCY, help="generate latency distribution")
+    arg_parser.add_argument("--poll-interval", type=float, default=0.5)
+    arg_parser.add_argument("--long-poll", action="store_true", help="wait on ?wait= instead of polling the status")
+    arg_parser.add_argument("--rate-limits", action="store_true", help="keep the per-client upload rate limits")
+    arg_parser.add_argument("--workers", type=int, help="INFERENCE_WORKERS of the app under test")
+    target = arg_parser.add_mutually_exclusive_group()
+    target.add_argument("--spawn", action="store_true", help="run the app under a local uvicorn")
+    target.add_argument("--url", help="base URL of a running server")
+    arg_parser.add_argument("--port", type=int, default=8765, help="port for --spawn")
+    arg_parser.add_argument("--output", type=Path, help="write the report as JSON to this file")
+    args = arg_parser.parse_args()
+
+    options = LoadTestOptions(
+        clients=args.clients, duration=args.duration, poll_interval=args.poll_interval, long_poll=args.long_poll
+    )
+    env = {"SIMULATED_LATENCY": args.latency}
+    if args.workers:
+        env["INFERENCE_WORKERS"] = str(args.workers)
+    if not args.rate_limits:
+        env["RATE_LIMIT"] = "1000000/second"
+
+    # Keep the API's per-request log lines out of the report
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    if args.url:
+        report = run_remote(options, args.url)
+    elif args.spawn:
+        report = run_spawned(options, port=args.port, env=env)
+    else:
+        # The app reads its settings on import
+        os.environ.update({key: value for key, value in env.items() if key != "RATE_LIMIT"})
+        report = run_in_process(options, latency=args.latency, rate_limits=args.rate_limits)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    _print_report(report)
+
+
+if __name__ == "__main__":
+    main()
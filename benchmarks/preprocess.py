@@ -0,0 +1,97 @@
+"""
+Compare the fast image loading path against full-resolution decoding.
+
+Runs on the repository's test receipts and on 12 and 48 megapixel JPEG
+copies of them, which is what phone cameras actually upload. Both paths end
+with the resize the Donut processor performs, so the timings compare what the
+model input costs end to end:
+
+    python -m benchmarks.preprocess
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+
+from PIL import Image
+
+from receipt_reader.preprocess import fitted_size, load_image
+
+TEST_IMAGES = sorted(Path("tests").glob("*.png"))
+# DonutProcessor defaults for donut-base-finetuned-cord-v2
+DONUT_CANVAS = (1920, 2560)
+PHONE_PHOTO_SIZES = {"12mp": (3024, 4032), "48mp": (6000, 8000)}
+
+
+def _processor_resize(image: Image.Image) -> bytes:
+    """
+    What DonutImageProcessor does before normalising: copy the pixels into an
+    array, round-trip them through PIL to resize, and copy the result back.
+    """
+    pixels = image.tobytes()
+    size = fitted_size(image.size, DONUT_CANVAS, align_long_axis=True)
+    resized = Image.frombytes("RGB", image.size, pixels).resize(size, Image.Resampling.BILINEAR)
+    return resized.tobytes()
+
+
+def _baseline(path: Path) -> bytes:
+    """The previous path: full decode, then the processor resizes the full image."""
+    return _processor_resize(Image.open(path).convert("RGB"))
+
+
+def _fast(path: Path) -> bytes:
+    return _processor_resize(load_image(str(path), (DONUT_CANVAS, True)))
+
+
+def _time(fn, path: Path, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn(path)
+        samples.append(perf_counter() - start)
+    return median(samples)
+
+
+def _phone_photos(directory: Path) -> list:
+    photos = []
+    for label, size in PHONE_PHOTO_SIZES.items():
+        for path in TEST_IMAGES[:2]:
+            photo = directory / f"{path.stem}-{label}.jpg"
+            Image.open(path).convert("RGB").resize(size, Image.Resampling.BICUBIC).save(photo, quality=90)
+            photos.append(photo)
+    return photos
+
+
+def run(repeat: int = 5) -> list:
+    """Returns one ``{"image", "baseline_ms", "fast_ms", "speedup"}`` row per image."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in TEST_IMAGES + _phone_photos(Path(tmp)):
+            baseline = _time(_baseline, path, repeat)
+            fast = _time(_fast, path, repeat)
+            rows.append(
+                {
+                    "image": path.name,
+                    "baseline_ms": round(baseline * 1000, 2),
+                    "fast_ms": round(fast * 1000, 2),
+                    "speedup": round(baseline / fast, 2),
+                }
+            )
+    return rows
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(f"{'image':<24} {'baseline ms':>12} {'fast ms':>10} {'speedup':>8}")
+    for row in run(args.repeat):
+        print(f"{row['image']:<24} {row['baseline_ms']:>12} {row['fast_ms']:>10} {row['speedup']:>7}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+A stand-in inference backend whose ``generate`` only sleeps.
+
+Images are still opened and resized to the Donut canvas like with the real
+model, and every receipt decodes to the same CORD sequence, so the API does
+all of its usual work except inference. The time ``generate`` takes is drawn
+from a configurable distribution:
+
+    fixed:1.5              always 1.5 seconds
+    uniform:0.5,2.5        uniformly between 0.5 and 2.5 seconds
+    lognormal:1.5,0.4      log-normal with a median of 1.5 seconds and sigma 0.4
+
+A batch of ``n`` images takes ``1 + batch_scaling * (n - 1)`` times the drawn
+latency. Importing this module registers the backend as ``simulated``; with
+no options it reads ``SIMULATED_LATENCY`` and ``SIMULATED_BATCH_SCALING``
+from the environment, so a server started with ``INFERENCE_BACKEND=simulated``
+picks it up (see ``benchmarks.loadtest``).
+"""
+from __future__ import annotations
+
+import math
+import os
+import random
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+
+from receipt_reader.backends import Backend, register_backend
+from receipt_reader.parser import TASK_PROMPT
+from tests.fixtures_data import ALL_FIXTURES
+from tests.parser_stubs import invoice_to_sequence
+
+DEFAULT_LATENCY = "lognormal:1.5,0.4"
+# DonutProcessor defaults for donut-base-finetuned-cord-v2
+DONUT_CANVAS = {"width": 1920, "height": 2560}
+
+
+def latency_distribution(spec: str, rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """Parses a latency spec such as ``lognormal:1.5,0.4`` into a sampler returning seconds."""
+    rng = rng or random.Random()
+    kind, _, raw = spec.partition(":")
+    try:
+        params = [float(value) for value in raw.split(",")] if raw else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters: {spec}") from None
+    if kind == "fixed" and len(params) == 1:
+        return lambda: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda: rng.uniform(params[0], params[1])
+    if kind == "lognormal" and len(params) == 2:
+        median, sigma = params
+        return lambda: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec} (use fixed:S, uniform:LO,HI or lognormal:MEDIAN,SIGMA)")
+
+
+class _Tensor:
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        self.shape = (batch_size, 1)
+
+    def to(self, device: str) -> "_Tensor":
+        return self
+
+
+class _Tokenizer:
+    pad_token_id = 0
+    eos_token_id = 1
+    unk_token_id = 2
+    eos_token = "</s>"
+    pad_token = "<pad>"
+
+    def __call__(self, text, *_, **__) -> SimpleNamespace:
+        return SimpleNamespace(input_ids=_Tensor(len(text)))
+
+
+class _Processor:
+    def __init__(self, sequence: str) -> None:
+        self.tokenizer = _Tokenizer()
+        self.image_processor = SimpleNamespace(size=DONUT_CANVAS, do_resize=True, do_align_long_axis=True)
+        self._sequence = f"{TASK_PROMPT}{sequence}"
+
+    def __call__(self, images, *_, **__) -> SimpleNamespace:
+        return SimpleNamespace(pixel_values=_Tensor(len(images)))
+
+    def batch_decode(self, sequences):
+        return [self._sequence for _ in sequences]
+
+
+class _Model:
+    device = "cpu"
+    decoder = SimpleNamespace(config=SimpleNamespace(max_position_embeddings=768))
+
+    def __init__(self, latency: Callable[[], float], batch_scaling: float) -> None:
+        self._latency = latency
+        self._batch_scaling = batch_scaling
+
+    def generate(self, pixel_values, *_, **__) -> SimpleNamespace:
+        batch_size = pixel_values.batch_size
+        time.sleep(self._latency() * (1 + self._batch_scaling * (batch_size - 1)))
+        return SimpleNamespace(sequences=[None] * batch_size)
+
+
+class SimulatedBackend(Backend):
+    """Fake Donut processor and model whose ``generate`` sleeps for a sampled latency."""
+
+    name = "simulated"
+
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        batch_scaling: Optional[float] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency = latency or os.getenv("SIMULATED_LATENCY", DEFAULT_LATENCY)
+        if batch_scaling is None:
+            batch_scaling = float(os.getenv("SIMULATED_BATCH_SCALING", 0.25))
+        self.batch_scaling = batch_scaling
+        # Fail on a bad spec when the backend is selected, not on the first parse
+        self._sampler = latency_distribution(self.latency, random.Random(seed))
+
+    def load(self):
+        return _Processor(invoice_to_sequence(ALL_FIXTURES[0])), _Model(self._sampler, self.batch_scaling)
+
+
+register_backend(SimulatedBackend.name, SimulatedBackend)
@@ -0,0 +1,347 @@
+"""
+Microbenchmarks for the parser and API hot paths.
+
+Runs without model weights: inference is replaced by the fake Donut pipeline
+from ``tests/parser_stubs.py`` and the receipts come from
+``tests/fixtures_data.py``, so the numbers cover everything around
+``generate``. Save a run as JSON and compare later runs against it to catch
+regressions:
+
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --compare baseline.json
+
+``--compare`` exits with status 1 when a benchmark got slower than the
+baseline by more than ``--threshold`` (default 20%).
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import logging
+import platform
+import re
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import count
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import PIL.Image  # noqa: F401
+    import torch  # noqa: F401
+    import transformers  # noqa: F401
+except ImportError:
+    # Stand in for whatever ML dependency is missing, like the test suite does
+    import tests.conftest  # noqa: F401
+
+import pytest
+import structlog
+from fastapi.encoders import jsonable_encoder
+
+from receipt_reader import parser
+from tests import parser_stubs
+from tests.fixtures_data import ALL_FIXTURES
+
+# A benchmark returns a callable running ``ops`` operations per call
+Benchmark = Callable[[], Tuple[Callable[[], None], int]]
+
+JOB_STORE_THREADS = 8
+JOB_STORE_JOBS_PER_THREAD = 50
+
+
+def _sequences() -> List[str]:
+    return [parser_stubs.invoice_to_sequence(invoice) for invoice in ALL_FIXTURES]
+
+
+def bench_sequence_mapping():
+    sequences = _sequences()
+
+    def run() -> None:
+        for sequence in sequences:
+            parser._sequence_to_fields(sequence)
+
+    return run, len(sequences)
+
+
+def bench_cord_decoding():
+    """Token-by-token decoding, as the decode monitor does on every generation step."""
+    from receipt_reader.cord import CordDecoder
+
+    sequences = [parser_stubs.invoice_to_cord_sequence(invoice) for invoice in ALL_FIXTURES]
+    # Rough stand-in for Donut tokens: tags whole, text in short pieces
+    tokenized = [[piece for piece in re.split(r"(<[^>]+>|.{1,4})", sequence) if piece] for sequence in sequences]
+
+    def run() -> None:
+        for tokens in tokenized:
+            decoder = CordDecoder()
+            for token in tokens:
+                decoder.feed(token)
+            decoder.result()
+
+    return run, len(tokenized)
+
+
+def bench_text_parse():
+    """The rule-based parser on receipt text rebuilt from the fixtures' printed lines."""
+    texts = [
+        "\n".join(
+            [invoice.merchant.name, *invoice.merchant.address.split(", ")]
+            + [item.raw_line or f"{item.description} {item.total_price}" for item in invoice.items]
+            + [f"SUMME EUR {invoice.totals.gross}", invoice.totals.payment_method]
+        )
+        for invoice in ALL_FIXTURES
+    ]
+
+    def run() -> None:
+        for text in texts:
+            parser.parse_text(text)
+
+    return run, len(texts)
+
+
+def bench_pydantic_validation():
+    fields = [parser._sequence_to_fields(sequence) for sequence in _sequences()]
+
+    def run() -> None:
+        for item in fields:
+            parser._fields_to_invoice(item)
+
+    return run, len(fields)
+
+
+def bench_jsonable_encoder():
+    def run() -> None:
+        for invoice in ALL_FIXTURES:
+            jsonable_encoder(invoice)
+
+    return run, len(ALL_FIXTURES)
+
+
+def bench_invoice_json():
+    """What the job store does with every result."""
+
+    def run() -> None:
+        for invoice in ALL_FIXTURES:
+            invoice.json()
+
+    return run, len(ALL_FIXTURES)
+
+
+def bench_result_reencode():
+    """What every GET of a completed job did before result bodies were stored: decode and re-encode."""
+    from api.serialization import result_meta
+
+    stored = [invoice.json().encode() for invoice in ALL_FIXTURES]
+
+    def run() -> None:
+        for result_json in stored:
+            parsed = json.loads(result_json)
+            payload = {"job_id": "job", "status": "completed", "parsed": parsed, "meta": result_meta(parsed["meta"], 1.0)}
+            json.dumps(jsonable_encoder(payload)).encode()
+
+    return run, len(stored)
+
+
+def bench_result_body():
+    """Serializing a result body once, when the job completes."""
+    from api.serialization import result_bodies
+
+    def run() -> None:
+        for invoice in ALL_FIXTURES:
+            result_bodies(["job"], invoice, 1.0)
+
+    return run, len(ALL_FIXTURES)
+
+
+def bench_completed_result_get():
+    """GET /receipts/{job_id} of a completed job through the ASGI app, as polling clients repeat it."""
+    from fastapi.testclient import TestClient
+
+    from api import main
+
+    client = TestClient(main.app)
+    job = main.job_store.create()
+    main.job_store.mark_processing(job.id)
+    main.job_store.mark_completed(job.id, invoice=ALL_FIXTURES[-1], duration=1.0)
+
+    def run() -> None:
+        response = client.get(f"/receipts/{job.id}")
+        assert response.status_code == 200, response.text
+
+    return run, 1
+
+
+def _job_store_contention(backend: str):
+    from api.jobs import RetentionPolicy, create_job_store
+
+    directory = tempfile.mkdtemp(prefix="receipt-parser-bench-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    path = Path(directory) / "jobs.sqlite3"
+    store = create_job_store(backend, path=path, retention=RetentionPolicy(ttl_seconds=0))
+    invoice = ALL_FIXTURES[0]
+
+    def lifecycle(_) -> None:
+        for _ in range(JOB_STORE_JOBS_PER_THREAD):
+            job = store.create(metadata={"source": "bench"})
+            store.mark_processing(job.id)
+            store.get(job.id)
+            store.mark_completed(job.id, invoice=invoice, duration=0.1)
+            store.get(job.id)
+
+    def run() -> None:
+        with ThreadPoolExecutor(JOB_STORE_THREADS) as pool:
+            list(pool.map(lifecycle, range(JOB_STORE_THREADS)))
+        store.reset()
+
+    return run, JOB_STORE_THREADS * JOB_STORE_JOBS_PER_THREAD
+
+
+def bench_job_store_memory():
+    return _job_store_contention("memory")
+
+
+def bench_job_store_sqlite():
+    return _job_store_contention("sqlite")
+
+
+def bench_upload_roundtrip():
+    """POST /receipts and a long-polled GET of the result through the ASGI app."""
+    from fastapi.testclient import TestClient
+
+    from api import main
+
+    client = TestClient(main.app)
+    uploads = count()
+
+    def run() -> None:
+        # Unique bytes per upload, so the result cache does not answer it
+        data = b"receipt-%d" % next(uploads)
+        response = client.post("/receipts", files={"file": ("receipt.png", data, "image/png")})
+        job_id = response.json()["job_id"]
+        result = client.get(f"/receipts/{job_id}", params={"wait": 5})
+        assert result.status_code == 200, result.text
+
+    return run, 1
+
+
+BENCHMARKS: Dict[str, Benchmark] = {
+    "sequence_mapping": bench_sequence_mapping,
+    "cord_decoding": bench_cord_decoding,
+    "text_parse": bench_text_parse,
+    "pydantic_validation": bench_pydantic_validation,
+    "jsonable_encoder": bench_jsonable_encoder,
+    "invoice_json": bench_invoice_json,
+    "result_reencode": bench_result_reencode,
+    "result_body": bench_result_body,
+    "job_store_memory": bench_job_store_memory,
+    "job_store_sqlite": bench_job_store_sqlite,
+    "upload_roundtrip": bench_upload_roundtrip,
+    "completed_result_get": bench_completed_result_get,
+}
+
+
+def _measure(run: Callable[[], None], ops: int, repeat: int) -> dict:
+    run()  # warm up caches, lazy imports and the stubbed model
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        run()
+        samples.append((perf_counter() - start) / ops)
+    per_op = median(samples)
+    return {
+        "median_us": round(per_op * 1e6, 3),
+        "min_us": round(min(samples) * 1e6, 3),
+        "ops_per_second": round(1 / per_op, 1) if per_op else None,
+        "repeat": repeat,
+    }
+
+
+def run(names: Optional[List[str]] = None, repeat: int = 20) -> dict:
+    """Runs the selected benchmarks (all by default) and returns the JSON report."""
+    names = names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    results = {}
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        parser_stubs.stub_donut_pipeline(
+            monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(ALL_FIXTURES[0])
+        )
+        if "upload_roundtrip" in names:
+            from api import main as api_main
+
+            monkeypatch.setattr(api_main.limiter, "enabled", False)
+        for name in names:
+            benchmark, ops = BENCHMARKS[name]()
+            results[name] = _measure(benchmark, ops, repeat)
+    parser._processor = None
+    parser._model = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> List[dict]:
+    """
+    Compares two reports benchmark by benchmark. A benchmark regressed when its
+    median time per operation grew by more than ``threshold`` (0.2 = 20%).
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None or not before["median_us"]:
+            continue
+        ratio = result["median_us"] / before["median_us"]
+        rows.append(
+            {
+                "benchmark": name,
+                "baseline_us": before["median_us"],
+                "current_us": result["median_us"],
+                "change": round(ratio - 1, 3),
+                "regressed": ratio > 1 + threshold,
+            }
+        )
+    return rows
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("benchmarks", nargs="*", help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    arg_parser.add_argument("--output", type=Path, help="write the results as JSON to this file")
+    arg_parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    args = arg_parser.parse_args()
+
+    # Keep the API's per-request log lines out of the report
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+    report = run(args.benchmarks or None, args.repeat)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+    if not args.compare:
+        print(f"{'benchmark':<22} {'median us':>12} {'ops/s':>12}")
+        for name, result in report["results"].items():
+            print(f"{name:<22} {result['median_us']:>12} {result['ops_per_second']:>12}")
+        return
+
+    rows = compare(report, json.loads(args.compare.read_text()), args.threshold)
+    print(f"{'benchmark':<22} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regressed"] else ""
+        print(f"{row['benchmark']:<22} {row['baseline_us']:>12} {row['current_us']:>12} {row['change']:>+8.1%}{flag}")
+    if any(row["regressed"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
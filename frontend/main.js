@@ -73,63 +73,77 @@ function retakePhoto() {
 }
 
 function uploadPhoto() {
-    canvas.toBlob(async (blob) => {
+    canvas.toBlob((blob) => {
         const formData = new FormData();
         formData.append('file', blob, 'receipt.jpg');
-
-        try {
-            const response = await fetch('/receipts', {
-                method: 'POST',
-                body: formData
-            });
-
-            if (response.ok) {
-                const result = await response.json();
-                console.log('Upload successful:', result);
-                alert(`Photo uploaded successfully! Job ID: ${result.job_id}`);
-            } else {
-                console.error('Upload failed:', response.statusText);
-                showError('Failed to upload the photo. Please try again.');
-            }
-        } catch (error) {
-            console.error('Error uploading photo:', error);
-            showError('An error occurred while uploading the photo. Please check your network connection and try again.');
-        }
+        submitReceipt(formData);
     }, 'image/jpeg');
 }
 
-function showError(message) {
-    errorMessage.textContent = message;
-    errorContainer.style.display = 'block';
-    cameraContainer.style.display = 'none';
-    confirmationContainer.style.display = 'none';
-    fallbackContainer.style.display = 'block';
+function watchJob(jobId) {
+    // Resolves with the job's final status update, pushed by the server as it happens
+    return new Promise((resolve, reject) => {
+        const events = new EventSource(`/receipts/${jobId}/events`);
+        events.addEventListener('status', (event) => {
+            const update = JSON.parse(event.data);
+            if (update.status === 'completed' || update.status === 'failed') {
+                events.close();
+                resolve(update);
+            }
+        });
+        events.onerror = () => {
+            // EventSource reconnects by itself unless the server refused the stream
+            if (events.readyState === EventSource.CLOSED) {
+                reject(new Error('Lost connection to the job event stream'));
+            }
+        };
+    });
 }
 
-async function uploadFile(file) {
-    const formData = new FormData();
-    formData.append('file', file);
-
+async function submitReceipt(formData) {
     try {
         const response = await fetch('/receipts', {
             method: 'POST',
             body: formData
         });
 
-        if (response.ok) {
-            const result = await response.json();
-            console.log('Upload successful:', result);
-            alert(`Photo uploaded successfully! Job ID: ${result.job_id}`);
-        } else {
+        if (!response.ok) {
             console.error('Upload failed:', response.statusText);
             showError('Failed to upload the photo. Please try again.');
+            return;
         }
+
+        const result = await response.json();
+        console.log('Upload successful:', result);
+        const update = await watchJob(result.job_id);
+        if (update.status === 'failed') {
+            showError(`The receipt could not be parsed: ${update.error || 'unknown error'}`);
+            return;
+        }
+
+        const parsed = await (await fetch(`/receipts/${result.job_id}`)).json();
+        console.log('Parse result:', parsed);
+        alert(`Receipt parsed: ${parsed.parsed.merchant.name}, total ${parsed.parsed.totals.gross} ${parsed.parsed.currency}`);
     } catch (error) {
         console.error('Error uploading photo:', error);
         showError('An error occurred while uploading the photo. Please check your network connection and try again.');
     }
 }
 
+function showError(message) {
+    errorMessage.textContent = message;
+    errorContainer.style.display = 'block';
+    cameraContainer.style.display = 'none';
+    confirmationContainer.style.display = 'none';
+    fallbackContainer.style.display = 'block';
+}
+
+function uploadFile(file) {
+    const formData = new FormData();
+    formData.append('file', file);
+    return submitReceipt(formData);
+}
+
 fileInput.addEventListener('change', (event) => {
     const file = event.target.files[0];
     if (file) {
@@ -43,7 +43,38 @@ document.addEventListener('DOMContentLoaded', () => {
                 })
             };
         }
+        if (url === '/receipts/test-job-id') {
+            return {
+                ok: true,
+                json: async () => ({
+                    job_id: 'test-job-id',
+                    status: 'completed',
+                    parsed: { merchant: { name: 'Test Merchant' }, totals: { gross: '10.00' }, currency: 'EUR' }
+                })
+            };
+        }
     };
+    window.alert = () => {};
+    const openedStreams = [];
+    window.EventSource = class {
+        constructor(url) {
+            this.url = url;
+            this.listeners = {};
+            openedStreams.push(this);
+            // Push the final status asynchronously, like a server would
+            setTimeout(() => this.emit('status', { job_id: 'test-job-id', status: 'completed' }), 10);
+        }
+        addEventListener(name, listener) {
+            this.listeners[name] = listener;
+        }
+        emit(name, data) {
+            this.listeners[name]({ data: JSON.stringify(data) });
+        }
+        close() {
+            this.closed = true;
+        }
+    };
+    window.EventSource.CLOSED = 2;
 
     async function runTests() {
         // Test: startCamera successfully starts the camera
@@ -80,6 +111,12 @@ document.addEventListener('DOMContentLoaded', () => {
         assert(fetchCalled, "uploadPhoto should call fetch with the /receipts endpoint.");
         window.fetch = originalFetch;
 
+        // Test: the job is followed over its event stream instead of polling
+        const update = await watchJob('test-job-id');
+        assert(openedStreams[openedStreams.length - 1].url === '/receipts/test-job-id/events', "watchJob should open the job's event stream.");
+        assert(update.status === 'completed', "watchJob should resolve with the final status.");
+        assert(openedStreams[openedStreams.length - 1].closed, "watchJob should close the stream once the job finished.");
+
         summary();
     }
 
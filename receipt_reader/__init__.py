@@ -1,4 +1,11 @@
 __all__ = [
     "types",
     "parser",
+    "backends",
+    "cord",
+    "decoding",
+    "preprocess",
+    "stages",
+    "text",
+    "weights",
 ]
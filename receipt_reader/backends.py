@@ -0,0 +1,172 @@
+"""
+Inference backends for the Donut model.
+
+A backend loads the processor and model and says how to call ``generate`` on
+it. ``parser`` picks the backend selected with :func:`parser.set_backend`.
+"""
+from __future__ import annotations
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from . import weights
+
+MODEL_NAME = "naver-clova-ix/donut-base-finetuned-cord-v2"
+
+
+def _export_to(directory: Path, save: Callable[[Path], None], is_exported: Callable[[], bool]) -> None:
+    """
+    Has ``save`` write an export into a staging directory next to ``directory``,
+    then renames it into place, so readers never see a partial export. Workers
+    starting together may all export; the first complete export to be renamed
+    wins.
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f"{directory.name}-", dir=directory.parent))
+    try:
+        save(staging)
+        if directory.exists() and not is_exported():
+            directory.rmdir()
+        staging.rename(directory)
+    except OSError:
+        if not is_exported():
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class Backend:
+    """Base class for inference backends."""
+
+    name = "base"
+
+    def load(self):
+        """Returns a ``(processor, model)`` pair."""
+        raise NotImplementedError
+
+    def generate_kwargs(self) -> dict:
+        """Extra keyword arguments for ``model.generate``."""
+        return {}
+
+
+class TorchBackend(Backend):
+    """
+    Eager PyTorch ``VisionEncoderDecoderModel``; the reference implementation.
+
+    With ``weights_dir`` the weights are memory-mapped on CPU instead of read
+    into each process: the first load saves them there as safetensors, and
+    every load maps those files (see :mod:`receipt_reader.weights`), so worker
+    processes on a host share one copy of the weights.
+    """
+
+    name = "torch"
+
+    def __init__(self, weights_dir: Optional[str] = None) -> None:
+        self.weights_dir = Path(weights_dir) if weights_dir else None
+
+    def is_exported(self) -> bool:
+        return self.weights_dir is not None and bool(weights.weight_files(self.weights_dir))
+
+    def load(self):
+        try:
+            import torch
+            from transformers import DonutProcessor, VisionEncoderDecoderModel
+        except ImportError as exc:
+            raise ImportError(
+                "ML dependencies are not installed. Please install them with "
+                "'pip install torch transformers sentencepiece'"
+            ) from exc
+
+        processor = DonutProcessor.from_pretrained(MODEL_NAME)
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        if self.weights_dir is not None and device == "cpu":
+            return processor, self._load_mapped(VisionEncoderDecoderModel)
+
+        model = VisionEncoderDecoderModel.from_pretrained(MODEL_NAME)
+        model.to(device)
+        return processor, model
+
+    def _load_mapped(self, model_class):
+        if not self.is_exported():
+            self._export(model_class)
+        config = model_class.config_class.from_pretrained(self.weights_dir)
+        with weights.parameters_on_meta():
+            model = model_class(config)
+        result = model.load_state_dict(weights.load_mapped(self.weights_dir), strict=False, assign=True)
+        # Tied weights are stored once; tie_weights() points their other uses back at them
+        model.tie_weights()
+        tensors = model.state_dict(keep_vars=True)
+        missing = [key for key in result.missing_keys if tensors[key].is_meta]
+        if missing:
+            raise ValueError(f"Weights missing from {self.weights_dir}: {', '.join(missing)}")
+        model.eval()
+        return model
+
+    def _export(self, model_class) -> None:
+        def save(staging: Path) -> None:
+            model_class.from_pretrained(MODEL_NAME).save_pretrained(staging, safe_serialization=True)
+
+        _export_to(self.weights_dir, save, self.is_exported)
+
+
+class OnnxBackend(Backend):
+    """
+    Runs the encoder and decoder on ONNX Runtime.
+
+    The model is exported to ONNX once (encoder, decoder and decoder-with-past)
+    and cached in ``model_dir``; later loads read the cached graphs. Decoding
+    is greedy and reuses the decoder's key/value cache between steps.
+    """
+
+    name = "onnx"
+
+    GRAPHS = ("encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx")
+
+    def __init__(self, model_dir: Optional[str] = None) -> None:
+        default_dir = Path(tempfile.gettempdir()) / "receipt-parser" / "onnx"
+        self.model_dir = Path(model_dir) if model_dir else default_dir
+
+    def is_exported(self) -> bool:
+        return all((self.model_dir / graph).exists() for graph in self.GRAPHS)
+
+    def load(self):
+        try:
+            from optimum.onnxruntime import ORTModelForVision2Seq
+            from transformers import DonutProcessor
+        except ImportError as exc:
+            raise ImportError(
+                "ONNX Runtime dependencies are not installed. Please install them with "
+                "'pip install optimum[onnxruntime] transformers sentencepiece'"
+            ) from exc
+
+        processor = DonutProcessor.from_pretrained(MODEL_NAME)
+        if self.is_exported():
+            return processor, ORTModelForVision2Seq.from_pretrained(self.model_dir, use_cache=True)
+
+        model = ORTModelForVision2Seq.from_pretrained(MODEL_NAME, export=True, use_cache=True)
+        _export_to(self.model_dir, model.save_pretrained, self.is_exported)
+        return processor, model
+
+    def generate_kwargs(self) -> dict:
+        return {"num_beams": 1, "do_sample": False}
+
+
+_BACKENDS: Dict[str, Callable[..., Backend]] = {
+    TorchBackend.name: TorchBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[..., Backend]) -> None:
+    """Makes a custom backend selectable by name."""
+    _BACKENDS[name] = factory
+
+
+def create_backend(name: str, **options) -> Backend:
+    try:
+        factory = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend: {name}") from None
+    return factory(**options)
@@ -0,0 +1,197 @@
+"""
+Incremental decoder for Donut's CORD tag sequences.
+
+Donut does not emit JSON but nested tags, with ``<sep/>`` between the entries
+of a list:
+
+    <s_menu><s_nm>Brot</s_nm><s_cnt>1</s_cnt><s_price>2,49</s_price><sep/>
+    <s_nm>Milch</s_nm>...</s_menu><s_total><s_total_price>3,68</s_total_price></s_total>
+
+:class:`CordDecoder` consumes that text in arbitrary chunks, down to single
+tokens, and builds the nested structure in one linear pass: groups become
+dicts, leaves strings and separated entries lists. Closing tags that do not
+match the innermost open group close everything up to the matching one, and
+stray ones are ignored. :meth:`CordDecoder.result` can be taken at any point
+and contains every value closed so far, so truncated output still yields the
+complete part of the receipt.
+"""
+from __future__ import annotations
+
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional
+
+_TAG = re.compile(r"<(/?)s_([^<>/\s]+)>|<sep/>")
+# Tags are short; a longer unterminated "<..." is text rather than a split tag
+_MAX_TAG_LENGTH = 64
+_AMOUNT = re.compile(r"-?\d[\d.,]*")
+# SentencePiece marks word boundaries with this character in raw tokens
+_WORD_BOUNDARY = "▁"
+
+
+class _Group:
+    __slots__ = ("key", "entries", "fields", "text")
+
+    def __init__(self, key: Optional[str]) -> None:
+        self.key = key
+        self.entries: List[Any] = []
+        self.fields: Dict[str, Any] = {}
+        self.text: List[str] = []
+
+    def add(self, key: str, value: Any) -> None:
+        # A key repeated within one entry starts the next entry, as with a missing <sep/>
+        if key in self.fields and self.key is not None:
+            self.separate()
+        self.fields[key] = value
+
+    def separate(self) -> bool:
+        value = self._current()
+        self.fields = {}
+        self.text = []
+        if value is None:
+            return False
+        self.entries.append(value)
+        return True
+
+    def close(self) -> Any:
+        self.separate()
+        return _collapse(self.entries)
+
+    def snapshot(self, open_key: Optional[str] = None, open_value: Any = None, *, entries_only: bool = False):
+        """The closed values of this group, plus ``open_value`` of the child group still open."""
+        if entries_only:
+            return _collapse(self.entries)
+        fields = self.fields
+        if open_value is not None:
+            fields = dict(fields)
+            fields[open_key] = open_value
+        entries = self.entries + [fields] if fields else self.entries
+        return _collapse(entries)
+
+    def _current(self) -> Any:
+        if self.fields:
+            return self.fields
+        text = "".join(self.text).strip()
+        return text or None
+
+
+def _collapse(entries: List[Any]) -> Any:
+    if not entries:
+        return None
+    return entries[0] if len(entries) == 1 else list(entries)
+
+
+class CordDecoder:
+    """
+    Builds the CORD structure from tag sequence text fed in chunks.
+
+    ``complete`` turns true once a top-level group whose closing tag is one of
+    ``closing_tags`` has closed; for CORD that is the total, the last group
+    of a receipt.
+    """
+
+    def __init__(self, closing_tags: Iterable[str] = ("</s_total>",)) -> None:
+        self._closing_tags = frozenset(closing_tags)
+        self._stack: List[_Group] = [_Group(None)]
+        self._pending = ""
+        self.complete = False
+
+    def feed(self, text: str) -> bool:
+        """Consumes the next chunk of text; returns whether a value or list entry was closed by it."""
+        text = self._pending + text.replace(_WORD_BOUNDARY, " ")
+        self._pending = ""
+        cut = text.rfind("<")
+        if cut != -1 and ">" not in text[cut:] and len(text) - cut < _MAX_TAG_LENGTH:
+            # Hold back a tag split across chunks until its end arrives
+            text, self._pending = text[:cut], text[cut:]
+
+        closed = False
+        position = 0
+        for match in _TAG.finditer(text):
+            if match.start() > position:
+                self._text(text[position:match.start()])
+            position = match.end()
+            key = match.group(2)
+            if key is None:
+                # Separators only split the entries of a group
+                if len(self._stack) > 1:
+                    closed = self._stack[-1].separate() or closed
+            elif match.group(1):
+                closed = self._close(key) or closed
+            else:
+                self._stack.append(_Group(key))
+        if position < len(text):
+            self._text(text[position:])
+        return closed
+
+    def result(self, *, complete_entries: bool = False) -> Dict[str, Any]:
+        """
+        Everything closed so far, including the closed parts of groups still
+        open. With ``complete_entries``, groups still open only contribute the
+        entries already ended by ``<sep/>``, such as the finished menu lines.
+        """
+        key, value = None, None
+        for group in reversed(self._stack):
+            entries_only = complete_entries and group.key is not None
+            key, value = group.key, group.snapshot(key, value, entries_only=entries_only)
+        return value or {}
+
+    def _text(self, text: str) -> None:
+        # Text between top-level groups carries no value
+        if len(self._stack) > 1:
+            self._stack[-1].text.append(text)
+
+    def _close(self, key: str) -> bool:
+        depth = len(self._stack) - 1
+        while depth > 0 and self._stack[depth].key != key:
+            depth -= 1
+        if depth == 0:
+            return False
+        while len(self._stack) > depth:
+            group = self._stack.pop()
+            value = group.close()
+            if value is not None:
+                self._stack[-1].add(group.key, value)
+        if len(self._stack) == 1 and f"</s_{key}>" in self._closing_tags:
+            self.complete = True
+        return True
+
+
+def decode(sequence: str) -> Dict[str, Any]:
+    """Decodes a whole tag sequence, tolerating truncation."""
+    decoder = CordDecoder()
+    decoder.feed(sequence)
+    return decoder.result()
+
+
+def as_list(value: Any) -> list:
+    """A group that occurred once decodes to a single value; this wraps it like repeated ones."""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def parse_amount(text: Any) -> Optional[Decimal]:
+    """
+    Reads the first number in ``text``, such as ``"2,49"``, ``"1.234,50 EUR"``
+    or ``"2x"``. The last of ``,`` and ``.`` is the decimal separator unless it
+    repeats, then it groups thousands. Returns None when there is no number.
+    """
+    if not isinstance(text, str):
+        return None
+    match = _AMOUNT.search(text)
+    if match is None:
+        return None
+    number = match.group().rstrip(".,")
+    separators = [char for char in number if char in ".,"]
+    if separators:
+        decimal = separators[-1]
+        grouping = "," if decimal == "." else "."
+        if separators.count(decimal) > 1:
+            number = number.replace(decimal, "")
+        else:
+            number = number.replace(grouping, "").replace(decimal, ".")
+    try:
+        return Decimal(number)
+    except InvalidOperation:
+        return None
@@ -0,0 +1,152 @@
+"""
+Decoding budget and early stopping for ``model.generate``.
+
+``DecodeMonitor`` is passed to ``generate`` as a stopping criterion. It watches
+the tokens produced for every row of the batch and ends a row as soon as its
+structured output is closed or it is stuck repeating itself.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from threading import Event
+from typing import Callable, List, Optional
+
+from .cord import CordDecoder
+
+STOP_EOS = "eos"
+STOP_STRUCTURE_CLOSED = "structure_closed"
+STOP_REPETITION = "repetition"
+STOP_MAX_NEW_TOKENS = "max_new_tokens"
+STOP_CANCELLED = "cancelled"
+
+
+@dataclass(frozen=True)
+class DecodeSettings:
+    """
+    ``max_new_tokens`` caps how many tokens a receipt may decode. A repetition
+    loop is a block of up to ``repetition_max_ngram`` tokens repeated at least
+    ``repetition_min_repeats`` times and spanning ``repetition_min_span`` tokens.
+    ``closing_tags`` are the top-level CORD groups that end a receipt.
+    """
+
+    max_new_tokens: int = 512
+    repetition_max_ngram: int = 8
+    repetition_min_repeats: int = 4
+    repetition_min_span: int = 16
+    closing_tags: tuple = ("</s_total>",)
+
+
+@dataclass
+class DecodeStats:
+    tokens: int
+    stop_reason: str
+
+    def as_dict(self) -> dict:
+        return {"tokens": self.tokens, "stop_reason": self.stop_reason}
+
+
+class _RowMonitor:
+    def __init__(self, settings: DecodeSettings) -> None:
+        self._settings = settings
+        self._history: List[int] = []
+        self._json_depth = 0
+        self.cord = CordDecoder(settings.closing_tags)
+        # Whether the last token closed a value of the CORD structure
+        self.updated = False
+        self.stop_reason: Optional[str] = None
+
+    @property
+    def tokens(self) -> int:
+        return len(self._history)
+
+    def feed(self, token_id: int, token: str) -> Optional[str]:
+        """Records one generated token and returns a stop reason once the row should end."""
+        self._history.append(token_id)
+        self.updated = self.cord.feed(token)
+        if self.cord.complete:
+            self.stop_reason = STOP_STRUCTURE_CLOSED
+        elif self._closes_json(token):
+            self.stop_reason = STOP_STRUCTURE_CLOSED
+        elif self._is_repeating():
+            self.stop_reason = STOP_REPETITION
+        return self.stop_reason
+
+    def _closes_json(self, token: str) -> bool:
+        if "{" not in token and "}" not in token:
+            return False
+        was_open = self._json_depth > 0
+        self._json_depth += token.count("{") - token.count("}")
+        return was_open and self._json_depth <= 0
+
+    def _is_repeating(self) -> bool:
+        history = self._history
+        settings = self._settings
+        for period in range(1, settings.repetition_max_ngram + 1):
+            repeats = max(settings.repetition_min_repeats, -(-settings.repetition_min_span // period))
+            span = period * repeats
+            if len(history) < span:
+                continue
+            tail = history[-span:]
+            if all(tail[i] == tail[i + period] for i in range(span - period)):
+                return True
+        return False
+
+
+class DecodeMonitor:
+    """
+    Stopping criterion for ``generate`` that ends each batch row independently.
+
+    It is called after every decoding step with the sequences generated so far,
+    and returns one boolean per row telling ``generate`` which rows are done.
+    ``on_update`` is called with the row index and its :class:`CordDecoder`
+    whenever a token closes a value of that row's structure. Setting ``cancel``
+    ends all rows at the next step. ``max_new_tokens`` is the budget actually
+    passed to ``generate`` when it is lower than the one in ``settings``.
+    """
+
+    def __init__(
+        self,
+        tokenizer,
+        batch_size: int,
+        settings: DecodeSettings,
+        *,
+        on_update: Optional[Callable[[int, CordDecoder], None]] = None,
+        cancel: Optional[Event] = None,
+        max_new_tokens: Optional[int] = None,
+    ) -> None:
+        self._tokenizer = tokenizer
+        self._settings = settings
+        self._max_new_tokens = settings.max_new_tokens if max_new_tokens is None else max_new_tokens
+        self._rows = [_RowMonitor(settings) for _ in range(batch_size)]
+        self._on_update = on_update
+        self._cancel = cancel
+
+    def __call__(self, input_ids, scores, **kwargs):
+        import torch
+
+        eos_token_id = self._tokenizer.eos_token_id
+        pad_token_id = self._tokenizer.pad_token_id
+        last_tokens = input_ids[:, -1].tolist()
+        cancelled = self._cancel is not None and self._cancel.is_set()
+        done = []
+        for index, (row, token_id) in enumerate(zip(self._rows, last_tokens)):
+            if row.stop_reason is None and token_id != pad_token_id:
+                if token_id == eos_token_id:
+                    row.stop_reason = STOP_EOS
+                else:
+                    row.feed(token_id, self._tokenizer.convert_ids_to_tokens(token_id))
+                    if row.updated and self._on_update is not None:
+                        self._on_update(index, row.cord)
+            if cancelled and row.stop_reason is None:
+                row.stop_reason = STOP_CANCELLED
+            done.append(row.stop_reason is not None)
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    def stats(self) -> List[DecodeStats]:
+        results = []
+        for row in self._rows:
+            reason = row.stop_reason
+            if reason is None:
+                reason = STOP_MAX_NEW_TOKENS if row.tokens >= self._max_new_tokens else STOP_EOS
+            results.append(DecodeStats(tokens=row.tokens, stop_reason=reason))
+        return results
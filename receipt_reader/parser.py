@@ -1,16 +1,84 @@
 from __future__ import annotations
 
+import io
 import json
+import queue
+from contextlib import contextmanager
+from contextvars import ContextVar
 from decimal import Decimal
-from typing import Optional
+from pathlib import Path
+from threading import Event, Thread
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple, Union
 import uuid
 
 from PIL import Image
 
+from . import cord, text
+from .backends import Backend, create_backend
+from .cord import CordDecoder
+from .decoding import DecodeMonitor, DecodeSettings, DecodeStats
+from .preprocess import fit_image, load_image, processor_target
+from .stages import (
+    STAGE_BATCH_DECODE,
+    STAGE_GENERATE,
+    STAGE_IMAGE_LOAD,
+    STAGE_JSON_MAPPING,
+    STAGE_PREPROCESS,
+    STAGE_VALIDATION,
+    StageTimings,
+)
 from .types import Invoice, Item, Merchant, Totals
 
+MODEL_VERSION = "donut-base-finetuned-cord-v2"
+TASK_PROMPT = "<s_cord-v2>"
+WARMUP_IMAGE_SIZE = (480, 640)
+# CORD total fields naming how a receipt was paid
+_CORD_PAYMENTS = (("creditcardprice", "card"), ("emoneyprice", "e-money"), ("cashprice", "cash"))
+
+# A file path, the encoded image bytes, or an already opened image
+ImageSource = Union[str, Path, bytes, "Image.Image"]
+# Called with the index of the source in the batch and a partial invoice
+PartialListener = Callable[[int, Invoice], None]
+
+# Listener for parses that are not given one explicitly, see ``partial_results``
+_partial_listener: ContextVar[Optional[PartialListener]] = ContextVar("partial_listener", default=None)
+
 _processor = None
 _model = None
+_backend: Backend = create_backend("torch")
+_backend_options: dict = {}
+_decode_settings = DecodeSettings()
+
+
+def set_backend(name: str, **options) -> None:
+    """
+    Selects the inference backend ("torch" or "onnx") and drops any loaded model,
+    so the next parse loads it through the new backend.
+    """
+    global _backend, _backend_options, _processor, _model
+    _backend = create_backend(name, **options)
+    _backend_options = options
+    _processor = None
+    _model = None
+
+
+def get_backend() -> Backend:
+    return _backend
+
+
+def backend_config() -> tuple:
+    """Returns the ``(name, options)`` needed to select the current backend elsewhere."""
+    return _backend.name, dict(_backend_options)
+
+
+def set_decode_settings(settings: DecodeSettings) -> None:
+    """Sets the decoding budget and early-stopping thresholds used by ``generate``."""
+    global _decode_settings
+    _decode_settings = settings
+
+
+def get_decode_settings() -> DecodeSettings:
+    return _decode_settings
 
 
 def _get_model():
@@ -19,65 +87,346 @@ def _get_model():
     """
     global _processor, _model
     if _processor is None or _model is None:
-        try:
-            import torch
-            from transformers import DonutProcessor, VisionEncoderDecoderModel
-        except ImportError as exc:
-            raise ImportError(
-                "ML dependencies are not installed. Please install them with "
-                "'pip install torch transformers sentencepiece'"
-            ) from exc
+        _processor, _model = _backend.load()
 
-        _processor = DonutProcessor.from_pretrained("naver-clova-ix/donut-base-finetuned-cord-v2")
-        _model = VisionEncoderDecoderModel.from_pretrained("naver-clova-ix/donut-base-finetuned-cord-v2")
+    return _processor, _model
 
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        _model.to(device)
 
-    return _processor, _model
+def warm_up() -> None:
+    """
+    Loads the model and runs one inference on a blank synthetic image, so the
+    first real receipt does not pay for lazy initialisation.
+    """
+    processor, model = _get_model()
+    image = Image.new("RGB", WARMUP_IMAGE_SIZE, "white")
+    _generate_sequences(processor, model, [image], StageTimings())
 
 
 def parse_image(path: str, *, lang: str = "deu") -> Invoice:
     """
     Parses a receipt image and returns an Invoice object.
     """
+    return parse_images([path], lang=lang)[0]
+
+
+def parse_bytes(data: bytes, *, lang: str = "deu") -> Invoice:
+    """
+    Parses a receipt from its encoded image bytes, without writing them to disk.
+    """
+    return parse_images([data], lang=lang)[0]
+
+
+def parse_pil(image: Image.Image, *, lang: str = "deu") -> Invoice:
+    """
+    Parses a receipt from an already opened PIL image.
+    """
+    return parse_images([image], lang=lang)[0]
+
+
+def parse_image_stream(source: ImageSource, *, lang: str = "deu") -> Iterator[Invoice]:
+    """
+    Parses a receipt and yields partial invoices while it is decoded: the
+    merchant first, then each item as it is closed. The last invoice yielded is
+    the complete result. Closing the generator early stops decoding.
+    """
+    updates: queue.Queue = queue.Queue()
+    cancel = Event()
+
+    def _parse() -> None:
+        try:
+            invoices = parse_images([source], lang=lang, on_partial=lambda _, partial: updates.put(partial), cancel=cancel)
+            updates.put(invoices[0])
+        except BaseException as exc:
+            updates.put(exc)
+        finally:
+            updates.put(None)
+
+    Thread(target=_parse, name="parse-stream", daemon=True).start()
+    try:
+        while True:
+            update = updates.get()
+            if update is None:
+                return
+            if isinstance(update, BaseException):
+                raise update
+            yield update
+    finally:
+        cancel.set()
+
+
+@contextmanager
+def partial_results(listener: PartialListener) -> Iterator[None]:
+    """
+    Sends the partial invoices of parses run in this context, on this thread,
+    to ``listener`` (see ``parse_images``).
+    """
+    token = _partial_listener.set(listener)
+    try:
+        yield
+    finally:
+        _partial_listener.reset(token)
+
+
+def parse_images(
+    sources: Sequence[ImageSource],
+    *,
+    lang: str = "deu",
+    on_partial: Optional[PartialListener] = None,
+    cancel: Optional[Event] = None,
+) -> List[Invoice]:
+    """
+    Parses several receipt images with a single ``generate`` call.
+
+    Each source may be a path, encoded image bytes or a PIL image. The images
+    are stacked into one ``pixel_values`` batch, so the encoder and decoder run
+    once for the whole batch. Results are returned in input order.
+
+    Each invoice reports the seconds spent per stage in ``meta["timings"]``,
+    the number of images parsed together in ``meta["batch_size"]`` and the
+    size of the image fed to the processor in ``meta["image_size"]``.
+
+    While ``generate`` runs, ``on_partial`` (or the listener set with
+    ``partial_results``) is called with the source's index and a partial
+    invoice, marked by ``meta["partial"]``, whenever the merchant, an item or
+    the total has been decoded. Setting ``cancel`` stops decoding early.
+    """
+    if not sources:
+        return []
+    if on_partial is None:
+        on_partial = _partial_listener.get()
+
     processor, model = _get_model()
+    timings = StageTimings()
 
-    # Load image
-    image = Image.open(path).convert("RGB")
+    # Load images, decoding large ones straight at the processor's target size
+    with timings.measure(STAGE_IMAGE_LOAD):
+        target = processor_target(processor)
+        images = [_load_source(source, target) for source in sources]
 
-    # Prepare decoder input
-    task_prompt = "<s_cord-v2>"
-    decoder_input_ids = processor.tokenizer(task_prompt, add_special_tokens=False, return_tensors="pt").input_ids
+    on_update = _PartialInvoices(on_partial) if on_partial is not None else None
+    sequences, stats = _generate_sequences(processor, model, images, timings, on_update=on_update, cancel=cancel)
+    invoices = []
+    for image, sequence, decode_stats in zip(images, sequences, stats):
+        invoice_timings = timings.copy()
+        invoice = _sequence_to_invoice(sequence, invoice_timings)
+        invoice.meta["decoding"] = decode_stats.as_dict()
+        invoice.meta["timings"] = invoice_timings.as_dict()
+        invoice.meta["batch_size"] = len(sources)
+        size = getattr(image, "size", None)
+        if size:
+            invoice.meta["image_size"] = list(size)
+        invoices.append(invoice)
+    return invoices
 
-    # Process image
-    pixel_values = processor(image, return_tensors="pt").pixel_values
 
-    # Move tensors to the same device as the model
-    device = model.parameters()[0].device
-    pixel_values = pixel_values.to(device)
-    decoder_input_ids = decoder_input_ids.to(device)
+def _load_source(source: ImageSource, target) -> Image.Image:
+    if isinstance(source, bytes):
+        return load_image(io.BytesIO(source), target)
+    if isinstance(source, (str, Path)):
+        return load_image(source, target)
+    return fit_image(source, target)
 
-    # Generate output
-    outputs = model.generate(
-        pixel_values,
-        decoder_input_ids=decoder_input_ids,
-        max_length=model.decoder.config.max_position_embeddings,
-        pad_token_id=processor.tokenizer.pad_token_id,
-        eos_token_id=processor.tokenizer.eos_token_id,
-        use_cache=True,
-        bad_words_ids=[[processor.tokenizer.unk_token_id]],
-        return_dict_in_generate=True,
+
+class _PartialInvoices:
+    """Turns decoder updates into partial invoices, passing on those that changed."""
+
+    def __init__(self, listener: PartialListener) -> None:
+        self._listener = listener
+        self._sent: dict = {}
+
+    def __call__(self, index: int, decoder: CordDecoder) -> None:
+        # Only lines ended by <sep/> count, so an item is not sent before its price is complete
+        fields = _cord_to_fields(decoder.result(complete_entries=True))
+        if fields is None or fields == self._sent.get(index):
+            return
+        self._sent[index] = fields
+        invoice = _fields_to_invoice(fields)
+        invoice.invoice_id = "partial"
+        invoice.meta["partial"] = True
+        self._listener(index, invoice)
+
+
+def _generate_sequences(
+    processor,
+    model,
+    images: list,
+    timings: StageTimings,
+    *,
+    on_update: Optional[Callable[[int, CordDecoder], None]] = None,
+    cancel: Optional[Event] = None,
+) -> Tuple[List[str], List[DecodeStats]]:
+    with timings.measure(STAGE_PREPROCESS):
+        # Prepare decoder input, one prompt per image
+        decoder_input_ids = processor.tokenizer(
+            [TASK_PROMPT] * len(images), add_special_tokens=False, return_tensors="pt"
+        ).input_ids
+
+        # Process images into a single stacked batch
+        pixel_values = processor(images, return_tensors="pt").pixel_values
+
+        # Move tensors to the same device as the model
+        device = getattr(model, "device", None) or next(iter(model.parameters())).device
+        pixel_values = pixel_values.to(device)
+        decoder_input_ids = decoder_input_ids.to(device)
+
+    # Bound the decoding budget by the model's positional limit
+    max_positions = _decoder_config(model).max_position_embeddings
+    max_new_tokens = min(_decode_settings.max_new_tokens, max_positions - decoder_input_ids.shape[-1])
+    monitor = DecodeMonitor(
+        processor.tokenizer,
+        len(images),
+        _decode_settings,
+        on_update=on_update,
+        cancel=cancel,
+        max_new_tokens=max_new_tokens,
     )
 
-    # Decode and parse output
-    sequence = processor.batch_decode(outputs.sequences)[0]
-    sequence = sequence.replace(processor.tokenizer.eos_token, "").replace(processor.tokenizer.pad_token, "")
-    sequence = sequence.split("<s_cord-v2>", 1)[-1].strip()
+    # Generate output
+    with timings.measure(STAGE_GENERATE):
+        outputs = model.generate(
+            pixel_values,
+            decoder_input_ids=decoder_input_ids,
+            max_new_tokens=max_new_tokens,
+            stopping_criteria=_stopping_criteria(monitor),
+            pad_token_id=processor.tokenizer.pad_token_id,
+            eos_token_id=processor.tokenizer.eos_token_id,
+            use_cache=True,
+            bad_words_ids=[[processor.tokenizer.unk_token_id]],
+            return_dict_in_generate=True,
+            **_backend.generate_kwargs(),
+        )
+
+    # Decode and strip special tokens
+    sequences = []
+    with timings.measure(STAGE_BATCH_DECODE):
+        for sequence in processor.batch_decode(outputs.sequences):
+            sequence = sequence.replace(processor.tokenizer.eos_token, "").replace(processor.tokenizer.pad_token, "")
+            sequences.append(sequence.split(TASK_PROMPT, 1)[-1].strip())
+    return sequences, monitor.stats()
+
+
+def _stopping_criteria(monitor: DecodeMonitor):
+    try:
+        from transformers import StoppingCriteriaList
+    except ImportError:
+        return [monitor]
+    return StoppingCriteriaList([monitor])
+
+
+def _decoder_config(model):
+    decoder = getattr(model, "decoder", None)
+    if decoder is not None and hasattr(decoder, "config"):
+        return decoder.config
+    # ONNX Runtime models only expose the decoder settings on the composite config
+    return model.config.decoder
+
+
+def _sequence_to_invoice(sequence: str, timings: StageTimings) -> Invoice:
+    with timings.measure(STAGE_JSON_MAPPING):
+        fields = _sequence_to_fields(sequence)
+    with timings.measure(STAGE_VALIDATION):
+        return _fields_to_invoice(fields)
 
+
+def _sequence_to_fields(sequence: str) -> Optional[dict]:
+    """
+    Maps the model's output to the fields of an Invoice, or None if nothing
+    could be read from it. Donut emits CORD tag sequences; output starting with
+    ``{`` is read as CORD JSON instead.
+    """
+    if not sequence.lstrip().startswith("{"):
+        return _cord_to_fields(cord.decode(sequence))
     try:
         data = json.loads(sequence)
     except json.JSONDecodeError:
+        return None
+
+    items_data = data.get("menu", [])
+    items = []
+    for item_data in items_data:
+        try:
+            qty = Decimal(item_data.get("cnt", {}).get("value", "1"))
+            unit_price = Decimal(item_data.get("price", {}).get("value", "0"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        items.append(
+            {
+                "description": item_data.get("nm", {}).get("value"),
+                "qty": qty,
+                "unit_price": unit_price,
+                "total_price": qty * unit_price,
+                "vat_rate": 19,  # Defaulting to 19, as the model doesn't provide this
+            }
+        )
+
+    return {
+        "merchant": {
+            "name": data.get("merchant_name", {}).get("value"),
+            "address": data.get("merchant_address", {}).get("value"),
+        },
+        "items": items,
+        "totals": {
+            "gross": Decimal(data.get("total", {}).get("price", {}).get("value", "0")),
+            "payment_method": "unknown",
+        },
+    }
+
+
+def _cord_to_fields(data: dict) -> Optional[dict]:
+    """Maps a decoded CORD tag sequence to the fields of an Invoice."""
+    if not data:
+        return None
+
+    items = []
+    for item_data in cord.as_list(data.get("menu")):
+        if not isinstance(item_data, dict) or not isinstance(item_data.get("nm"), str):
+            continue
+        qty = cord.parse_amount(item_data.get("cnt")) or Decimal("1")
+        # CORD's price is the line total; the unit price is only there for some lines
+        total_price = cord.parse_amount(item_data.get("price"))
+        unit_price = cord.parse_amount(item_data.get("unitprice"))
+        if unit_price is None:
+            if total_price is None:
+                continue
+            unit_price = total_price / qty
+        items.append(
+            {
+                "description": item_data["nm"],
+                "qty": qty,
+                "unit_price": unit_price,
+                "total_price": total_price if total_price is not None else qty * unit_price,
+                "vat_rate": 19,  # Defaulting to 19, as the model doesn't provide this
+            }
+        )
+
+    total = data.get("total")
+    if not isinstance(total, dict):
+        total = {"total_price": total}
+    payment_method = next((method for key, method in _CORD_PAYMENTS if key in total), "unknown")
+    return {
+        "merchant": {
+            "name": _cord_text(data, "merchant_name", "store_name") or "unknown",
+            "address": _cord_text(data, "merchant_address", "store_addr") or "unknown",
+        },
+        "items": items,
+        "totals": {
+            "gross": cord.parse_amount(total.get("total_price")) or Decimal("0"),
+            "payment_method": payment_method,
+        },
+    }
+
+
+def _cord_text(data: dict, *keys: str) -> Optional[str]:
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+def _fields_to_invoice(fields: Optional[dict]) -> Invoice:
+    """Validates mapped fields into an Invoice, dropping items that fail validation."""
+    if fields is None:
         return Invoice(
             invoice_id="unknown",
             merchant=Merchant(name="unknown", address="unknown"),
@@ -88,50 +437,27 @@ def parse_image(path: str, *, lang: str = "deu") -> Invoice:
             meta={},
         )
 
-    # Map to Invoice object
-    merchant = Merchant(
-        name=data.get("merchant_name", {}).get("value"),
-        address=data.get("merchant_address", {}).get("value"),
-    )
-
-    items_data = data.get("menu", [])
     items = []
-    for item_data in items_data:
+    for item_fields in fields["items"]:
         try:
-            qty = Decimal(item_data.get("cnt", {}).get("value", "1"))
-            unit_price = Decimal(item_data.get("price", {}).get("value", "0"))
-            items.append(
-                Item(
-                    description=item_data.get("nm", {}).get("value"),
-                    qty=qty,
-                    unit_price=unit_price,
-                    total_price=qty * unit_price,
-                    vat_rate=19,  # Defaulting to 19, as the model doesn't provide this
-                )
-            )
-        except (KeyError, TypeError, ValueError):
+            items.append(Item(**item_fields))
+        except ValueError:
             continue
 
-    totals = Totals(
-        gross=Decimal(data.get("total", {}).get("price", {}).get("value", "0")),
-        payment_method="unknown",
-    )
-
-    invoice = Invoice(
+    return Invoice(
         invoice_id=str(uuid.uuid4()),
-        merchant=merchant,
+        merchant=Merchant(**fields["merchant"]),
         timestamp="unknown",
         currency="EUR",
         items=items,
-        totals=totals,
+        totals=Totals(**fields["totals"]),
         meta={},
     )
 
-    return invoice
-
 
-def parse_text(ocr_text: str) -> Invoice:  # pragma: no cover
+def parse_text(ocr_text: str) -> Invoice:
     """
-    Optional stub if you choose to parse from pre-run OCR text.
+    Parses receipt text that was already recognized, without the model. See
+    :mod:`receipt_reader.text` for the rules applied to German receipts.
     """
-    raise NotImplementedError("parse_text() is not implemented yet")
+    return text.parse_receipt_text(ocr_text)
@@ -0,0 +1,81 @@
+"""
+Image loading for the Donut processor.
+
+Phone photos are often 12 megapixels while the processor works on a
+1920x2560 canvas. Decoding the full image and letting the processor resize it
+wastes most of the work, so ``load_image`` decodes JPEGs at reduced resolution
+(draft mode) and resizes once, straight to the size the processor would end up
+with.
+"""
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+from PIL import Image
+
+Size = Tuple[int, int]
+
+# Let Pillow shrink by an integer factor with a box filter before resampling
+# whenever the image is at least this many times larger than the target.
+_REDUCING_GAP = 3.0
+
+
+def processor_target(processor) -> Optional[Tuple[Size, bool]]:
+    """
+    Returns the processor's ``(width, height)`` canvas and whether it rotates
+    images to match the canvas orientation, or None if it does not resize.
+    """
+    image_processor = getattr(processor, "image_processor", None)
+    size = getattr(image_processor, "size", None)
+    if not isinstance(size, dict) or "width" not in size or "height" not in size:
+        return None
+    if not getattr(image_processor, "do_resize", True):
+        return None
+    return (size["width"], size["height"]), bool(getattr(image_processor, "do_align_long_axis", False))
+
+
+def fitted_size(size: Size, canvas: Size, *, align_long_axis: bool = False) -> Size:
+    """
+    Size the processor resizes an image to: shortest edge scaled to the
+    canvas' shortest edge, then shrunk to fit inside the canvas.
+    """
+    width, height = size
+    canvas_width, canvas_height = canvas
+    if align_long_axis and (width > height) != (canvas_width > canvas_height):
+        # The processor rotates the image by 90 degrees first
+        canvas_width, canvas_height = canvas_height, canvas_width
+    scale = min(
+        min(canvas_width, canvas_height) / min(width, height),
+        canvas_width / width,
+        canvas_height / height,
+    )
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def load_image(source, target: Optional[Tuple[Size, bool]] = None) -> Image.Image:
+    """
+    Opens ``source`` (a path or binary file object) as an RGB image. With a
+    ``target`` from :func:`processor_target` large images are decoded at reduced
+    resolution and downscaled in one step. Images smaller than the target are
+    left for the processor to upscale.
+    """
+    image = Image.open(source)
+    if target is not None and image.format == "JPEG":
+        canvas, align_long_axis = target
+        size = fitted_size(image.size, canvas, align_long_axis=align_long_axis)
+        if size[0] < image.size[0]:
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while staying >= the target size
+            image.draft("RGB", size)
+    return fit_image(image, target)
+
+
+def fit_image(image: Image.Image, target: Optional[Tuple[Size, bool]] = None) -> Image.Image:
+    """Converts an already opened image to RGB and downscales it to ``target``."""
+    image = image.convert("RGB")
+    if target is None:
+        return image
+    canvas, align_long_axis = target
+    size = fitted_size(image.size, canvas, align_long_axis=align_long_axis)
+    if size[0] >= image.size[0]:
+        return image
+    return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=_REDUCING_GAP)
@@ -0,0 +1,55 @@
+"""
+Timing of the stages of a parse.
+
+``parse_images`` measures each stage with a :class:`StageTimings` and stores
+the result in ``invoice.meta["timings"]``, so the timings travel with the
+invoice even when inference runs in a worker process. Stages shared by a
+batch (image loading through ``batch_decode``) report the time of the whole
+batch for every invoice in it; divide them by ``invoice.meta["batch_size"]``
+for a receipt's share.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Dict, Iterator, Optional
+
+STAGE_IMAGE_LOAD = "image_load"
+STAGE_PREPROCESS = "preprocess"
+STAGE_GENERATE = "generate"
+STAGE_BATCH_DECODE = "batch_decode"
+STAGE_JSON_MAPPING = "json_mapping"
+STAGE_VALIDATION = "validation"
+
+STAGES = (
+    STAGE_IMAGE_LOAD,
+    STAGE_PREPROCESS,
+    STAGE_GENERATE,
+    STAGE_BATCH_DECODE,
+    STAGE_JSON_MAPPING,
+    STAGE_VALIDATION,
+)
+
+# Stages run once per receipt rather than once per inference batch
+PER_RECEIPT_STAGES = (STAGE_JSON_MAPPING, STAGE_VALIDATION)
+
+
+class StageTimings:
+    """Seconds spent in each stage; a stage measured twice adds up."""
+
+    def __init__(self, seconds: Optional[Dict[str, float]] = None) -> None:
+        self.seconds: Dict[str, float] = dict(seconds or {})
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + perf_counter() - start
+
+    def copy(self) -> "StageTimings":
+        return StageTimings(self.seconds)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {stage: round(seconds, 6) for stage, seconds in self.seconds.items()}
@@ -0,0 +1,273 @@
+"""
+Rule-based parsing of German receipt text, for receipts whose OCR text is
+already known.
+
+The text is read line by line against precompiled patterns, in three phases:
+the merchant header up to the first priced line, the item lines up to the
+total (``SUMME``, ``Zu zahlen``, ...), and the payment and VAT lines after it.
+It understands:
+
+- item lines ending in a price and an optional VAT class, such as
+  ``PFANNER EISTEE  1,99 B`` or ``4002718777225 Winkelleiste  13.99 19``
+- quantity lines such as ``2 Stk x 1,19`` or ``0,534 kg x 1,69 EUR/kg``, which
+  complete the item before or after them, and ``6x`` prefixes
+- VAT classes: letters A and B mean 7% and 19% unless the receipt's VAT
+  table (``A= 19,0%``) says otherwise; numeric classes are the rate itself
+- cash (with given and change amounts), girocard, credit card and SEPA payments
+"""
+from __future__ import annotations
+
+import re
+import uuid
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from .cord import parse_amount
+from .types import Invoice, Item, Merchant, Totals
+
+TEXT_PARSER_VERSION = "text-rules-de-1"
+DEFAULT_VAT_CLASSES = {"A": 7, "B": 19}
+DEFAULT_VAT_RATE = 19
+
+_AMOUNT = r"-?\d{1,6}[.,]\d{2}"
+# A VAT class letter, or the rate itself as on DIY store receipts
+_VAT = r"(?P<vat>[A-D]|7|19)"
+_ITEM = re.compile(
+    rf"^(?:(?P<count>\d{{1,3}})\s*[xX]\s+)?(?:(?P<ean>\d{{8,14}})\s+)?(?P<desc>.*?[^\W\d_].*?)"
+    rf"\s+(?P<price>{_AMOUNT})(?:\s*(?:EUR|€))?(?:\s*(?P<vat_class>[A-D])|\s+(?P<vat>7|19))?\s*\*?$"
+)
+_EAN_PREFIX = re.compile(r"^(?P<ean>\d{8,14})\s+(?P<desc>.+)$")
+_QUANTITY = re.compile(
+    rf"^(?P<qty>\d{{1,4}}(?:[.,]\d{{1,3}})?)\s*(?:Stk|St|kg)?\.?\s*(?:[xX*]|a)\s*(?P<unit>{_AMOUNT})"
+    rf"(?:\s*(?:EUR|€))?(?:\s*/\s*kg)?(?:\s*=?\s*(?P<total>{_AMOUNT}))?(?:\s+{_VAT})?\s*$",
+    re.IGNORECASE,
+)
+_TOTAL = re.compile(
+    rf"^(?:SUMME|GESAMT(?:BETRAG)?|TOTAL|ZU\s+ZAHLEN|ZAHLBETRAG)\b[^\d-]*(?P<amount>{_AMOUNT})", re.IGNORECASE
+)
+_VAT_TABLE = re.compile(r"^(?P<vat>[A-D])\s*[=:]?\s*(?P<rate>\d{1,2})(?:[.,]\d+)?\s*%")
+_GIVEN = re.compile(rf"^(?:GEG(?:EBEN|\.)?|BAR)\b[^\d-]*(?P<amount>{_AMOUNT})", re.IGNORECASE)
+_CHANGE = re.compile(rf"^(?:R(?:UE|[UÜ])CKGELD|ZUR(?:UE|[UÜ])CK|WECHSELGELD)\b[^\d-]*(?P<amount>{_AMOUNT})", re.IGNORECASE)
+_PAYMENTS = (
+    (re.compile(r"\b(?:EC[- ]?KARTE|GIROCARD|EC[- ]?CASH)\b", re.IGNORECASE), "Girocard"),
+    (re.compile(r"\bMASTER\s?CARD\b", re.IGNORECASE), "Mastercard"),
+    (re.compile(r"\bVISA\b", re.IGNORECASE), "Visa"),
+    (re.compile(r"\bMAESTRO\b", re.IGNORECASE), "Maestro"),
+    (re.compile(r"\b(?:AMEX|AMERICAN EXPRESS)\b", re.IGNORECASE), "American Express"),
+    (re.compile(r"\b(?:SEPA|ELV|LASTSCHRIFT)\b", re.IGNORECASE), "SEPA-ELV"),
+    (re.compile(r"\bKREDITKARTE\b", re.IGNORECASE), "Credit card"),
+)
+_CASH = re.compile(r"\bBAR\b", re.IGNORECASE)
+_POSTCODE = re.compile(r"\b\d{5}\s+[^\W\d_]")
+_PHONE = re.compile(r"\bTEL(?:EFON)?\.?\s*:?\s*(?P<phone>\+?\d[\d /-]{4,}\d)", re.IGNORECASE)
+_DATE_TIME = re.compile(
+    r"\b(?P<day>\d{2})\.(?P<month>\d{2})\.(?P<year>\d{4}|\d{2})"
+    r"(?:[ ,]+(?P<hour>\d{2}):(?P<minute>\d{2})(?::(?P<second>\d{2}))?)?"
+)
+# Header lines that are neither name nor address
+_HEADER_NOISE = re.compile(r"^(?:EUR|€|UST|UID|STEUER|ST\.?-?NR|WWW\.|HTTP)", re.IGNORECASE)
+
+_CENT_TOLERANCE = Decimal("0.02")
+
+
+class _Line:
+    __slots__ = ("description", "sku", "qty", "unit_price", "total_price", "vat", "raw_line")
+
+    def __init__(self, description: str, total_price: Decimal, raw_line: str) -> None:
+        self.description = description
+        self.sku: Optional[str] = None
+        self.qty = Decimal("1")
+        self.unit_price = total_price
+        self.total_price = total_price
+        self.vat: Optional[str] = None
+        self.raw_line = raw_line
+
+    def set_quantity(self, qty: Decimal, unit_price: Decimal) -> None:
+        self.qty = qty
+        self.unit_price = unit_price
+
+    def matches(self, qty: Decimal, unit_price: Decimal) -> bool:
+        return abs(qty * unit_price - self.total_price) <= _CENT_TOLERANCE
+
+
+def parse_receipt_text(text: str) -> Invoice:
+    """Parses the OCR text of a German receipt into an Invoice."""
+    header: List[str] = []
+    lines: List[_Line] = []
+    vat_classes: Dict[str, int] = dict(DEFAULT_VAT_CLASSES)
+    gross: Optional[Decimal] = None
+    given: Optional[Decimal] = None
+    change: Optional[Decimal] = None
+    payment_method: Optional[str] = None
+    timestamp: Optional[str] = None
+    phone: Optional[str] = None
+    # A description line waiting for its price, and a quantity line waiting for its item
+    pending_description: Optional[str] = None
+    pending_quantity: Optional[Tuple[Decimal, Decimal]] = None
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if timestamp is None:
+            timestamp = _timestamp(line)
+        if phone is None:
+            match = _PHONE.search(line)
+            if match:
+                phone = match.group("phone").strip()
+                continue
+
+        if gross is None:
+            match = _TOTAL.match(line)
+            if match:
+                gross = parse_amount(match.group("amount"))
+                continue
+
+            match = _QUANTITY.match(line)
+            if match:
+                qty = parse_amount(match.group("qty"))
+                unit_price = parse_amount(match.group("unit"))
+                total = parse_amount(match.group("total"))
+                if not qty:
+                    continue
+                if total is not None and pending_description is None and not lines and header:
+                    # The first item's description line was taken for part of the header
+                    pending_description = header.pop()
+                if unit_price is None or unit_price < 0 or (total is not None and total < 0):
+                    # Returned deposits are not items, and neither is the description line they close
+                    pending_description = None
+                    continue
+                if total is not None and pending_description is not None:
+                    sku, description = _split_ean(pending_description)
+                    item = _Line(description, total, line)
+                    item.sku = sku
+                    item.set_quantity(qty, unit_price)
+                    item.vat = match.group("vat")
+                    lines.append(item)
+                    pending_description = None
+                elif lines and lines[-1].matches(qty, unit_price):
+                    lines[-1].set_quantity(qty, unit_price)
+                else:
+                    pending_quantity = (qty, unit_price)
+                continue
+
+            match = _ITEM.match(line)
+            if match:
+                total = parse_amount(match.group("price"))
+                if total is None or total < 0:
+                    # Discounts and returned deposits are not items
+                    continue
+                item = _Line(_description(match.group("desc")), total, line)
+                item.sku = match.group("ean")
+                item.vat = match.group("vat_class") or match.group("vat")
+                count = match.group("count")
+                if pending_quantity is not None and item.matches(*pending_quantity):
+                    item.set_quantity(*pending_quantity)
+                elif count and int(count):
+                    item.set_quantity(Decimal(count), total / Decimal(count))
+                lines.append(item)
+                pending_description = pending_quantity = None
+                continue
+
+            if lines or pending_description is not None:
+                pending_description = line
+            elif not _HEADER_NOISE.match(line):
+                header.append(line)
+            continue
+
+        match = _VAT_TABLE.match(line)
+        if match:
+            vat_classes[match.group("vat")] = int(match.group("rate"))
+            continue
+        match = _CHANGE.match(line)
+        if match:
+            change = parse_amount(match.group("amount"))
+            continue
+        match = _GIVEN.match(line)
+        if match:
+            given = parse_amount(match.group("amount"))
+        if payment_method is None:
+            payment_method = _payment_method(line)
+
+    items = [_item(line, vat_classes) for line in lines]
+    if gross is None:
+        gross = sum((item.total_price for item in items), Decimal("0"))
+    if payment_method is None and (given is not None or change is not None):
+        payment_method = "Cash"
+    if payment_method == "Cash" and given is not None and change is not None:
+        payment_method = f"Cash ({given:.2f} given, {change:.2f} change)"
+
+    name, address = _merchant(header)
+    return Invoice(
+        invoice_id=str(uuid.uuid4()),
+        merchant=Merchant(name=name, address=address, phone=phone),
+        timestamp=timestamp or "unknown",
+        currency="EUR",
+        items=items,
+        totals=Totals(gross=gross, payment_method=payment_method or "unknown"),
+        meta={"model_version": TEXT_PARSER_VERSION},
+    )
+
+
+def _description(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _split_ean(text: str) -> Tuple[Optional[str], str]:
+    match = _EAN_PREFIX.match(text)
+    if match is None:
+        return None, _description(text)
+    return match.group("ean"), _description(match.group("desc"))
+
+
+def _item(line: _Line, vat_classes: Dict[str, int]) -> Item:
+    if line.vat is None:
+        vat_rate = DEFAULT_VAT_RATE
+    elif line.vat.isdigit():
+        vat_rate = int(line.vat)
+    else:
+        vat_rate = vat_classes.get(line.vat, DEFAULT_VAT_RATE)
+    return Item(
+        sku_or_ean=line.sku,
+        description=line.description,
+        qty=line.qty,
+        unit_price=line.unit_price,
+        total_price=line.total_price,
+        vat_rate=vat_rate,
+        raw_line=line.raw_line,
+    )
+
+
+def _payment_method(line: str) -> Optional[str]:
+    for pattern, method in _PAYMENTS:
+        if pattern.search(line):
+            return method
+    if _CASH.search(line):
+        return "Cash"
+    return None
+
+
+def _merchant(header: List[str]) -> Tuple[str, str]:
+    """The first header line is the name; the address ends at the line with the postcode."""
+    if not header:
+        return "unknown", "unknown"
+    name = header[0]
+    for index, line in enumerate(header[1:], start=1):
+        if _POSTCODE.search(line):
+            street = header[index - 1] if index > 1 and any(char.isdigit() for char in header[index - 1]) else None
+            return name, f"{street}, {line}" if street else line
+    return name, header[1] if len(header) > 1 else "unknown"
+
+
+def _timestamp(line: str) -> Optional[str]:
+    match = _DATE_TIME.search(line)
+    if match is None:
+        return None
+    year = int(match.group("year"))
+    if year < 100:
+        year += 2000
+    month, day = int(match.group("month")), int(match.group("day"))
+    if not (1 <= month <= 12 and 1 <= day <= 31):
+        return None
+    hour, minute, second = (int(match.group(name) or 0) for name in ("hour", "minute", "second"))
+    return f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{second:02d}"
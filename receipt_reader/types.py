@@ -61,5 +61,9 @@ class Invoice(BaseModel):
     totals: Totals
     meta: dict
 
+    class Config:
+        # Serialize amounts as strings so .json() round-trips without float rounding
+        json_encoders = {Decimal: str}
+
     def sum_items(self) -> Decimal:
         return sum((i.total_price for i in self.items), Decimal("0.00")).quantize(Decimal("0.01"))
@@ -0,0 +1,114 @@
+"""
+Model weights mapped from safetensors files instead of read into memory.
+
+A safetensors file is an 8-byte little-endian header length, a JSON header
+giving each tensor's dtype, shape and byte range, then the raw tensor data.
+:func:`load_mapped` maps the files copy-on-write and builds every tensor as a
+view of the mapping, so the weights live in the page cache: all processes on
+a host that map the same files share one copy of them, and a process only
+pays for pages it writes to.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple
+
+SAFETENSORS_PATTERN = "*.safetensors"
+
+_DTYPES = {
+    "F64": "float64",
+    "F32": "float32",
+    "F16": "float16",
+    "BF16": "bfloat16",
+    "I64": "int64",
+    "I32": "int32",
+    "I16": "int16",
+    "I8": "int8",
+    "U8": "uint8",
+    "BOOL": "bool",
+}
+
+
+class TensorEntry(NamedTuple):
+    name: str
+    # Name of the torch dtype
+    dtype: str
+    shape: List[int]
+    # Byte range within the data section
+    start: int
+    end: int
+
+
+def weight_files(directory: Path) -> List[Path]:
+    return sorted(Path(directory).glob(SAFETENSORS_PATTERN))
+
+
+def read_index(buffer) -> Tuple[int, List[TensorEntry]]:
+    """The offset where tensor data starts and the tensors listed in a safetensors header."""
+    (header_size,) = struct.unpack("<Q", buffer[:8])
+    header = json.loads(bytes(buffer[8:8 + header_size]))
+    entries = []
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        if info["dtype"] not in _DTYPES:
+            raise ValueError(f"Unsupported safetensors dtype {info['dtype']} of {name}")
+        start, end = info["data_offsets"]
+        entries.append(TensorEntry(name, _DTYPES[info["dtype"]], info["shape"], start, end))
+    return 8 + header_size, entries
+
+
+@contextmanager
+def parameters_on_meta() -> Iterator[None]:
+    """
+    Creates module parameters on the meta device while active, so building a
+    model neither allocates nor initializes its weights before the mapped ones
+    are assigned. Buffers are created as usual, since the non-persistent ones
+    are not in the weight files.
+    """
+    import torch
+
+    register = torch.nn.Module.register_parameter
+
+    def register_on_meta(module, name, param):
+        register(module, name, param)
+        if param is not None:
+            module._parameters[name] = torch.nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)
+
+    torch.nn.Module.register_parameter = register_on_meta
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = register
+
+
+def load_mapped(directory: Path) -> Dict[str, Any]:
+    """
+    Maps every safetensors file in ``directory`` and returns the state dict of
+    tensors backed by the mappings. Load it with ``assign=True`` so the model
+    keeps these tensors rather than copying them into its own.
+    """
+    import torch
+
+    files = weight_files(directory)
+    if not files:
+        raise FileNotFoundError(f"No safetensors files in {directory}")
+    tensors = {}
+    for path in files:
+        with path.open("rb") as fh:
+            # Private mapping: pages stay shared until written, and tensors over it are writable
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
+        base, entries = read_index(mapped)
+        for entry in entries:
+            dtype = getattr(torch, entry.dtype)
+            count = (entry.end - entry.start) // dtype.itemsize
+            if count:
+                tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=base + entry.start)
+            else:
+                tensor = torch.empty(0, dtype=dtype)
+            tensors[entry.name] = tensor.reshape(entry.shape)
+    return tensors
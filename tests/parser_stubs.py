@@ -3,22 +3,49 @@ Fixtures and stubs for testing the parser.
 """
 from __future__ import annotations
 import json
+import sys
+import types
+from pathlib import Path
 from types import SimpleNamespace
 from decimal import Decimal
 import datetime
+from typing import Callable, List, Optional
 
 from receipt_reader.types import Invoice, Merchant, Item, Totals
 from receipt_reader import parser
 
 
 class _FakeTensor:  # pragma: no cover
+    def __init__(self, batch_size: int = 1) -> None:
+        self.batch_size = batch_size
+        self.shape = (batch_size, 1)
+
     def to(self, device: str) -> "_FakeTensor":
         return self
 
 
+class _FakeInputIds:
+    """The last generated token of every row, as ``input_ids[:, -1]`` reads it."""
+
+    device = "cpu"
+
+    def __init__(self, last_tokens: List[int]) -> None:
+        self._last_tokens = last_tokens
+
+    def __getitem__(self, key) -> SimpleNamespace:
+        return SimpleNamespace(tolist=lambda: list(self._last_tokens))
+
+
 class _FakeTokenizer:  # pragma: no cover
-    def __call__(self, *_, **__) -> SimpleNamespace:
-        return SimpleNamespace(input_ids=_FakeTensor())
+    # Vocabulary of the streaming stub; token ids start after the special tokens
+    tokens: List[str] = []
+
+    def convert_ids_to_tokens(self, token_id: int) -> str:
+        return self.tokens[token_id - 3]
+
+    def __call__(self, text, *_, **__) -> SimpleNamespace:
+        batch_size = len(text) if isinstance(text, list) else 1
+        return SimpleNamespace(input_ids=_FakeTensor(batch_size))
 
     @property
     def pad_token_id(self) -> int:
@@ -49,11 +76,12 @@ def stub_donut_pipeline(monkeypatch, *, raw_sequence: str) -> None:
             self._sequence = f"<s_cord-v2>{raw_sequence}"
             self.tokenizer = _FakeTokenizer()
 
-        def __call__(self, *_, **__) -> SimpleNamespace:
-            return SimpleNamespace(pixel_values=_FakeTensor())
+        def __call__(self, images, *_, **__) -> SimpleNamespace:
+            batch_size = len(images) if isinstance(images, list) else 1
+            return SimpleNamespace(pixel_values=_FakeTensor(batch_size))
 
         def batch_decode(self, sequences):
-            return [self._sequence]
+            return [self._sequence for _ in sequences]
 
         @classmethod
         def from_pretrained(cls, *args, **kwargs):  # pragma: no cover - trivial path
@@ -69,8 +97,8 @@ def stub_donut_pipeline(monkeypatch, *, raw_sequence: str) -> None:
         def from_pretrained(cls, *args, **kwargs):  # pragma: no cover
             return cls()
 
-        def generate(self, *args, **kwargs):
-            return SimpleNamespace(sequences=["unused"])
+        def generate(self, pixel_values, *args, **kwargs):
+            return SimpleNamespace(sequences=["unused"] * pixel_values.batch_size)
 
         def parameters(self):
             return [SimpleNamespace(device="cpu")]
@@ -78,6 +106,189 @@ def stub_donut_pipeline(monkeypatch, *, raw_sequence: str) -> None:
     monkeypatch.setattr("transformers.DonutProcessor", _FakeProcessor)
     monkeypatch.setattr("transformers.VisionEncoderDecoderModel", _FakeModel)
     monkeypatch.setattr("PIL.Image.open", lambda _: SimpleNamespace(convert=lambda _: None))
+    monkeypatch.setattr("PIL.Image.new", lambda *_, **__: None, raising=False)
+
+
+# A short receipt as Donut tokens, for stub_streaming_pipeline
+STREAMED_CORD_TOKENS = [
+    "<s_merchant_name>", "▁REWE", "</s_merchant_name>",
+    "<s_menu>", "<s_nm>", "▁Brot", "</s_nm>", "<s_price>", "2,49", "</s_price>", "<sep/>",
+    "<s_nm>", "▁Milch", "</s_nm>", "<s_price>", "1,19", "</s_price>", "</s_menu>",
+    "<s_total>", "<s_total_price>", "3,68", "</s_total_price>", "</s_total>",
+    "<s_unused>",
+]
+
+
+def stub_streaming_pipeline(
+    monkeypatch, *, tokens: List[str], before_token: Optional[Callable[[int], None]] = None
+) -> None:
+    """
+    Like ``stub_donut_pipeline``, but ``generate`` produces ``tokens`` one at a
+    time and runs the stopping criteria after each, as the real model does.
+    ``before_token`` is called with the index of every token before it is produced.
+    """
+    stub_donut_pipeline(monkeypatch, raw_sequence="".join(tokens))
+    import transformers
+
+    monkeypatch.setattr(_FakeTokenizer, "tokens", list(tokens))
+    monkeypatch.setattr("torch.tensor", lambda values, **_: list(values), raising=False)
+    monkeypatch.setattr("torch.bool", bool, raising=False)
+
+    class _StreamingModel(transformers.VisionEncoderDecoderModel):
+        def generate(self, pixel_values, *args, stopping_criteria=(), **kwargs):
+            for index in range(len(tokens)):
+                if before_token is not None:
+                    before_token(index)
+                input_ids = _FakeInputIds([index + 3] * pixel_values.batch_size)
+                if all(all(criterion(input_ids, None)) for criterion in stopping_criteria):
+                    break
+            return SimpleNamespace(sequences=["unused"] * pixel_values.batch_size)
+
+    monkeypatch.setattr("transformers.VisionEncoderDecoderModel", _StreamingModel)
+
+
+def stub_onnx_runtime(monkeypatch, *, raw_sequence: str) -> list:
+    """
+    Stub the Donut pipeline plus ``optimum.onnxruntime`` so the ONNX backend can be
+    selected without real weights. Returns a list recording each model load.
+    """
+    stub_donut_pipeline(monkeypatch, raw_sequence=raw_sequence)
+    import transformers
+
+    loads: list = []
+
+    class _FakeORTModel(transformers.VisionEncoderDecoderModel):
+        @classmethod
+        def from_pretrained(cls, model_id, *, export: bool = False, **kwargs):
+            loads.append({"model_id": str(model_id), "export": export})
+            return cls()
+
+        def save_pretrained(self, directory) -> None:
+            Path(directory).mkdir(parents=True, exist_ok=True)
+            for graph in ("encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx"):
+                (Path(directory) / graph).write_bytes(b"onnx")
+
+    optimum = types.ModuleType("optimum")
+    onnxruntime = types.ModuleType("optimum.onnxruntime")
+    setattr(onnxruntime, "ORTModelForVision2Seq", _FakeORTModel)
+    setattr(optimum, "onnxruntime", onnxruntime)
+    monkeypatch.setitem(sys.modules, "optimum", optimum)
+    monkeypatch.setitem(sys.modules, "optimum.onnxruntime", onnxruntime)
+    return loads
+
+
+def write_safetensors(path: Path, tensors: dict) -> None:
+    """Writes ``{name: (dtype, shape, data)}`` in the safetensors layout."""
+    header, offset = {}, 0
+    for name, (dtype, shape, data) in tensors.items():
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + len(data)]}
+        offset += len(data)
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-len(encoded) % 8)
+    path.write_bytes(
+        len(encoded).to_bytes(8, "little") + encoded + b"".join(data for _, _, data in tensors.values())
+    )
+
+
+class _MappedTensor:
+    def __init__(self, data: bytes, dtype, *, device: str = "cpu") -> None:
+        self.data = data
+        self.dtype = dtype
+        self.shape: list = []
+        self.device = device
+        self.requires_grad = True
+
+    @property
+    def is_meta(self) -> bool:
+        return self.device == "meta"
+
+    def reshape(self, shape) -> "_MappedTensor":
+        self.shape = list(shape)
+        return self
+
+    def to(self, device: str) -> "_MappedTensor":
+        return _MappedTensor(b"", self.dtype, device=device)
+
+
+def stub_mapped_torch(monkeypatch, *, raw_sequence: str) -> list:
+    """
+    Stub the Donut pipeline plus the torch calls that build tensors over mapped
+    weights, so the torch backend's ``weights_dir`` mode runs without torch.
+    Tensors hold a copy of the bytes they would view. The model registers a
+    parameter per stored tensor plus ``decoder.lm_head.weight``, which
+    ``tie_weights`` shares with ``decoder.embed.weight``. Returns a list
+    recording each ``from_pretrained``, model construction (with whether its
+    parameters were created on the meta device) and ``load_state_dict`` call.
+    """
+    stub_donut_pipeline(monkeypatch, raw_sequence=raw_sequence)
+    import torch
+    import transformers
+
+    calls: list = []
+
+    class _FakeConfig:
+        @classmethod
+        def from_pretrained(cls, directory):
+            return json.loads((Path(directory) / "config.json").read_text())
+
+    class _FakeModel(transformers.VisionEncoderDecoderModel):
+        config_class = _FakeConfig
+
+        def __init__(self, config: Optional[dict] = None) -> None:
+            self.config = config
+            self._parameters: dict = {}
+            self.tied = False
+            for name in ("decoder.embed.weight", "decoder.lm_head.weight", "empty"):
+                torch.nn.Module.register_parameter(self, name, _MappedTensor(b"", None))
+            calls.append(("init", all(param.is_meta for param in self._parameters.values())))
+
+        @classmethod
+        def from_pretrained(cls, model_id, **kwargs):
+            calls.append(("from_pretrained", str(model_id)))
+            model = cls.__new__(cls)
+            model.config = {"model_type": "vision-encoder-decoder"}
+            return model
+
+        def save_pretrained(self, directory, *, safe_serialization: bool = False) -> None:
+            assert safe_serialization
+            (Path(directory) / "config.json").write_text(json.dumps(self.config))
+            write_safetensors(
+                Path(directory) / "model.safetensors",
+                {"decoder.embed.weight": ("F32", [2, 1], b"\x00\x00\x80?\x00\x00\x00@"), "empty": ("I64", [0], b"")},
+            )
+
+        def load_state_dict(self, state_dict, *, strict: bool = True, assign: bool = False):
+            calls.append(("load_state_dict", sorted(state_dict), assign))
+            missing = [name for name in self._parameters if name not in state_dict]
+            self._parameters.update(state_dict)
+            return SimpleNamespace(missing_keys=missing, unexpected_keys=[])
+
+        def tie_weights(self) -> None:
+            self._parameters["decoder.lm_head.weight"] = self._parameters["decoder.embed.weight"]
+            self.tied = True
+
+        def state_dict(self, *, keep_vars: bool = False) -> dict:
+            return dict(self._parameters)
+
+        def eval(self) -> "_FakeModel":
+            return self
+
+    def _frombuffer(buffer, *, dtype, count, offset):
+        return _MappedTensor(bytes(buffer[offset:offset + count * dtype.itemsize]), dtype)
+
+    for name, itemsize in (("float32", 4), ("int64", 8)):
+        monkeypatch.setattr(torch, name, SimpleNamespace(name=name, itemsize=itemsize), raising=False)
+    monkeypatch.setattr(torch, "frombuffer", _frombuffer, raising=False)
+    monkeypatch.setattr(torch, "empty", lambda size, *, dtype: _MappedTensor(b"", dtype), raising=False)
+
+    def _register_parameter(module, name, param) -> None:
+        module._parameters[name] = param
+
+    nn = SimpleNamespace(Module=SimpleNamespace(register_parameter=_register_parameter))
+    nn.Parameter = lambda tensor, *, requires_grad: tensor
+    monkeypatch.setattr(torch, "nn", nn, raising=False)
+    monkeypatch.setattr("transformers.VisionEncoderDecoderModel", _FakeModel)
+    return calls
 
 
 def invoice_to_sequence(invoice: Invoice) -> str:
@@ -101,6 +312,20 @@ def invoice_to_sequence(invoice: Invoice) -> str:
     return json.dumps(data, ensure_ascii=False)
 
 
+def invoice_to_cord_sequence(invoice: Invoice) -> str:
+    """Converts an invoice to the CORD tag sequence Donut emits, with line totals as prices."""
+    items = "<sep/>".join(
+        f"<s_nm>{item.description}</s_nm><s_cnt>{item.qty}</s_cnt><s_price>{item.total_price}</s_price>"
+        for item in invoice.items
+    )
+    return (
+        f"<s_merchant_name>{invoice.merchant.name}</s_merchant_name>"
+        f"<s_merchant_address>{invoice.merchant.address}</s_merchant_address>"
+        f"<s_menu>{items}</s_menu>"
+        f"<s_total><s_total_price>{invoice.totals.gross}</s_total_price></s_total>"
+    )
+
+
 _FIXTURES = [
     Invoice(
         invoice_id="toom-2025-08-07-1601",
@@ -1,6 +1,7 @@
 import json
 import time
 from decimal import Decimal
+from threading import Event
 
 import pytest
 from fastapi.testclient import TestClient
@@ -8,7 +9,9 @@ from fastapi.testclient import TestClient
 from api import main
 from api import config
 from api.storage import StorageService
+from receipt_reader import parser
 from receipt_reader.types import Invoice, Item, Merchant, Totals
+from tests import parser_stubs
 
 client = TestClient(main.app)
 
@@ -17,6 +20,8 @@ client = TestClient(main.app)
 def reset_state(monkeypatch, tmp_path):
     main.job_store.reset()
     main.limiter._storage.reset()
+    main.result_cache.clear()
+    main.in_flight.reset()
     
     # Patch config and update storage service
     monkeypatch.setattr(config, "UPLOADS_DIR", tmp_path)
@@ -192,3 +197,730 @@ def test_rate_limit_exceeded(monkeypatch):
     response = client.post("/receipts", files=_file_payload())
     assert response.status_code == 429
     main.limiter.enabled = False
+
+
+def test_duplicate_upload_is_served_from_cache(monkeypatch):
+    calls = []
+
+    def _parse(path):
+        calls.append(path)
+        return sample_invoice()
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+
+    first = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert _wait_for_status(first)["status"] == "completed"
+
+    second = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert client.get(f"/receipts/{second}/status").json()["status"] == "completed"
+    assert client.get(f"/receipts/{second}").json()["parsed"]["merchant"]["name"] == "Test Merchant"
+    assert len(calls) == 1
+
+
+def test_concurrent_identical_uploads_share_one_parse(monkeypatch):
+    calls = []
+    release = Event()
+
+    def _parse(path):
+        calls.append(path)
+        release.wait(timeout=1)
+        return sample_invoice()
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+
+    leader = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    follower = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    release.set()
+
+    assert _wait_for_status(leader)["status"] == "completed"
+    assert _wait_for_status(follower)["status"] == "completed"
+    assert len(calls) == 1
+
+
+def test_result_meta_reports_decoding_stats(monkeypatch):
+    invoice = sample_invoice()
+    invoice.meta["decoding"] = {"tokens": 42, "stop_reason": "structure_closed"}
+    monkeypatch.setattr(main, "parse_image", lambda path: invoice)
+
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    _wait_for_status(job_id)
+
+    meta = client.get(f"/receipts/{job_id}").json()["meta"]
+    assert meta["decoded_tokens"] == 42
+    assert meta["stop_reason"] == "structure_closed"
+
+
+def test_stage_timings_are_reported_and_exported(monkeypatch):
+    from prometheus_client import REGISTRY
+
+    def observed(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    invoice = sample_invoice()
+    invoice.meta["decoding"] = {"tokens": 40, "stop_reason": "eos"}
+    invoice.meta["timings"] = {"image_load": 0.01, "generate": 0.5}
+    monkeypatch.setattr(main, "parse_image", lambda path: invoice)
+    generate_before = observed("receipt_parser_parse_stage_seconds_count", stage="generate")
+    rate_before = observed("receipt_parser_decode_tokens_per_second_sum")
+
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    _wait_for_status(job_id)
+
+    meta = client.get(f"/receipts/{job_id}").json()["meta"]
+    assert meta["stage_seconds"] == {"image_load": 0.01, "generate": 0.5}
+    assert observed("receipt_parser_parse_stage_seconds_count", stage="generate") == generate_before + 1
+    assert observed("receipt_parser_decode_tokens_per_second_sum") == rate_before + 80
+
+
+def test_stage_metrics_count_each_receipts_share_of_a_batch(monkeypatch):
+    from prometheus_client import REGISTRY
+
+    def observed(name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    invoice = sample_invoice()
+    invoice.meta["decoding"] = {"tokens": 40, "stop_reason": "eos"}
+    invoice.meta["timings"] = {"generate": 2.0, "validation": 0.25}
+    invoice.meta["batch_size"] = 4
+    monkeypatch.setattr(main, "parse_image", lambda path: invoice)
+    generate_before = observed("receipt_parser_parse_stage_seconds_sum", stage="generate")
+    validation_before = observed("receipt_parser_parse_stage_seconds_sum", stage="validation")
+    rate_before = observed("receipt_parser_decode_tokens_per_second_sum")
+
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    _wait_for_status(job_id)
+
+    assert observed("receipt_parser_parse_stage_seconds_sum", stage="generate") == generate_before + 0.5
+    assert observed("receipt_parser_parse_stage_seconds_sum", stage="validation") == validation_before + 0.25
+    assert observed("receipt_parser_decode_tokens_per_second_sum") == rate_before + 80
+
+
+def test_full_queue_returns_503_with_retry_after(monkeypatch):
+    rejected = []
+
+    def reject(job_id, **kwargs):
+        rejected.append(job_id)
+        raise main.QueueFullError("Job queue is full")
+
+    monkeypatch.setattr(main.job_executor, "submit", reject)
+    monkeypatch.setattr(main, "throughput", main.ThroughputEstimator(initial_seconds=9.0))
+    monkeypatch.setattr(main.job_executor, "_workers", 3)
+
+    response = client.post("/receipts", files=_file_payload())
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "3"
+    # No job is kept for an upload that was turned away
+    assert main.job_store.get(rejected[0]) is None
+
+
+def test_batched_parses_count_their_share_of_the_batch(monkeypatch):
+    def _parse(path):
+        time.sleep(0.2)
+        invoice = sample_invoice()
+        invoice.meta["batch_size"] = 4
+        return invoice
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+    monkeypatch.setattr(main, "throughput", main.ThroughputEstimator(alpha=1.0, initial_seconds=9.0))
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+
+    response = client.get(f"/receipts/{job_id}", params={"wait": 5})
+
+    assert response.status_code == 200
+    assert 0.05 <= main.throughput.seconds_per_job() < 0.1
+    # Clients see how long their parse actually took
+    assert response.json()["meta"]["processing_time_seconds"] >= 0.2
+
+
+def test_uploads_are_stored_off_the_event_loop(monkeypatch):
+    import threading
+
+    threads = {}
+    parse_metadata, save_upload = main._parse_metadata, main.storage_service.save_upload
+
+    def _on_loop(metadata):
+        threads["loop"] = threading.current_thread()
+        return parse_metadata(metadata)
+
+    def _save(*args, **kwargs):
+        threads["save"] = threading.current_thread()
+        return save_upload(*args, **kwargs)
+
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+    monkeypatch.setattr(main, "_parse_metadata", _on_loop)
+    monkeypatch.setattr(main.storage_service, "save_upload", _save)
+
+    assert client.post("/receipts", files=_file_payload()).status_code == 202
+    assert threads["save"] is not threads["loop"]
+
+
+def test_full_queue_rejects_uploads_before_storing_them(monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("rejected uploads must not be ingested")
+
+    monkeypatch.setattr(main.job_executor, "is_full", lambda lane: lane == "interactive")
+    monkeypatch.setattr(main.job_store, "create", unexpected)
+    monkeypatch.setattr(main.storage_service, "save_upload", unexpected)
+
+    response = client.post("/receipts", files=_file_payload())
+
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+
+
+def test_estimated_seconds_follow_queue_and_throughput(monkeypatch):
+    monkeypatch.setattr(main.job_executor, "submit", lambda job_id, **kwargs: None)
+    monkeypatch.setattr(main, "throughput", main.ThroughputEstimator(initial_seconds=2.0))
+    monkeypatch.setattr(main.job_executor, "pending_jobs", lambda lane=None: 5)
+    monkeypatch.setattr(main.job_executor, "busy_workers", lambda: 2)
+    monkeypatch.setattr(main.job_executor, "_workers", 2)
+
+    response = client.post("/receipts", files=_file_payload())
+
+    # Four jobs queued ahead plus two running, drained by two workers, then the job itself
+    assert response.status_code == 202
+    assert response.json()["estimated_seconds"] == 8
+
+
+def test_uploads_are_scheduled_by_tenant(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(main.job_executor, "submit", lambda job_id, **kwargs: submitted.append(kwargs))
+
+    client.post("/receipts", files=_file_payload(), data={"metadata": json.dumps({"tenant": "acme"})})
+    client.post("/receipts", files={"file": ("other.png", b"other-bytes", "image/png")})
+
+    assert submitted == [
+        {"lane": "interactive", "tenant": "acme"},
+        {"lane": "interactive", "tenant": "default"},
+    ]
+
+
+def test_cached_upload_estimates_zero_seconds(monkeypatch):
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+    first = client.post("/receipts", files=_file_payload())
+    _wait_for_status(first.json()["job_id"])
+
+    response = client.post("/receipts", files=_file_payload())
+
+    assert response.json()["estimated_seconds"] == 0
+
+
+def test_small_upload_is_parsed_from_memory(monkeypatch, tmp_path):
+    storage = StorageService(tmp_path, memory_threshold=1024)
+    monkeypatch.setattr(main, "storage_service", storage)
+    received = []
+
+    def _parse(data):
+        received.append(data)
+        return sample_invoice()
+
+    monkeypatch.setattr(main, "parse_bytes", _parse)
+
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert _wait_for_status(job_id)["status"] == "completed"
+
+    assert received == [b"fake-bytes"]
+    assert main.job_store.get(job_id).source_path is None
+    assert list(tmp_path.iterdir()) == []
+    assert storage.memory_bytes() == 0
+
+
+def test_upload_spills_to_disk_when_queue_is_deep(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "storage_service", StorageService(tmp_path, memory_threshold=1024))
+    monkeypatch.setattr(main, "UPLOAD_SPILL_QUEUE_DEPTH", 0)
+    received = []
+
+    def _parse(path):
+        received.append(path)
+        return sample_invoice()
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert _wait_for_status(job_id)["status"] == "completed"
+
+    assert received == [str(main.job_store.get(job_id).source_path)]
+
+
+def test_large_upload_spills_to_disk(tmp_path):
+    from io import BytesIO
+
+    from fastapi import UploadFile
+
+    storage = StorageService(tmp_path, memory_threshold=4096)
+    data = bytes(range(256)) * 64
+    upload = UploadFile(filename="receipt.png", file=BytesIO(data), headers={"content-type": "image/png"})
+
+    saved = storage.save_upload("job", upload)
+
+    assert not saved.in_memory
+    assert saved.size == len(data)
+    assert saved.path.read_bytes() == data
+    assert storage.source("job", saved.path) == str(saved.path)
+
+
+def _wait_for_group(group_id: str) -> dict:
+    payload: dict = {}
+    for _ in range(20):
+        payload = client.get(f"/receipts/groups/{group_id}").json()
+        if payload["status"] == "completed":
+            return payload
+        time.sleep(0.02)
+    return payload
+
+
+def _zip_payload(members: dict) -> bytes:
+    import io
+    import zipfile
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_batch_upload_parses_files_in_one_inference_call(monkeypatch):
+    calls = []
+
+    def _parse_images(sources):
+        calls.append(list(sources))
+        return [sample_invoice() for _ in sources]
+
+    monkeypatch.setattr(main, "parse_images", _parse_images)
+
+    files = [("files", (f"receipt-{i}.png", f"bytes-{i}".encode(), "image/png")) for i in range(3)]
+    response = client.post("/receipts/batch", files=files)
+
+    assert response.status_code == 202
+    body = response.json()
+    assert [job["filename"] for job in body["jobs"]] == ["receipt-0.png", "receipt-1.png", "receipt-2.png"]
+    assert response.headers["Location"] == body["status_url"]
+
+    group = _wait_for_group(body["group_id"])
+    assert group["counts"]["completed"] == 3
+    assert [job["job_id"] for job in group["jobs"]] == [job["job_id"] for job in body["jobs"]]
+    assert group["jobs"][0]["parsed"]["merchant"]["name"] == "Test Merchant"
+    assert len(calls) == 1 and len(calls[0]) == 3
+
+
+def test_batch_upload_reads_zip_archives(monkeypatch):
+    monkeypatch.setattr(main, "parse_images", lambda sources: [sample_invoice() for _ in sources])
+    archive = _zip_payload(
+        {"a.png": b"png-a", "scans/b.jpg": b"jpg-b", "notes.txt": b"not a receipt", "__MACOSX/._a.png": b"fork"}
+    )
+
+    response = client.post("/receipts/batch", files=[("files", ("receipts.zip", archive, "application/zip"))])
+
+    assert response.status_code == 202
+    body = response.json()
+    assert [job["filename"] for job in body["jobs"]] == ["a.png", "scans/b.jpg", "notes.txt"]
+    group = _wait_for_group(body["group_id"])
+    assert group["counts"] == {"queued": 0, "processing": 0, "completed": 2, "failed": 1}
+    assert group["jobs"][2]["error"] == "Invalid file type"
+
+
+def test_group_status_is_paged(monkeypatch):
+    monkeypatch.setattr(main, "parse_images", lambda sources: [sample_invoice() for _ in sources])
+    files = [("files", (f"receipt-{i}.png", f"bytes-{i}".encode(), "image/png")) for i in range(3)]
+    group_id = client.post("/receipts/batch", files=files).json()["group_id"]
+    _wait_for_group(group_id)
+
+    page = client.get(f"/receipts/groups/{group_id}", params={"limit": 2}).json()
+    assert page["total"] == 3
+    assert len(page["jobs"]) == 2
+
+    last = client.get(page["next_url"]).json()
+    assert len(last["jobs"]) == 1
+    assert "next_url" not in last
+
+
+def test_batch_upload_is_capped(monkeypatch):
+    monkeypatch.setattr(main, "parse_images", lambda sources: [sample_invoice() for _ in sources])
+    monkeypatch.setattr(main, "BATCH_UPLOAD_MAX_FILES", 2)
+    files = [("files", (f"receipt-{i}.png", f"bytes-{i}".encode(), "image/png")) for i in range(3)]
+
+    body = client.post("/receipts/batch", files=files).json()
+
+    assert len(body["jobs"]) == 2
+    assert body["skipped"] == 1
+
+
+def test_unknown_group_returns_404():
+    assert client.get("/receipts/groups/missing").status_code == 404
+
+
+def _read_events(url: str) -> list:
+    events = []
+    with client.stream("GET", url) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        name = None
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((name, json.loads(line[len("data: "):])))
+    return events
+
+
+def test_event_stream_pushes_job_transitions(monkeypatch):
+    from threading import Timer
+
+    started, release = Event(), Event()
+
+    def _parse(path):
+        started.set()
+        release.wait(timeout=1)
+        return sample_invoice()
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert started.wait(timeout=1)
+
+    Timer(0.1, release.set).start()
+    events = _read_events(f"/receipts/{job_id}/events")
+
+    assert [payload["status"] for _, payload in events] == ["processing", "completed"]
+    assert all(name == "status" and payload["job_id"] == job_id for name, payload in events)
+
+
+def test_event_stream_of_finished_job_ends_immediately(monkeypatch):
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    _wait_for_status(job_id)
+
+    assert _read_events(f"/receipts/{job_id}/events") == [("status", {"job_id": job_id, "status": "completed"})]
+
+
+def test_event_streams_notice_jobs_finished_by_another_process(monkeypatch):
+    from threading import Timer
+
+    # Another worker sharing the store finishes the jobs; this process is never notified
+    monkeypatch.setattr(main.job_store, "_listeners", [])
+    monkeypatch.setattr(main.job_store, "shared", True)
+    monkeypatch.setattr(main, "EVENT_STREAM_HEARTBEAT_SECONDS", 0.05)
+    job, member = main.job_store.create(), main.job_store.create(group_id="group")
+
+    Timer(0.1, lambda: main.job_store.mark_failed(job.id, error="boom")).start()
+    events = _read_events(f"/receipts/{job.id}/events")
+    Timer(0.1, lambda: main.job_store.mark_failed(member.id, error="boom")).start()
+    group_events = _read_events("/receipts/groups/group/events")
+
+    assert events == [
+        ("status", {"job_id": job.id, "status": "queued"}),
+        ("status", {"job_id": job.id, "status": "failed", "error": "boom"}),
+    ]
+    assert group_events[0][1]["status"] == "processing"
+    assert group_events[1] == ("status", {"job_id": member.id, "status": "failed", "error": "boom"})
+    assert group_events[-1][1]["counts"]["failed"] == 1
+
+
+def test_event_streams_of_a_process_local_store_only_read_it_once(monkeypatch):
+    from threading import Timer
+
+    monkeypatch.setattr(main, "EVENT_STREAM_HEARTBEAT_SECONDS", 0.02)
+    job = main.job_store.create()
+    reads = []
+    get = main.job_store.get
+    monkeypatch.setattr(main.job_store, "get", lambda job_id: reads.append(job_id) or get(job_id))
+
+    Timer(0.15, lambda: main.job_store.mark_failed_many([job.id], error="boom")).start()
+    events = _read_events(f"/receipts/{job.id}/events")
+
+    assert [payload["status"] for _, payload in events] == ["queued", "failed"]
+    assert reads == [job.id]
+
+
+def test_event_stream_of_unknown_job_returns_404():
+    assert client.get("/receipts/missing/events").status_code == 404
+
+
+def test_group_event_stream_reports_progress(monkeypatch):
+    from threading import Timer
+
+    release = Event()
+
+    def _parse_images(sources):
+        release.wait(timeout=1)
+        return [sample_invoice() for _ in sources]
+
+    monkeypatch.setattr(main, "parse_images", _parse_images)
+    files = [("files", (f"receipt-{i}.png", f"bytes-{i}".encode(), "image/png")) for i in range(2)]
+    group_id = client.post("/receipts/batch", files=files).json()["group_id"]
+
+    Timer(0.1, release.set).start()
+    events = _read_events(f"/receipts/groups/{group_id}/events")
+
+    progress = [payload for name, payload in events if name == "progress"]
+    assert progress[0]["total"] == 2
+    assert progress[-1]["status"] == "completed"
+    assert progress[-1]["counts"]["completed"] == 2
+    completed = {payload["job_id"] for name, payload in events if name == "status" and payload["status"] == "completed"}
+    assert len(completed) == 2
+
+
+def test_websocket_pushes_job_status(monkeypatch):
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    _wait_for_status(job_id)
+
+    with client.websocket_connect(f"/receipts/{job_id}/ws") as websocket:
+        assert websocket.receive_json() == {"event": "status", "job_id": job_id, "status": "completed"}
+
+
+def test_long_poll_returns_result_once_job_finishes(monkeypatch):
+    from threading import Timer
+
+    started, release = Event(), Event()
+
+    def _parse(path):
+        started.set()
+        release.wait(timeout=1)
+        return sample_invoice()
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert started.wait(timeout=1)
+
+    Timer(0.1, release.set).start()
+    response = client.get(f"/receipts/{job_id}", params={"wait": 5})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+
+
+def test_long_poll_times_out_with_202(monkeypatch):
+    release = Event()
+    monkeypatch.setattr(main, "parse_image", lambda path: release.wait(timeout=1) and sample_invoice())
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+
+    started = time.perf_counter()
+    response = client.get(f"/receipts/{job_id}", params={"wait": 0.1})
+    elapsed = time.perf_counter() - started
+    release.set()
+
+    assert response.status_code == 202
+    assert response.json()["status"] in {"queued", "processing"}
+    assert 0.1 <= elapsed < 1
+
+
+def test_long_poll_notices_jobs_finished_by_another_process(monkeypatch):
+    from threading import Timer
+
+    # Another worker sharing the store finishes the job; this process is never notified
+    monkeypatch.setattr(main.job_store, "_listeners", [])
+    monkeypatch.setattr(main.job_store, "shared", True)
+    monkeypatch.setattr(main, "LONG_POLL_RECHECK_SECONDS", 0.05)
+    job = main.job_store.create()
+    main.job_store.mark_processing(job.id)
+
+    Timer(0.1, lambda: main.job_store.mark_completed(job.id, invoice=sample_invoice(), duration=0.1)).start()
+    started = time.perf_counter()
+    response = client.get(f"/receipts/{job.id}", params={"wait": 5})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "completed"
+    assert time.perf_counter() - started < 1
+
+
+def test_long_poll_only_rechecks_stores_shared_between_processes(monkeypatch):
+    job = main.job_store.create()
+    reads = []
+    get = main.job_store.get
+    monkeypatch.setattr(main, "LONG_POLL_RECHECK_SECONDS", 0.01)
+    monkeypatch.setattr(main.job_store, "get", lambda job_id: reads.append(job_id) or get(job_id))
+
+    assert client.get(f"/receipts/{job.id}", params={"wait": 0.2}).status_code == 202
+    # Once before waiting and once after; the finished event alone wakes the wait
+    assert len(reads) == 2
+
+
+def test_long_poll_timeout_reports_the_current_status(monkeypatch):
+    from threading import Timer
+
+    monkeypatch.setattr(main.job_store, "_listeners", [])
+    job = main.job_store.create()
+
+    Timer(0.05, lambda: main.job_store.mark_processing(job.id)).start()
+    response = client.get(f"/receipts/{job.id}", params={"wait": 0.3})
+
+    assert response.status_code == 202
+    assert response.json()["status"] == "processing"
+
+
+def test_long_poll_of_unknown_job_returns_404():
+    assert client.get("/receipts/missing", params={"wait": 1}).status_code == 404
+
+
+def test_sync_upload_returns_the_result(monkeypatch):
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+
+    response = client.post("/receipts", params={"sync": "true"}, files=_file_payload())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "completed"
+    assert body["parsed"]["merchant"]["name"] == "Test Merchant"
+    assert response.headers["Location"].endswith(f"/receipts/{body['job_id']}")
+
+
+def test_sync_upload_falls_back_to_202_on_timeout(monkeypatch):
+    release = Event()
+    monkeypatch.setattr(main, "parse_image", lambda path: release.wait(timeout=1) and sample_invoice())
+    monkeypatch.setattr(main, "SYNC_TIMEOUT_SECONDS", 0.05)
+
+    response = client.post("/receipts", params={"sync": "true"}, files=_file_payload())
+    release.set()
+
+    assert response.status_code == 202
+    assert "status_url" in response.json()
+
+
+def test_sync_upload_is_answered_asynchronously_when_saturated(monkeypatch):
+    from threading import BoundedSemaphore
+
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+    monkeypatch.setattr(main, "sync_slots", BoundedSemaphore(1))
+    main.sync_slots.acquire()
+
+    response = client.post("/receipts", params={"sync": "true"}, files=_file_payload())
+
+    assert response.status_code == 202
+
+
+def test_sync_upload_reports_parse_failures(monkeypatch):
+    def _parse(path):
+        raise RuntimeError("unreadable image")
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+
+    response = client.post("/receipts", params={"sync": "true"}, files=_file_payload())
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "unreadable image"
+
+
+def test_status_and_result_expose_partial_results_while_processing(monkeypatch):
+    reached, release = Event(), Event()
+
+    def _before_token(index):
+        # Hold decoding right after the first menu line is separated
+        if index == parser_stubs.STREAMED_CORD_TOKENS.index("<sep/>") + 1:
+            reached.set()
+            release.wait(timeout=2)
+
+    parser_stubs.stub_streaming_pipeline(
+        monkeypatch, tokens=parser_stubs.STREAMED_CORD_TOKENS, before_token=_before_token
+    )
+    monkeypatch.setattr(parser, "_processor", None)
+    monkeypatch.setattr(parser, "_model", None)
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert reached.wait(timeout=2)
+
+    status_payload = client.get(f"/receipts/{job_id}/status").json()
+    result_response = client.get(f"/receipts/{job_id}")
+    release.set()
+
+    assert status_payload["status"] == "processing"
+    assert status_payload["partial"]["merchant"]["name"] == "REWE"
+    assert [item["description"] for item in status_payload["partial"]["items"]] == ["Brot"]
+    assert status_payload["partial"]["meta"] == {"partial": True}
+    assert result_response.status_code == 202
+    assert result_response.json()["partial"]["items"][0]["total_price"] == "2.49"
+    final = _wait_for_status(job_id)
+    assert final["status"] == "completed"
+    assert "partial" not in final
+
+
+def test_completed_result_is_served_from_the_stored_body(monkeypatch):
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    assert _wait_for_status(job_id)["status"] == "completed"
+
+    def _fail(*args, **kwargs):
+        raise AssertionError("result re-encoded on read")
+
+    monkeypatch.setattr(main.serialization, "dumps", _fail)
+    response = client.get(f"/receipts/{job_id}")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == main.job_store.get(job_id).response_json
+    assert response.json()["parsed"]["items"][0]["unit_price"] == "10.00"
+
+
+def test_text_upload_is_parsed_inline():
+    text = "Markt\nBROT 2,49 B\nSUMME 2,49\nBAR 2,49\n"
+
+    response = client.post("/receipts/text", data={"text": text, "metadata": json.dumps({"source": "ocr"})})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "completed"
+    assert body["parsed"]["items"][0]["description"] == "BROT"
+    assert body["parsed"]["totals"]["payment_method"] == "Cash"
+    assert body["meta"]["model_version"] == "text-rules-de-1"
+    assert response.headers["Location"].endswith(f"/receipts/{body['job_id']}")
+    assert client.get(f"/receipts/{body['job_id']}").content == response.content
+    assert main.job_store.get(body["job_id"]).metadata == {"source": "ocr"}
+
+
+def test_text_upload_rejects_empty_and_oversized_text(monkeypatch):
+    assert client.post("/receipts/text", data={"text": "  \n"}).status_code == 400
+
+    monkeypatch.setattr(main, "MAX_FILE_SIZE_BYTES", 10)
+    assert client.post("/receipts/text", data={"text": "BROT 2,49 B\n"}).status_code == 413
+
+
+def test_text_upload_failure_fails_the_job(monkeypatch):
+    def _fail(text):
+        raise ValueError("unreadable")
+
+    created = []
+    create = main.job_store.create
+    monkeypatch.setattr(main, "parse_text", _fail)
+    monkeypatch.setattr(main.job_store, "create", lambda **kwargs: created.append(create(**kwargs)) or created[-1])
+
+    response = client.post("/receipts/text", data={"text": "BROT 2,49 B\n"})
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "unreadable"
+    assert main.job_store.get(created[0].id).status == "failed"
+
+
+def test_result_cache_write_errors_do_not_fail_the_job(monkeypatch):
+    monkeypatch.setattr(main, "parse_image", lambda path: sample_invoice())
+
+    def _disk_full(key, invoice):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(main.result_cache, "put", _disk_full)
+
+    job_id = client.post("/receipts", files=_file_payload()).json()["job_id"]
+
+    assert _wait_for_status(job_id)["status"] == "completed"
+
+
+def test_store_errors_fail_the_job_and_release_its_flight(monkeypatch):
+    release = Event()
+
+    def _parse(path):
+        release.wait(timeout=1)
+        return sample_invoice()
+
+    def _store_down(job_id, **kwargs):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(main, "parse_image", _parse)
+    monkeypatch.setattr(main.job_store, "mark_completed", _store_down)
+
+    leader = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    follower = client.post("/receipts", files=_file_payload()).json()["job_id"]
+    release.set()
+
+    assert _wait_for_status(leader) == {
+        "job_id": leader, "status": "failed", "error": "Storing the result failed: database is locked"
+    }
+    assert _wait_for_status(follower)["status"] == "failed"
+    assert main.in_flight.release(main.result_cache.key(main.job_store.get(leader).content_hash)) == []
@@ -0,0 +1,109 @@
+import json
+import sys
+
+import pytest
+
+from receipt_reader import backends, parser
+from tests import parser_stubs
+from tests.fixtures_data import ALL_FIXTURES
+
+
+@pytest.fixture(autouse=True)
+def _restore_backend():
+    yield
+    parser.set_backend("torch")
+
+
+def test_torch_is_the_default_backend():
+    assert parser.get_backend().name == "torch"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        parser.set_backend("tensorrt")
+
+
+def test_onnx_backend_exports_once_then_reuses_the_export(monkeypatch, tmp_path):
+    fixture = ALL_FIXTURES[0]
+    loads = parser_stubs.stub_onnx_runtime(monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(fixture))
+
+    parser.set_backend("onnx", model_dir=str(tmp_path))
+    assert parser.parse_image("tests/dummy.png").merchant.name == fixture.merchant.name
+
+    # Selecting the backend again drops the loaded model, like a fresh worker would
+    parser.set_backend("onnx", model_dir=str(tmp_path))
+    assert parser.parse_image("tests/dummy.png").merchant.name == fixture.merchant.name
+
+    assert [load["export"] for load in loads] == [True, False]
+    assert loads[1]["model_id"] == str(tmp_path)
+
+
+def test_onnx_backend_stages_its_export_next_to_the_model_dir(monkeypatch, tmp_path):
+    parser_stubs.stub_onnx_runtime(monkeypatch, raw_sequence="")
+    model_dir = tmp_path / "onnx"
+    backend = backends.OnnxBackend(model_dir=str(model_dir))
+    model_dir.mkdir()
+
+    backend.load()
+
+    assert backend.is_exported()
+    # The export was staged next to the model directory and renamed into place
+    assert [path.name for path in tmp_path.iterdir()] == ["onnx"]
+
+
+def test_onnx_backend_requests_greedy_decoding():
+    assert backends.OnnxBackend().generate_kwargs() == {"num_beams": 1, "do_sample": False}
+
+
+def test_onnx_backend_reports_missing_dependencies(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, "optimum", None)
+    monkeypatch.setitem(sys.modules, "optimum.onnxruntime", None)
+
+    parser.set_backend("onnx", model_dir=str(tmp_path))
+    with pytest.raises(ImportError, match="ONNX Runtime dependencies are not installed"):
+        parser.parse_image("tests/dummy.png")
+
+
+def test_custom_backends_can_be_registered(monkeypatch):
+    class _Backend(backends.Backend):
+        name = "custom"
+
+    monkeypatch.setitem(backends._BACKENDS, "custom", _Backend)
+    parser.set_backend("custom")
+
+    assert parser.backend_config() == ("custom", {})
+
+
+def test_torch_backend_maps_weights_exported_once(monkeypatch, tmp_path):
+    fixture = ALL_FIXTURES[0]
+    calls = parser_stubs.stub_mapped_torch(monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(fixture))
+    weights_dir = tmp_path / "weights"
+
+    parser.set_backend("torch", weights_dir=str(weights_dir))
+    assert parser.parse_image("tests/dummy.png").merchant.name == fixture.merchant.name
+    _, model = parser._get_model()
+    parser.set_backend("torch", weights_dir=str(weights_dir))
+    parser._get_model()
+
+    # Parameters are created on the meta device and replaced by the mapped tensors
+    assert calls == [
+        ("from_pretrained", backends.MODEL_NAME),
+        ("init", True),
+        ("load_state_dict", ["decoder.embed.weight", "empty"], True),
+        ("init", True),
+        ("load_state_dict", ["decoder.embed.weight", "empty"], True),
+    ]
+    assert model.tied
+    assert not any(tensor.is_meta for tensor in model.state_dict(keep_vars=True).values())
+    assert sorted(path.name for path in weights_dir.iterdir()) == ["config.json", "model.safetensors"]
+    assert [path.name for path in tmp_path.iterdir()] == ["weights"]
+    assert parser.backend_config() == ("torch", {"weights_dir": str(weights_dir)})
+
+
+def test_torch_backend_rejects_mapped_weights_with_missing_tensors(monkeypatch, tmp_path):
+    parser_stubs.stub_mapped_torch(monkeypatch, raw_sequence="")
+    (tmp_path / "config.json").write_text(json.dumps({"model_type": "vision-encoder-decoder"}))
+    parser_stubs.write_safetensors(tmp_path / "model.safetensors", {"empty": ("I64", [0], b"")})
+
+    with pytest.raises(ValueError, match="decoder.embed.weight"):
+        backends.TorchBackend(weights_dir=str(tmp_path)).load()
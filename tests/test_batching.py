@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from threading import Event
+
+import pytest
+
+from api.batching import BatchingEngine
+from receipt_reader.types import Invoice, Merchant, Totals
+
+
+def _invoice(name: str) -> Invoice:
+    return Invoice(
+        invoice_id=name,
+        merchant=Merchant(name=name, address="unknown"),
+        timestamp="unknown",
+        items=[],
+        totals=Totals(gross=Decimal("0"), payment_method="unknown"),
+        meta={},
+    )
+
+
+def test_concurrent_submissions_share_one_batch():
+    calls = []
+
+    def parse_batch(paths):
+        calls.append(list(paths))
+        return [_invoice(path) for path in paths]
+
+    engine = BatchingEngine(parse_batch, max_batch_size=4, max_wait_ms=200)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(engine.parse, ["a", "b", "c", "d"]))
+    finally:
+        engine.stop()
+
+    assert [invoice.invoice_id for invoice in results] == ["a", "b", "c", "d"]
+    assert len(calls) == 1
+    assert sorted(calls[0]) == ["a", "b", "c", "d"]
+
+
+def test_batch_is_dispatched_after_max_wait():
+    engine = BatchingEngine(lambda paths: [_invoice(p) for p in paths], max_batch_size=8, max_wait_ms=10)
+    try:
+        assert engine.submit("only").result(timeout=1).invoice_id == "only"
+    finally:
+        engine.stop()
+
+
+def test_failing_batch_is_retried_per_image():
+    release = Event()
+
+    def parse_batch(paths):
+        release.wait(timeout=1)
+        if "broken" in paths:
+            raise RuntimeError("cannot decode broken")
+        return [_invoice(path) for path in paths]
+
+    engine = BatchingEngine(parse_batch, max_batch_size=2, max_wait_ms=200)
+    try:
+        good = engine.submit("good")
+        bad = engine.submit("broken")
+        release.set()
+        assert good.result(timeout=1).invoice_id == "good"
+        with pytest.raises(RuntimeError):
+            bad.result(timeout=1)
+    finally:
+        engine.stop()
+
+
+def test_dispatchers_run_batches_side_by_side():
+    running, release = [], Event()
+
+    def parse_batch(paths):
+        running.append(list(paths))
+        release.wait(timeout=1)
+        return [_invoice(path) for path in paths]
+
+    engine = BatchingEngine(parse_batch, max_batch_size=2, max_wait_ms=50, dispatchers=2)
+    try:
+        futures = [engine.submit(path) for path in "abcd"]
+        deadline = time.perf_counter() + 1
+        while len(running) < 2 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        # Both batches are being parsed before either finishes
+        assert sorted(path for batch in running for path in batch) == ["a", "b", "c", "d"]
+        release.set()
+        assert [future.result(timeout=1).invoice_id for future in futures] == ["a", "b", "c", "d"]
+    finally:
+        engine.stop()
+
+
+def test_invalid_batch_size_is_rejected():
+    with pytest.raises(ValueError):
+        BatchingEngine(lambda paths: [], max_batch_size=0, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        BatchingEngine(lambda paths: [], max_batch_size=2, max_wait_ms=1, dispatchers=0)
@@ -0,0 +1,20 @@
+from benchmarks import suite
+
+
+def test_suite_reports_time_per_operation():
+    report = suite.run(["sequence_mapping", "job_store_memory"], repeat=1)
+
+    assert set(report["results"]) == {"sequence_mapping", "job_store_memory"}
+    for result in report["results"].values():
+        assert result["median_us"] > 0
+        assert result["ops_per_second"] > 0
+
+
+def test_compare_flags_regressions_over_the_threshold():
+    baseline = {"results": {"fast": {"median_us": 100.0}, "slow": {"median_us": 100.0}}}
+    current = {"results": {"fast": {"median_us": 110.0}, "slow": {"median_us": 150.0}, "new": {"median_us": 1.0}}}
+
+    rows = suite.compare(current, baseline, threshold=0.2)
+
+    assert [(row["benchmark"], row["regressed"]) for row in rows] == [("fast", False), ("slow", True)]
+    assert rows[1]["change"] == 0.5
@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from api.cache import ResultCache, SingleFlight
+from receipt_reader.types import Invoice, Item, Merchant, Totals
+
+
+def _invoice(invoice_id: str) -> Invoice:
+    return Invoice(
+        invoice_id=invoice_id,
+        merchant=Merchant(name="REWE", address="61169 Friedberg"),
+        timestamp="2025-08-07T20:45:12",
+        items=[
+            Item(description="ja! Flips", qty=Decimal("1"), unit_price=Decimal("0.99"), total_price=Decimal("0.99"), vat_rate=7)
+        ],
+        totals=Totals(gross=Decimal("0.99"), payment_method="Girocard"),
+        meta={},
+    )
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(model_version="v1", max_entries=2)
+    cache.put("a", _invoice("a"))
+    cache.put("b", _invoice("b"))
+    assert cache.get("a") is not None  # "b" is now the least recently used entry
+    cache.put("c", _invoice("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a").invoice_id == "a"
+    assert cache.get("c").invoice_id == "c"
+
+
+def test_keys_include_model_version():
+    assert ResultCache(model_version="v1", max_entries=1).key("abc") != ResultCache(
+        model_version="v2", max_entries=1
+    ).key("abc")
+
+
+def test_disk_tier_survives_restart_and_keeps_decimals(tmp_path):
+    cache = ResultCache(model_version="v1", max_entries=0, disk_dir=tmp_path, disk_max_bytes=1024 * 1024)
+    cache.put("a", _invoice("a"))
+
+    restored = ResultCache(model_version="v1", max_entries=1, disk_dir=tmp_path, disk_max_bytes=1024 * 1024).get("a")
+
+    assert restored is not None
+    assert restored.items[0].unit_price == Decimal("0.99")
+    assert restored.totals.gross == Decimal("0.99")
+
+
+def test_disk_tier_evicts_by_size(tmp_path):
+    probe = ResultCache(model_version="v1", max_entries=0, disk_dir=tmp_path / "probe", disk_max_bytes=1024 * 1024)
+    probe.put("a", _invoice("a"))
+    entry_size = (tmp_path / "probe" / "a.json").stat().st_size
+
+    cache = ResultCache(model_version="v1", max_entries=0, disk_dir=tmp_path / "cache", disk_max_bytes=entry_size * 2)
+    for key in ("a", "b", "c"):
+        cache.put(key, _invoice(key))
+
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+
+
+def test_single_flight_elects_one_leader():
+    flights = SingleFlight()
+    assert flights.join("key", "leader")
+    assert not flights.join("key", "follower-1")
+    assert not flights.join("key", "follower-2")
+
+    assert flights.release("key") == ["follower-1", "follower-2"]
+    assert flights.join("key", "next-leader")
@@ -0,0 +1,94 @@
+from decimal import Decimal
+
+import pytest
+
+from receipt_reader.cord import CordDecoder, as_list, decode, parse_amount
+
+SEQUENCE = (
+    "<s_menu><s_nm>Brot</s_nm><s_cnt>1</s_cnt><s_price>2,49</s_price><sep/>"
+    "<s_nm>H-Milch 3,5%</s_nm><s_cnt>2x</s_cnt><s_price>2,38</s_price></s_menu>"
+    "<s_total><s_total_price>4,87</s_total_price><s_cashprice>5,00</s_cashprice></s_total>"
+)
+
+
+def test_decode_builds_menu_and_total():
+    assert decode(SEQUENCE) == {
+        "menu": [
+            {"nm": "Brot", "cnt": "1", "price": "2,49"},
+            {"nm": "H-Milch 3,5%", "cnt": "2x", "price": "2,38"},
+        ],
+        "total": {"total_price": "4,87", "cashprice": "5,00"},
+    }
+
+
+def test_token_by_token_feeding_matches_whole_sequence():
+    decoder = CordDecoder()
+    for char in SEQUENCE:
+        decoder.feed(char)
+
+    assert decoder.complete
+    assert decoder.result() == decode(SEQUENCE)
+
+
+def test_truncated_output_keeps_closed_values_only():
+    truncated = SEQUENCE[: SEQUENCE.index("<s_price>2,38") + len("<s_price>2,3")]
+
+    assert decode(truncated) == {"menu": [{"nm": "Brot", "cnt": "1", "price": "2,49"}, {"nm": "H-Milch 3,5%", "cnt": "2x"}]}
+
+
+def test_mismatched_and_stray_closing_tags_are_tolerated():
+    assert decode("<s_menu><s_nm>Brot</s_menu></s_total><s_total><s_total_price>1</s_total_price>") == {
+        "menu": {"nm": "Brot"},
+        "total": {"total_price": "1"},
+    }
+
+
+def test_repeated_key_without_separator_starts_a_new_entry():
+    result = decode("<s_menu><s_nm>A</s_nm><s_price>1</s_price><s_nm>B</s_nm><s_price>2</s_price></s_menu>")
+
+    assert result["menu"] == [{"nm": "A", "price": "1"}, {"nm": "B", "price": "2"}]
+
+
+def test_feed_reports_closed_values_and_word_boundaries():
+    decoder = CordDecoder()
+
+    assert decoder.feed("<s_menu>") is False
+    assert decoder.feed("<s_nm>") is False
+    assert decoder.feed("▁Bio") is False
+    assert decoder.feed("▁Tofu") is False
+    assert decoder.feed("</s_nm>") is True
+    assert decoder.result() == {"menu": {"nm": "Bio Tofu"}}
+    assert not decoder.complete
+
+
+def test_nested_closing_tag_does_not_complete():
+    decoder = CordDecoder(closing_tags=("</s_total>",))
+    decoder.feed("<s_menu><s_total>1</s_total>")
+
+    assert not decoder.complete
+    decoder.feed("</s_menu><s_total><s_total_price>1</s_total_price></s_total>")
+    assert decoder.complete
+
+
+def test_as_list_wraps_single_groups():
+    assert as_list(None) == []
+    assert as_list({"nm": "A"}) == [{"nm": "A"}]
+    assert as_list([1, 2]) == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("2,49", Decimal("2.49")),
+        ("1.234,50 EUR", Decimal("1234.50")),
+        ("1,234.50", Decimal("1234.50")),
+        ("2x", Decimal("2")),
+        ("0.534 kg", Decimal("0.534")),
+        ("10.000.000", Decimal("10000000")),
+        ("-0,25", Decimal("-0.25")),
+        ("Pfand", None),
+        (None, None),
+    ],
+)
+def test_parse_amount(text, expected):
+    assert parse_amount(text) == expected
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from receipt_reader.decoding import (
+    STOP_EOS,
+    STOP_MAX_NEW_TOKENS,
+    STOP_REPETITION,
+    STOP_STRUCTURE_CLOSED,
+    DecodeMonitor,
+    DecodeSettings,
+    _RowMonitor,
+)
+
+
+def _feed(row: _RowMonitor, tokens):
+    reason = None
+    for token in tokens:
+        reason = row.feed(hash(token) % 10_000, token)
+        if reason:
+            break
+    return reason
+
+
+def test_cord_output_stops_when_total_is_closed():
+    row = _RowMonitor(DecodeSettings())
+    tokens = ["<s_menu>", "<s_nm>", "▁Brot", "</s_nm>", "</s_menu>", "<s_total>", "<s_total_price>", "2,49", "</s_total_price>", "</s_total>", "<s_extra>"]
+
+    assert _feed(row, tokens) == STOP_STRUCTURE_CLOSED
+    assert row.tokens == 10
+
+
+def test_json_output_stops_when_the_root_object_is_closed():
+    row = _RowMonitor(DecodeSettings())
+
+    assert _feed(row, ['{"', "menu", '":', "▁[{", '"nm":', '"Brot"', "}]", "}", "▁trailing"]) == STOP_STRUCTURE_CLOSED
+    assert row.tokens == 8
+
+
+def test_repetition_loop_is_detected():
+    row = _RowMonitor(DecodeSettings(repetition_max_ngram=4, repetition_min_repeats=4, repetition_min_span=8))
+    loop = ["<s_nm>", "▁Pfand", "</s_nm>"] * 5
+
+    assert _feed(row, loop) == STOP_REPETITION
+    assert row.tokens == 12
+
+
+def test_short_repeats_are_not_a_loop():
+    row = _RowMonitor(DecodeSettings(repetition_min_span=16))
+
+    assert _feed(row, ["0"] * 15) is None
+
+
+def test_stats_report_budget_exhaustion_and_eos():
+    tokenizer = SimpleNamespace(eos_token_id=1, pad_token_id=0)
+    monitor = DecodeMonitor(tokenizer, 2, DecodeSettings(max_new_tokens=3))
+    for token in ("<s_menu>", "<s_nm>", "▁Brot"):
+        monitor._rows[0].feed(hash(token) % 10_000, token)
+
+    stats = monitor.stats()
+
+    assert (stats[0].tokens, stats[0].stop_reason) == (3, STOP_MAX_NEW_TOKENS)
+    assert (stats[1].tokens, stats[1].stop_reason) == (0, STOP_EOS)
+
+
+def test_stats_compare_against_the_clamped_budget():
+    tokenizer = SimpleNamespace(eos_token_id=1, pad_token_id=0)
+    monitor = DecodeMonitor(tokenizer, 1, DecodeSettings(max_new_tokens=512), max_new_tokens=2)
+    for token in ("<s_menu>", "<s_nm>"):
+        monitor._rows[0].feed(hash(token) % 10_000, token)
+
+    assert monitor.stats()[0].stop_reason == STOP_MAX_NEW_TOKENS
+
+
+def test_nested_closing_tag_does_not_stop_cord_output():
+    row = _RowMonitor(DecodeSettings())
+    tokens = ["<s_menu>", "<s_total>", "1", "</s_total>", "<s_nm>", "▁Brot", "</s_nm>", "</s_menu>"]
+
+    assert _feed(row, tokens) is None
@@ -0,0 +1,41 @@
+import pytest
+
+from api.estimates import ThroughputEstimator
+
+
+def test_uses_initial_estimate_until_jobs_finish():
+    estimator = ThroughputEstimator(initial_seconds=4.0)
+
+    assert estimator.seconds_per_job() == 4.0
+    assert estimator.estimate(0, workers=2) == 4
+
+
+def test_moving_average_follows_parse_times():
+    estimator = ThroughputEstimator(alpha=0.5, initial_seconds=4.0)
+
+    estimator.observe(2.0)
+    assert estimator.seconds_per_job() == 3.0
+    estimator.observe(2.0)
+    assert estimator.seconds_per_job() == 2.5
+
+
+def test_instant_jobs_are_ignored():
+    estimator = ThroughputEstimator(initial_seconds=4.0)
+
+    estimator.observe(0.0)
+
+    assert estimator.seconds_per_job() == 4.0
+
+
+def test_estimate_grows_with_queue_position_and_shrinks_with_workers():
+    estimator = ThroughputEstimator(initial_seconds=2.0)
+
+    assert estimator.estimate(4, workers=1) == 10
+    assert estimator.estimate(4, workers=4) == 4
+    assert estimator.retry_after(workers=4) == 1
+    assert estimator.retry_after(workers=1) == 2
+
+
+def test_invalid_alpha_is_rejected():
+    with pytest.raises(ValueError):
+        ThroughputEstimator(alpha=0)
@@ -0,0 +1,98 @@
+import asyncio
+from threading import Thread
+
+import pytest
+
+from api.events import JobEventBroker
+from api.jobs import JobEvent
+
+
+def _publish_from_thread(broker, *events):
+    thread = Thread(target=lambda: [broker.publish(event) for event in events])
+    thread.start()
+    thread.join()
+
+
+async def _drain(subscription, count):
+    return [await asyncio.wait_for(subscription.queue.get(), timeout=1) for _ in range(count)]
+
+
+def test_job_subscribers_receive_events_published_from_other_threads():
+    async def scenario():
+        broker = JobEventBroker()
+        subscription = broker.subscribe(job_id="a")
+        _publish_from_thread(broker, JobEvent("a", "processing"), JobEvent("b", "processing"), JobEvent("a", "completed"))
+        received = await _drain(subscription, 2)
+        broker.unsubscribe(subscription)
+        return received, subscription.queue.qsize()
+
+    received, leftover = asyncio.run(scenario())
+
+    assert [event.status for event in received] == ["processing", "completed"]
+    assert leftover == 0
+
+
+def test_group_subscribers_follow_members_until_they_finish():
+    async def scenario():
+        broker = JobEventBroker()
+        subscription = broker.subscribe(group_id="g1")
+        _publish_from_thread(
+            broker,
+            JobEvent("a", "queued", group_id="g1"),
+            JobEvent("b", "queued"),
+            JobEvent("a", "failed", error="boom"),
+            # Membership is dropped once the job finished
+            JobEvent("a", "processing"),
+        )
+        await asyncio.sleep(0.05)
+        return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+    received = asyncio.run(scenario())
+
+    assert [(event.job_id, event.status) for event in received] == [("a", "queued"), ("a", "failed")]
+
+
+def test_unsubscribed_streams_receive_nothing():
+    async def scenario():
+        broker = JobEventBroker()
+        subscription = broker.subscribe(job_id="a")
+        broker.unsubscribe(subscription)
+        broker.unsubscribe(subscription)
+        broker.publish(JobEvent("a", "completed"))
+        await asyncio.sleep(0.01)
+        return subscription.queue.qsize()
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_subscribe_requires_exactly_one_target():
+    async def scenario():
+        JobEventBroker().subscribe()
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
+
+
+def test_finish_watchers_share_one_event_per_job():
+    async def scenario():
+        broker = JobEventBroker()
+        async with broker.watch_finished("a") as first, broker.watch_finished("a") as second:
+            assert first is second
+            _publish_from_thread(broker, JobEvent("a", "processing"))
+            await asyncio.sleep(0.01)
+            assert not first.is_set()
+            _publish_from_thread(broker, JobEvent("a", "completed"))
+            await asyncio.wait_for(first.wait(), timeout=1)
+        return broker._finish_watches
+
+    assert asyncio.run(scenario()) == {}
+
+
+def test_finish_watch_is_dropped_when_the_last_waiter_leaves():
+    async def scenario():
+        broker = JobEventBroker()
+        async with broker.watch_finished("a"):
+            pass
+        return broker._finish_watches
+
+    assert asyncio.run(scenario()) == {}
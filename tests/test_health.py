@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api import main
+from api.health import ModelReadiness
+from receipt_reader import parser
+from tests import parser_stubs
+
+client = TestClient(main.app)
+
+
+@pytest.fixture(autouse=True)
+def _reset_parser_cache():
+    yield
+    parser._processor = None
+    parser._model = None
+
+
+def test_ready_without_eager_load(monkeypatch):
+    monkeypatch.setattr(main, "readiness", ModelReadiness(required=False))
+
+    response = client.get("/health/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+def test_not_ready_until_model_is_warmed(monkeypatch):
+    readiness = ModelReadiness(required=True)
+    monkeypatch.setattr(main, "readiness", readiness)
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence="{}")
+
+    assert client.get("/health/ready").status_code == 503
+
+    readiness.warm_up(main.job_executor)
+
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "model_loaded": True, "model_warmed": True}
+    assert "receipt_parser_model_warmup_seconds" in client.get("/metrics").text
+
+
+def test_failed_warm_up_keeps_service_unready(monkeypatch):
+    readiness = ModelReadiness(required=True)
+    monkeypatch.setattr(main, "readiness", readiness)
+    monkeypatch.setattr(parser, "_get_model", lambda: (_ for _ in ()).throw(ImportError("no torch")))
+
+    readiness.warm_up(main.job_executor)
+
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["error"] == "no torch"
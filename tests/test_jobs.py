@@ -0,0 +1,262 @@
+import json
+from decimal import Decimal
+from pathlib import Path
+from time import sleep, time
+
+import pytest
+
+from api.jobs import InMemoryJobStore, JobReaper, RetentionPolicy, SqliteJobStore, create_job_store
+from receipt_reader.types import Invoice, Item, Merchant, Totals
+
+
+def _invoice() -> Invoice:
+    return Invoice(
+        invoice_id="rewe",
+        merchant=Merchant(name="REWE", address="61169 Friedberg"),
+        timestamp="2025-08-07T20:45:12",
+        items=[
+            Item(description="Pfanner Eistee", qty=Decimal("1"), unit_price=Decimal("1.99"), total_price=Decimal("1.99"), vat_rate=19)
+        ],
+        totals=Totals(gross=Decimal("1.99"), payment_method="Girocard"),
+        meta={},
+    )
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return create_job_store(request.param, path=tmp_path / "jobs.sqlite3")
+
+
+def test_job_lifecycle(store):
+    job = store.create(metadata={"source": "mobile"})
+    store.attach_upload(job.id, source_path=Path("/tmp/receipt.png"), content_hash="abc")
+    assert store.get(job.id).status == "queued"
+
+    assert store.mark_processing(job.id).status == "processing"
+    completed = store.mark_completed(job.id, invoice=_invoice(), duration=1.5)
+
+    assert completed.status == "completed"
+    assert completed.result.totals.gross == Decimal("1.99")
+    assert completed.duration_seconds == 1.5
+    assert completed.metadata == {"source": "mobile"}
+    assert completed.source_path == Path("/tmp/receipt.png")
+    assert completed.content_hash == "abc"
+
+
+def test_batched_transitions(store):
+    jobs = [store.create() for _ in range(3)]
+    ids = [job.id for job in jobs]
+
+    store.mark_processing_many(ids)
+    store.mark_completed_many(ids[:2], invoice=_invoice(), duration=0.5)
+    store.mark_failed_many(ids[2:], error="boom")
+
+    assert store.count_by_status() == {"queued": 0, "processing": 0, "completed": 2, "failed": 1}
+    assert store.get(ids[2]).error == "boom"
+
+
+def test_unknown_job(store):
+    assert store.get("missing") is None
+    with pytest.raises(KeyError):
+        store.mark_processing("missing")
+
+
+def test_reset_clears_jobs(store):
+    job = store.create()
+    store.reset()
+    assert store.get(job.id) is None
+
+
+def test_delete_removes_one_job(store):
+    kept, deleted = store.create(), store.create(group_id="group")
+    store.delete(deleted.id)
+    store.delete("missing")
+
+    assert store.get(deleted.id) is None
+    assert store.get(kept.id) is not None
+    assert store.count_by_status(group_id="group")["queued"] == 0
+
+
+def test_groups_are_counted_and_paged_in_creation_order(store):
+    members = [store.create(group_id="g1") for _ in range(5)]
+    store.create(group_id="g2")
+    store.create()
+    store.mark_processing(members[0].id)
+    store.mark_failed(members[0].id, error="boom")
+
+    assert store.count_by_status(group_id="g1") == {"queued": 4, "processing": 0, "completed": 0, "failed": 1}
+    assert [job.id for job in store.list_group("g1", offset=1, limit=3)] == [job.id for job in members[1:4]]
+    assert store.list_group("g1", offset=0, limit=1)[0].group_id == "g1"
+    assert store.list_group("missing") == []
+
+
+def test_listeners_receive_every_transition(store):
+    events = []
+    store.add_listener(events.append)
+
+    first, second = store.create(group_id="g1"), store.create()
+    store.mark_processing_many([first.id, second.id])
+    store.mark_completed(first.id, invoice=_invoice(), duration=0.1)
+    store.mark_failed(second.id, error="boom")
+
+    assert [(event.job_id, event.status) for event in events] == [
+        (first.id, "queued"),
+        (second.id, "queued"),
+        (first.id, "processing"),
+        (second.id, "processing"),
+        (first.id, "completed"),
+        (second.id, "failed"),
+    ]
+    assert events[0].group_id == "g1"
+    assert events[-1].error == "boom"
+
+
+def test_sqlite_store_adds_group_column_to_old_databases(tmp_path):
+    import sqlite3
+
+    path = tmp_path / "jobs.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, result TEXT, error TEXT, metadata TEXT, "
+        "duration_seconds REAL, source_path TEXT, content_hash TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs (id, status, created_at, updated_at) VALUES ('old', 'queued', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    store = SqliteJobStore(path)
+    job = store.create(group_id="g1")
+
+    assert store.get("old").group_id is None
+    assert [member.id for member in store.list_group("g1")] == [job.id]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = tmp_path / "jobs.sqlite3"
+    writer, reader = SqliteJobStore(path), SqliteJobStore(path)
+
+    job = writer.create()
+    writer.mark_processing(job.id)
+    writer.mark_completed(job.id, invoice=_invoice(), duration=0.1)
+
+    assert reader.get(job.id).status == "completed"
+    assert reader.get(job.id).result.merchant.name == "REWE"
+
+
+def test_factory_defaults_and_errors(tmp_path):
+    assert isinstance(create_job_store("memory"), InMemoryJobStore)
+    with pytest.raises(ValueError):
+        create_job_store("sqlite")
+    with pytest.raises(ValueError):
+        create_job_store("redis", path=tmp_path / "jobs")
+
+
+def test_completed_results_are_stored_compactly(store):
+    job = store.create()
+    store.mark_processing(job.id)
+    store.mark_completed(job.id, invoice=_invoice(), duration=0.1)
+
+    stored = store.get(job.id)
+    assert isinstance(stored.result_json, bytes)
+    assert b'"gross": "1.99"' in stored.result_json
+    assert stored.result.totals.gross == Decimal("1.99")
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_purge_drops_jobs_after_ttl(backend, tmp_path):
+    store = create_job_store(backend, path=tmp_path / "jobs.sqlite3", retention=RetentionPolicy(ttl_seconds=60))
+    finished, running = store.create(), store.create()
+    store.mark_processing_many([finished.id, running.id])
+    store.mark_failed(finished.id, error="boom")
+
+    assert store.purge(now=time() + 30) == 0
+    assert store.purge(now=time() + 120) == 1
+    assert store.get(finished.id) is None
+    assert store.get(running.id) is not None
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_purge_evicts_oldest_finished_jobs_over_count(backend, tmp_path):
+    store = create_job_store(backend, path=tmp_path / "jobs.sqlite3", retention=RetentionPolicy(max_jobs=2))
+    ids = [store.create().id for _ in range(3)]
+    store.mark_processing_many(ids[:2])
+    store.mark_completed_many(ids[:2], invoice=_invoice(), duration=0.1)
+
+    store.purge()
+
+    assert store.stats().jobs == 2
+    assert store.get(ids[0]) is None
+    assert store.get(ids[2]) is not None
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_purge_evicts_jobs_in_the_order_they_finished(backend, tmp_path):
+    store = create_job_store(backend, path=tmp_path / "jobs.sqlite3", retention=RetentionPolicy(max_jobs=3))
+    ids = [store.create().id for _ in range(4)]
+    store.mark_processing_many(ids)
+    store.mark_failed(ids[2], error="boom")
+    store.mark_completed(ids[0], invoice=_invoice(), duration=0.1)
+
+    store.purge()
+
+    assert store.get(ids[2]) is None
+    assert all(store.get(job_id) is not None for job_id in (ids[0], ids[1], ids[3]))
+
+
+def test_memory_store_enforces_byte_limit_on_create():
+    store = InMemoryJobStore(RetentionPolicy(max_bytes=2500))
+    first = store.create()
+    store.mark_processing(first.id)
+    store.mark_completed(first.id, invoice=_invoice(), duration=0.1)
+    assert store.stats().estimated_bytes == first.estimated_size()
+
+    for _ in range(3):
+        store.create()
+
+    assert store.get(first.id) is None
+    assert store.stats().estimated_bytes <= 2500
+
+
+def test_reaper_purges_in_background():
+    store = InMemoryJobStore(RetentionPolicy(ttl_seconds=0.01))
+    job = store.create()
+    store.mark_processing(job.id)
+    store.mark_failed(job.id, error="boom")
+
+    reaper = JobReaper(store, interval_seconds=0.01)
+    reaper.start()
+    try:
+        for _ in range(100):
+            if store.get(job.id) is None:
+                break
+            sleep(0.01)
+    finally:
+        reaper.stop()
+
+    assert store.get(job.id) is None
+
+
+def test_partial_result_is_kept_only_while_processing(store):
+    job = store.create()
+    store.set_partial(job.id, _invoice())
+    assert store.get(job.id).partial_json is None
+
+    store.mark_processing(job.id)
+    store.set_partial(job.id, _invoice())
+    assert b'"REWE"' in store.get(job.id).partial_json
+
+    store.mark_completed(job.id, invoice=_invoice(), duration=1.0)
+    store.set_partial(job.id, _invoice())
+    assert store.get(job.id).partial_json is None
+
+
+def test_completed_jobs_store_their_response_body(store):
+    first, second = store.create(), store.create()
+    store.mark_processing_many([first.id, second.id])
+    store.mark_completed_many([first.id, second.id], invoice=_invoice(), duration=1.25)
+
+    bodies = [json.loads(store.get(job.id).response_json) for job in (first, second)]
+
+    assert [body["job_id"] for body in bodies] == [first.id, second.id]
+    assert bodies[0]["parsed"]["totals"]["gross"] == "1.99"
+    assert bodies[0]["meta"]["processing_time_seconds"] == 1.25
@@ -0,0 +1,41 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks import loadtest, simulated
+from receipt_reader import parser
+
+
+def test_latency_distribution_parses_specs():
+    rng = random.Random(0)
+
+    assert simulated.latency_distribution("fixed:0.5", rng)() == 0.5
+    assert 1.0 <= simulated.latency_distribution("uniform:1,2", rng)() <= 2.0
+    assert simulated.latency_distribution("lognormal:1.5,0.4", rng)() > 0
+    with pytest.raises(ValueError):
+        simulated.latency_distribution("gamma:1,2")
+    with pytest.raises(ValueError):
+        simulated.latency_distribution("fixed:fast")
+
+
+def test_percentiles_use_nearest_rank():
+    result = loadtest.percentiles([float(value) for value in range(1, 101)])
+
+    assert result == {"p50": 50.0, "p90": 90.0, "p95": 95.0, "p99": 99.0, "max": 100.0}
+    assert loadtest.percentiles([])["p50"] is None
+
+
+def test_in_process_load_test_reports_completed_jobs(monkeypatch):
+    monkeypatch.setattr(parser, "load_image", lambda source, target: SimpleNamespace(size=(10, 20)))
+    backend = parser.backend_config()
+    options = loadtest.LoadTestOptions(clients=2, duration=0.3, poll_interval=0.02, result_timeout=5)
+
+    report = loadtest.run_in_process(options, latency="fixed:0.01")
+
+    assert report["completed"] > 0
+    assert report["failed_jobs"] == report["timed_out_jobs"] == 0
+    assert report["error_rate"] == 0.0
+    assert report["status_counts"]["202"] >= report["completed"]
+    assert report["latency_seconds"]["p50"] > 0
+    assert parser.backend_config() == backend
@@ -1,9 +1,13 @@
 from decimal import Decimal
 import json
+import threading
+import time
+from types import SimpleNamespace
 
 import pytest
 
 from receipt_reader import parser
+from receipt_reader.stages import STAGES
 from tests.fixtures_data import ALL_FIXTURES
 from tests import parser_stubs
 
@@ -36,6 +40,35 @@ def test_parse_image_with_stubbed_pipeline_matches_fixture(monkeypatch, fixture)
         assert abs(parsed_item.total_price - expected_item.total_price) <= Decimal("0.02")
 
 
+@pytest.mark.parametrize("fixture", ALL_FIXTURES)
+def test_parse_image_reads_cord_tag_sequences(monkeypatch, fixture):
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence=parser_stubs.invoice_to_cord_sequence(fixture))
+
+    parsed = parser.parse_image("tests/dummy.png")
+
+    assert parsed.invoice_id != "unknown"
+    assert parsed.merchant.name == fixture.merchant.name
+    assert parsed.totals.gross == fixture.totals.gross
+    assert [item.description for item in parsed.items] == [item.description for item in fixture.items]
+    assert parsed.sum_items() == fixture.sum_items()
+
+
+def test_parse_image_keeps_the_closed_part_of_truncated_cord_output(monkeypatch):
+    sequence = (
+        "<s_menu><s_nm>Brot</s_nm><s_cnt>2</s_cnt><s_unitprice>1,25</s_unitprice><s_price>2,50</s_price><sep/>"
+        "<s_nm>Milch</s_nm><s_cnt>1</s_cnt><s_pri"
+    )
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence=sequence)
+
+    parsed = parser.parse_image("tests/dummy.png")
+
+    assert parsed.merchant.name == "unknown"
+    assert [(item.description, item.qty, item.unit_price, item.total_price) for item in parsed.items] == [
+        ("Brot", Decimal("2"), Decimal("1.25"), Decimal("2.50"))
+    ]
+    assert parsed.totals.gross == Decimal("0")
+
+
 def test_parse_image_returns_unknown_invoice_on_invalid_json(monkeypatch):
     parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence="{not-json")
 
@@ -67,3 +100,99 @@ def test_parse_image_skips_items_with_missing_values(monkeypatch):
 
     assert parsed.merchant.name == "Demo Shop"
     assert parsed.items == []
+
+
+def test_parse_images_decodes_one_invoice_per_image(monkeypatch):
+    fixture = ALL_FIXTURES[0]
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(fixture))
+
+    parsed = parser.parse_images(["tests/a.png", "tests/b.png", "tests/c.png"])
+
+    assert len(parsed) == 3
+    assert all(invoice.merchant.name == fixture.merchant.name for invoice in parsed)
+    assert len({invoice.invoice_id for invoice in parsed}) == 3
+
+
+def test_parse_image_records_decoding_stats(monkeypatch):
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(ALL_FIXTURES[0]))
+
+    parsed = parser.parse_image("tests/dummy.png")
+
+    assert parsed.meta["decoding"] == {"tokens": 0, "stop_reason": "eos"}
+
+
+def test_parse_image_records_stage_timings(monkeypatch):
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(ALL_FIXTURES[0]))
+
+    parsed = parser.parse_image("tests/dummy.png")
+
+    assert set(parsed.meta["timings"]) == set(STAGES)
+    assert all(seconds >= 0 for seconds in parsed.meta["timings"].values())
+
+
+def test_parse_bytes_reads_the_image_from_memory(monkeypatch):
+    fixture = ALL_FIXTURES[0]
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence=parser_stubs.invoice_to_sequence(fixture))
+    opened = []
+
+    def _open(source):
+        opened.append(source.read())
+        return SimpleNamespace(convert=lambda _: None)
+
+    monkeypatch.setattr("PIL.Image.open", _open)
+
+    parsed = parser.parse_bytes(b"image-bytes")
+
+    assert opened == [b"image-bytes"]
+    assert parsed.merchant.name == fixture.merchant.name
+
+
+def test_parse_image_stream_yields_partial_invoices_while_decoding(monkeypatch):
+    parser_stubs.stub_streaming_pipeline(monkeypatch, tokens=parser_stubs.STREAMED_CORD_TOKENS)
+
+    updates = list(parser.parse_image_stream("tests/dummy.png"))
+
+    partials, final = updates[:-1], updates[-1]
+    assert all(update.meta["partial"] for update in partials)
+    assert [(update.merchant.name, len(update.items), update.totals.gross) for update in partials] == [
+        ("REWE", 0, Decimal("0")),
+        ("REWE", 1, Decimal("0")),
+        ("REWE", 2, Decimal("0")),
+        ("REWE", 2, Decimal("3.68")),
+    ]
+    assert "partial" not in final.meta
+    assert [item.description for item in final.items] == ["Brot", "Milch"]
+    assert final.meta["decoding"] == {"tokens": 23, "stop_reason": "structure_closed"}
+
+
+def test_closing_the_stream_stops_decoding(monkeypatch):
+    produced = []
+    closed = threading.Event()
+
+    def _before_token(index):
+        produced.append(index)
+        if index == 4:
+            # Hold generation after the merchant partial until the consumer has closed the stream
+            closed.wait(timeout=2)
+
+    parser_stubs.stub_streaming_pipeline(monkeypatch, tokens=parser_stubs.STREAMED_CORD_TOKENS, before_token=_before_token)
+    monitors = []
+    original = parser.DecodeMonitor
+
+    def _monitor(*args, **kwargs):
+        monitors.append(original(*args, **kwargs))
+        return monitors[-1]
+
+    monkeypatch.setattr(parser, "DecodeMonitor", _monitor)
+
+    stream = parser.parse_image_stream("tests/dummy.png")
+    first = next(stream)
+    stream.close()
+    closed.set()
+
+    assert first.merchant.name == "REWE"
+    deadline = time.monotonic() + 2
+    while monitors[0].stats()[0].stop_reason != "cancelled" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert monitors[0].stats()[0].stop_reason == "cancelled"
+    assert len(produced) < len(parser_stubs.STREAMED_CORD_TOKENS)
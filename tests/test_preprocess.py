@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from receipt_reader import preprocess
+
+DONUT_CANVAS = (1920, 2560)
+
+
+class _FakeImage:
+    def __init__(self, size, format="JPEG"):
+        self.size = size
+        self.format = format
+        self.calls = []
+
+    def draft(self, mode, size):
+        self.calls.append(("draft", size))
+        # libjpeg scales by 1/2, 1/4 or 1/8 while staying at least the requested size
+        for scale in (8, 4, 2):
+            if self.size[0] // scale >= size[0] and self.size[1] // scale >= size[1]:
+                self.size = (self.size[0] // scale, self.size[1] // scale)
+                break
+
+    def convert(self, mode):
+        self.calls.append(("convert", mode))
+        return self
+
+    def resize(self, size, resample=None, reducing_gap=None):
+        self.calls.append(("resize", size))
+        self.size = size
+        return self
+
+
+@pytest.fixture
+def open_image(monkeypatch):
+    def _open(image):
+        monkeypatch.setattr(preprocess.Image, "open", lambda path: image)
+        monkeypatch.setattr(
+            preprocess.Image, "Resampling", SimpleNamespace(BILINEAR="bilinear"), raising=False
+        )
+        return preprocess.load_image("receipt.jpg", (DONUT_CANVAS, True))
+
+    return _open
+
+
+def test_fitted_size_matches_the_processor_resize():
+    # Shortest edge to 1920, then shrunk into the canvas
+    assert preprocess.fitted_size((3024, 4032), DONUT_CANVAS) == (1920, 2560)
+    assert preprocess.fitted_size((1000, 4000), DONUT_CANVAS) == (640, 2560)
+    assert preprocess.fitted_size((864, 1536), DONUT_CANVAS) == (1440, 2560)
+
+
+def test_fitted_size_follows_long_axis_alignment():
+    assert preprocess.fitted_size((4032, 3024), DONUT_CANVAS) == (1920, 1440)
+    assert preprocess.fitted_size((4032, 3024), DONUT_CANVAS, align_long_axis=True) == (2560, 1920)
+
+
+def test_processor_target_reads_the_image_processor_settings():
+    processor = SimpleNamespace(
+        image_processor=SimpleNamespace(size={"height": 2560, "width": 1920}, do_align_long_axis=True)
+    )
+
+    assert preprocess.processor_target(processor) == (DONUT_CANVAS, True)
+    assert preprocess.processor_target(SimpleNamespace()) is None
+
+
+def test_large_jpegs_are_drafted_then_resized_once(open_image):
+    image = open_image(_FakeImage((6000, 8000)))
+
+    assert image.size == (1920, 2560)
+    assert image.calls == [("draft", (1920, 2560)), ("convert", "RGB"), ("resize", (1920, 2560))]
+
+
+def test_draft_to_the_exact_size_skips_the_resize(open_image):
+    image = open_image(_FakeImage((7680, 10240)))
+
+    assert image.calls == [("draft", (1920, 2560)), ("convert", "RGB")]
+
+
+def test_other_formats_are_resized_without_draft(open_image):
+    image = open_image(_FakeImage((3024, 4032), format="PNG"))
+
+    assert image.calls == [("convert", "RGB"), ("resize", (1920, 2560))]
+
+
+def test_small_images_are_left_for_the_processor(open_image):
+    image = open_image(_FakeImage((864, 1536), format="PNG"))
+
+    assert image.size == (864, 1536)
+    assert image.calls == [("convert", "RGB")]
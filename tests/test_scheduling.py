@@ -0,0 +1,104 @@
+from queue import Full
+from threading import Thread
+
+import pytest
+
+from api.scheduling import LANE_BATCH, LANE_INTERACTIVE, FairQueue, parse_tenant_weights
+
+
+def _queue(size=10, weights=None):
+    return FairQueue({LANE_INTERACTIVE: size, LANE_BATCH: size}, weights)
+
+
+def _drain(queue, count):
+    return [queue.get() for _ in range(count)]
+
+
+def test_interactive_lane_is_served_before_batch():
+    queue = _queue()
+    queue.put("batch-1", lane=LANE_BATCH)
+    queue.put("batch-2", lane=LANE_BATCH)
+    queue.put("interactive", lane=LANE_INTERACTIVE)
+
+    assert _drain(queue, 3) == ["interactive", "batch-1", "batch-2"]
+
+
+def test_tenants_share_a_lane_fairly():
+    queue = _queue()
+    for index in range(6):
+        queue.put(f"bulk-{index}", lane=LANE_BATCH, tenant="bulk")
+    queue.put("small-0", lane=LANE_BATCH, tenant="small")
+    queue.put("small-1", lane=LANE_BATCH, tenant="small")
+
+    order = _drain(queue, 8)
+
+    # The small tenant does not wait behind the bulk tenant's backlog
+    assert order[:4] == ["bulk-0", "small-0", "bulk-1", "small-1"]
+    assert order[4:] == ["bulk-2", "bulk-3", "bulk-4", "bulk-5"]
+
+
+def test_weights_and_costs_set_each_tenants_share():
+    queue = _queue(weights={"gold": 2})
+    for index in range(4):
+        queue.put(f"gold-{index}", lane=LANE_BATCH, tenant="gold")
+        queue.put(f"free-{index}", lane=LANE_BATCH, tenant="free")
+
+    # A weight of 2 gets twice the share of the default weight of 1
+    assert _drain(queue, 6) == ["gold-0", "free-0", "gold-1", "gold-2", "free-1", "gold-3"]
+
+    queue = _queue()
+    queue.put("chunk", lane=LANE_BATCH, tenant="bulk", cost=4)
+    queue.put("single", lane=LANE_BATCH, tenant="small")
+    assert _drain(queue, 2) == ["single", "chunk"]
+
+
+def test_idle_tenant_does_not_bank_credit():
+    queue = _queue()
+    for index in range(3):
+        queue.put(f"busy-{index}", lane=LANE_BATCH, tenant="busy")
+    assert _drain(queue, 3) == ["busy-0", "busy-1", "busy-2"]
+
+    queue.put("busy-3", lane=LANE_BATCH, tenant="busy")
+    queue.put("idle-0", lane=LANE_BATCH, tenant="idle")
+    queue.put("idle-1", lane=LANE_BATCH, tenant="idle")
+
+    assert _drain(queue, 3) == ["busy-3", "idle-0", "idle-1"]
+
+
+def test_each_lane_is_bounded_separately():
+    queue = _queue(size=1)
+    queue.put("batch", lane=LANE_BATCH)
+
+    with pytest.raises(Full):
+        queue.put("batch-2", lane=LANE_BATCH)
+    queue.put("interactive", lane=LANE_INTERACTIVE)
+    assert queue.full(LANE_INTERACTIVE)
+    assert queue.qsize() == 2
+
+
+def test_put_waits_for_space():
+    queue = _queue(size=1)
+    queue.put("first", lane=LANE_BATCH)
+    taker = Thread(target=queue.get)
+    taker.start()
+
+    queue.put("second", lane=LANE_BATCH, timeout=1)
+    taker.join()
+
+    assert queue.get() == "second"
+
+
+def test_close_returns_none_once_drained():
+    queue = _queue()
+    queue.put("last", lane=LANE_INTERACTIVE)
+    queue.close()
+
+    assert queue.get() == "last"
+    assert queue.get() is None
+
+
+def test_parse_tenant_weights():
+    assert parse_tenant_weights("acme=2, globex=0.5,") == {"acme": 2.0, "globex": 0.5}
+    assert parse_tenant_weights("") == {}
+    with pytest.raises(ValueError):
+        parse_tenant_weights("acme=0")
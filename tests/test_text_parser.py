@@ -0,0 +1,134 @@
+from decimal import Decimal
+
+from receipt_reader import parser
+from receipt_reader.text import TEXT_PARSER_VERSION
+
+REWE_TEXT = """
+REWE
+Fauerbacher Str. 9
+61169 Friedberg
+Tel.: 06031 / 123456
+                                  EUR
+PFANNER EISTEE                   1,99 B
+BANANE
+  3 Stk x 1,19                   3,57 B
+PFAND 0,25                       0,50 A
+  2 Stk x 0,25
+6x BIO EIER                      2,94 B
+LEERGUT                         -0,25 A
+--------------------------------------
+SUMME                   EUR      8,75
+Geg. BAR                EUR     20,00
+Rückgeld BAR            EUR     11,25
+
+Steuer  %      Netto     Steuer    Brutto
+A= 19,0%       0,21       0,04      0,25
+B=  7,0%       7,94       0,56      8,50
+15.03.2021 14:03 Bon-Nr.:1234
+"""
+
+TOOM_TEXT = """
+toom Baumarkt GmbH
+Straßheimerstraße 27
+61169 Friedberg
+Tel. 06031/735130
+4002718777225 Winkelleiste Kie 13.99 19
+4051281464537 Solarleuchte
+3.000 STK a 2.99 8.97 19
+4011261097018 CARNIVOREN SONNE 5.99 7
+Summe EUR 28.95
+VISA Debit kontaktlos
+05.08.2025 17:09:07
+"""
+
+
+def test_parses_rewe_style_receipt():
+    invoice = parser.parse_text(REWE_TEXT)
+
+    assert invoice.merchant.name == "REWE"
+    assert invoice.merchant.address == "Fauerbacher Str. 9, 61169 Friedberg"
+    assert invoice.merchant.phone == "06031 / 123456"
+    assert invoice.timestamp == "2021-03-15T14:03:00"
+    assert [item.description for item in invoice.items] == ["PFANNER EISTEE", "BANANE", "PFAND 0,25", "BIO EIER"]
+    banana, deposit, eggs = invoice.items[1:]
+    assert (banana.qty, banana.unit_price, banana.total_price) == (Decimal("3"), Decimal("1.19"), Decimal("3.57"))
+    assert (deposit.qty, deposit.unit_price) == (Decimal("2"), Decimal("0.25"))
+    assert (eggs.qty, eggs.unit_price) == (Decimal("6"), Decimal("0.49"))
+    assert invoice.totals.gross == Decimal("8.75")
+    assert invoice.totals.payment_method == "Cash (20.00 given, 11.25 change)"
+    assert invoice.meta == {"model_version": TEXT_PARSER_VERSION}
+
+
+def test_vat_table_on_the_receipt_overrides_the_default_classes():
+    with_table = parser.parse_text(REWE_TEXT)
+    without_table = parser.parse_text(REWE_TEXT.split("Steuer  %")[0])
+
+    assert [item.vat_rate for item in with_table.items] == [7, 7, 19, 7]
+    assert [item.vat_rate for item in without_table.items] == [19, 19, 7, 19]
+
+
+def test_parses_numeric_vat_and_ean_lines():
+    invoice = parser.parse_text(TOOM_TEXT)
+
+    assert invoice.merchant.address == "Straßheimerstraße 27, 61169 Friedberg"
+    assert invoice.merchant.phone == "06031/735130"
+    assert invoice.timestamp == "2025-08-05T17:09:07"
+    assert [(item.sku_or_ean, item.qty, item.total_price, item.vat_rate) for item in invoice.items] == [
+        ("4002718777225", Decimal("1"), Decimal("13.99"), 19),
+        ("4051281464537", Decimal("3"), Decimal("8.97"), 19),
+        ("4011261097018", Decimal("1"), Decimal("5.99"), 7),
+    ]
+    assert invoice.items[1].description == "Solarleuchte"
+    assert invoice.totals.gross == Decimal("28.95")
+    assert invoice.totals.payment_method == "Visa"
+
+
+def test_quantity_line_before_its_item():
+    invoice = parser.parse_text("Markt\n2 x 1,19\nMILCH 2,38 A\nZu zahlen 2,38\nEC-Karte 2,38\n")
+
+    assert [(item.description, item.qty, item.unit_price) for item in invoice.items] == [
+        ("MILCH", Decimal("2"), Decimal("1.19"))
+    ]
+    assert invoice.totals.payment_method == "Girocard"
+
+
+def test_missing_total_and_header_fall_back():
+    invoice = parser.parse_text("BROT 2,49 B\nKAESE 3,10 A\n")
+
+    assert invoice.merchant.name == "unknown"
+    assert invoice.timestamp == "unknown"
+    assert invoice.totals.gross == Decimal("5.59")
+    assert invoice.totals.payment_method == "unknown"
+
+
+def test_zero_count_prefix_is_ignored():
+    invoice = parser.parse_text("0 x Cola 1,99\n0x Cola 1,99 B\n")
+
+    assert [(item.qty, item.total_price) for item in invoice.items] == [
+        (Decimal("1"), Decimal("1.99")),
+        (Decimal("1"), Decimal("1.99")),
+    ]
+
+
+def test_weighed_first_item_takes_its_description_from_the_line_before():
+    invoice = parser.parse_text(
+        "REWE\n61169 Friedberg\nBananen\n0,534 kg x 1,69 EUR/kg = 0,90 A\nMILCH 1,19 A\n"
+        "SUMME 2,09\nGEGEBEN BAR 5,00\nRUECKGELD 2,91\n"
+    )
+
+    assert invoice.merchant.address == "61169 Friedberg"
+    assert [(item.description, item.total_price) for item in invoice.items] == [
+        ("Bananen", Decimal("0.90")),
+        ("MILCH", Decimal("1.19")),
+    ]
+    assert invoice.items[0].unit_price == Decimal("1.69")
+    assert sum(item.total_price for item in invoice.items) == invoice.totals.gross
+    assert invoice.totals.payment_method == "Cash (5.00 given, 2.91 change)"
+
+
+def test_deposit_returns_are_not_items():
+    invoice = parser.parse_text("REWE\nPfand\n2 x -0,25 -0,50\nMILCH 1,19 A\nLeergut\n1 x -0,25 -0,25\nSUMME 0,44\n")
+
+    assert invoice.merchant.name == "REWE"
+    assert [(item.description, item.total_price) for item in invoice.items] == [("MILCH", Decimal("1.19"))]
+    assert invoice.totals.gross == Decimal("0.44")
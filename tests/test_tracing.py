@@ -0,0 +1,81 @@
+from opentelemetry import trace
+
+from api import tracing
+from receipt_reader.parser import MODEL_VERSION
+from receipt_reader.types import Invoice, Merchant, Totals
+
+
+class _FakeSpan:
+    def __init__(self, name="parse_receipts", start_time=None, attributes=None):
+        self.name = name
+        self.start_time = start_time
+        self.end_time = None
+        self.attributes = dict(attributes or {})
+
+    def is_recording(self):
+        return True
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, end_time=None):
+        self.end_time = end_time
+
+
+class _FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, context=None, start_time=None, attributes=None):
+        span = _FakeSpan(name, start_time, attributes)
+        self.spans.append(span)
+        return span
+
+
+def _invoice(timings, tokens=10, image_size=(960, 1280)):
+    return Invoice(
+        invoice_id="test",
+        merchant=Merchant(name="Shop", address="Street"),
+        timestamp="unknown",
+        items=[],
+        totals=Totals(gross="0", payment_method="unknown"),
+        meta={"timings": timings, "decoding": {"tokens": tokens, "stop_reason": "eos"}, "image_size": list(image_size)},
+    )
+
+
+def test_stage_spans_are_laid_out_back_to_back(monkeypatch):
+    tracer = _FakeTracer()
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    parent = _FakeSpan()
+
+    tracing.record_stages(parent, [_invoice({"image_load": 0.1, "generate": 0.5, "validation": 0.001})])
+
+    assert [span.name for span in tracer.spans] == ["parse.image_load", "parse.generate", "parse.validation"]
+    assert [span.end_time - span.start_time for span in tracer.spans] == [100_000_000, 500_000_000, 1_000_000]
+    assert tracer.spans[0].end_time == tracer.spans[1].start_time
+    generate = tracer.spans[1]
+    assert generate.attributes["receipt.decoded_tokens"] == 10
+    assert generate.attributes["receipt.model_version"] == MODEL_VERSION
+    assert generate.attributes["receipt.image.width"] == 960
+    assert parent.attributes["receipt.decoded_tokens"] == 10
+
+
+def test_batch_stages_are_counted_once(monkeypatch):
+    tracer = _FakeTracer()
+    monkeypatch.setattr(tracing, "tracer", tracer)
+    timings = {"generate": 0.5, "json_mapping": 0.01}
+
+    tracing.record_stages(_FakeSpan(), [_invoice(timings), _invoice(timings)])
+
+    durations = {span.name: span.end_time - span.start_time for span in tracer.spans}
+    assert durations == {"parse.generate": 500_000_000, "parse.json_mapping": 20_000_000}
+    assert "receipt.image.width" not in tracer.spans[0].attributes
+
+
+def test_nothing_is_recorded_without_a_tracer_provider(monkeypatch):
+    tracer = _FakeTracer()
+    monkeypatch.setattr(tracing, "tracer", tracer)
+
+    tracing.record_stages(trace.INVALID_SPAN, [_invoice({"generate": 0.5})])
+
+    assert tracer.spans == []
@@ -0,0 +1,52 @@
+import struct
+
+import pytest
+
+from receipt_reader import weights
+from tests import parser_stubs
+
+
+def test_read_index_lists_tensors_after_the_header(tmp_path):
+    path = tmp_path / "model.safetensors"
+    parser_stubs.write_safetensors(
+        path,
+        {"a.weight": ("F32", [2], struct.pack("<2f", 1.0, 2.0)), "b.bias": ("BF16", [1], b"\x80\x3f")},
+    )
+    data = path.read_bytes()
+
+    base, entries = weights.read_index(data)
+
+    assert [(entry.name, entry.dtype, entry.shape) for entry in entries] == [
+        ("a.weight", "float32", [2]),
+        ("b.bias", "bfloat16", [1]),
+    ]
+    assert data[base + entries[0].start:base + entries[0].end] == struct.pack("<2f", 1.0, 2.0)
+    assert data[base + entries[1].start:base + entries[1].end] == b"\x80\x3f"
+
+
+def test_read_index_rejects_unknown_dtypes(tmp_path):
+    path = tmp_path / "model.safetensors"
+    parser_stubs.write_safetensors(path, {"a": ("F8_E4M3", [1], b"\x00")})
+
+    with pytest.raises(ValueError, match="F8_E4M3"):
+        weights.read_index(path.read_bytes())
+
+
+def test_load_mapped_views_every_file(monkeypatch, tmp_path):
+    parser_stubs.stub_mapped_torch(monkeypatch, raw_sequence="{}")
+    parser_stubs.write_safetensors(
+        tmp_path / "model-00001.safetensors", {"encoder.weight": ("F32", [1, 2], struct.pack("<2f", 1.0, 2.0))}
+    )
+    parser_stubs.write_safetensors(tmp_path / "model-00002.safetensors", {"decoder.ids": ("I64", [0], b"")})
+
+    tensors = weights.load_mapped(tmp_path)
+
+    assert sorted(tensors) == ["decoder.ids", "encoder.weight"]
+    assert tensors["encoder.weight"].data == struct.pack("<2f", 1.0, 2.0)
+    assert tensors["encoder.weight"].shape == [1, 2]
+    assert tensors["decoder.ids"].shape == [0]
+
+
+def test_load_mapped_requires_weights(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        weights.load_mapped(tmp_path)
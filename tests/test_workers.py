@@ -0,0 +1,244 @@
+import os
+import time
+from queue import SimpleQueue
+from threading import Event
+
+import pytest
+from opentelemetry import context as otel_context
+
+from api.workers import JobExecutor, QueueFullError, _init_worker, unique_memory_bytes
+from receipt_reader import parser
+from tests import parser_stubs
+
+
+def test_jobs_run_on_dedicated_worker_threads():
+    handled = []
+    done = Event()
+
+    def handler(job_id):
+        handled.append(job_id)
+        if len(handled) == 3:
+            done.set()
+
+    executor = JobExecutor(handler, lambda path: None, workers=2, queue_size=8)
+    try:
+        for job_id in ("a", "b", "c"):
+            executor.submit(job_id)
+        assert done.wait(timeout=1)
+    finally:
+        executor.shutdown()
+
+    assert sorted(handled) == ["a", "b", "c"]
+
+
+def test_extra_threads_handle_jobs_side_by_side():
+    started, release = [], Event()
+
+    def handler(job_id):
+        started.append(job_id)
+        release.wait(timeout=1)
+
+    executor = JobExecutor(handler, lambda path: None, workers=1, queue_size=8, threads=4)
+    try:
+        for job_id in "abcd":
+            executor.submit(job_id)
+        deadline = time.perf_counter() + 1
+        while len(started) < 4 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        assert sorted(started) == ["a", "b", "c", "d"]
+        assert (executor.workers, executor.threads, executor.busy_workers()) == (1, 4, 4)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_submit_raises_when_queue_is_full():
+    release = Event()
+    started = Event()
+
+    def handler(job_id):
+        started.set()
+        release.wait(timeout=1)
+
+    executor = JobExecutor(handler, lambda path: None, workers=1, queue_size=1)
+    try:
+        executor.submit("running")
+        assert started.wait(timeout=1)
+        executor.submit("queued")
+        assert executor.is_full()
+        with pytest.raises(QueueFullError):
+            executor.submit("rejected")
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_counts_pending_jobs_and_busy_workers():
+    release = Event()
+    started = Event()
+
+    def handler(job_id):
+        started.set()
+        release.wait(timeout=1)
+
+    executor = JobExecutor(handler, lambda path: None, workers=1, queue_size=1, chunk_handler=lambda job_ids: None)
+    try:
+        executor.submit("running")
+        assert started.wait(timeout=1)
+        executor.submit_many(["a", "b", "c"])
+        with pytest.raises(QueueFullError):
+            executor.submit_many(["d", "e"])
+        assert executor.busy_workers() == 1
+        assert executor.running_jobs() == 1
+        assert executor.pending_jobs() == 3
+    finally:
+        release.set()
+        executor.shutdown()
+
+    assert executor.busy_workers() == 0
+    assert executor.running_jobs() == 0
+    assert executor.pending_jobs() == 0
+
+
+def test_interactive_jobs_overtake_queued_batch_chunks():
+    release = Event()
+    started = Event()
+    order = []
+
+    def handler(job_id):
+        order.append(job_id)
+        started.set()
+        release.wait(timeout=1)
+
+    executor = JobExecutor(handler, lambda path: None, workers=1, queue_size=4, chunk_handler=lambda ids: order.extend(ids))
+    try:
+        executor.submit("running")
+        assert started.wait(timeout=1)
+        executor.submit_many(["batch-a", "batch-b"])
+        executor.submit("interactive")
+        assert executor.pending_jobs() == 3
+        assert executor.pending_jobs("batch") == 2
+        release.set()
+    finally:
+        executor.shutdown()
+
+    assert order == ["running", "interactive", "batch-a", "batch-b"]
+
+
+def test_jobs_run_in_the_submitters_trace_context():
+    seen = []
+    done = Event()
+
+    def handler(job_id):
+        seen.append(otel_context.get_value("request"))
+        done.set()
+
+    executor = JobExecutor(handler, lambda path: None, workers=1, queue_size=1)
+    token = otel_context.attach(otel_context.set_value("request", "upload-1"))
+    try:
+        executor.submit("a")
+    finally:
+        otel_context.detach(token)
+    try:
+        assert done.wait(timeout=1)
+    finally:
+        executor.shutdown()
+
+    assert seen == ["upload-1"]
+
+
+def test_chunks_go_to_the_chunk_handler():
+    chunks = []
+    done = Event()
+
+    def chunk_handler(job_ids):
+        chunks.append(job_ids)
+        done.set()
+
+    executor = JobExecutor(lambda job_id: None, lambda path: None, workers=1, queue_size=1, chunk_handler=chunk_handler)
+    try:
+        executor.submit_many(["a", "b", "c"])
+        assert done.wait(timeout=1)
+    finally:
+        executor.shutdown()
+
+    assert chunks == [["a", "b", "c"]]
+
+
+def test_submit_many_waits_for_queue_space():
+    release = Event()
+    started = Event()
+
+    def handler(job_id):
+        started.set()
+        release.wait(timeout=1)
+
+    executor = JobExecutor(handler, lambda path: None, workers=1, queue_size=1, chunk_handler=handler)
+    try:
+        executor.submit_many(["running"])
+        assert started.wait(timeout=1)
+        executor.submit_many(["queued"])
+        with pytest.raises(QueueFullError):
+            executor.submit_many(["a", "b"], timeout=0.05)
+        release.set()
+        executor.submit_many(["a", "b"], timeout=1)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_thread_mode_parses_in_process():
+    executor = JobExecutor(lambda job_id: None, lambda path: f"parsed:{path}", workers=1, queue_size=1)
+    assert executor.parse("receipt.png") == "parsed:receipt.png"
+
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        JobExecutor(lambda job_id: None, lambda path: None, workers=0, queue_size=1)
+    with pytest.raises(ValueError):
+        JobExecutor(lambda job_id: None, lambda path: None, workers=1, queue_size=1, mode="fiber")
+
+
+def test_thread_mode_reports_this_process_as_the_worker():
+    executor = JobExecutor(lambda job_id: None, lambda path: None, workers=2, queue_size=1)
+    executor.start()
+    try:
+        assert executor.worker_pids() == [os.getpid()]
+    finally:
+        executor.shutdown()
+
+
+def test_pool_processes_warm_up_before_reporting_their_start(monkeypatch):
+    parser_stubs.stub_donut_pipeline(monkeypatch, raw_sequence="{}")
+    started = SimpleQueue()
+    try:
+        _init_worker("torch", {}, parser.get_decode_settings(), started)
+    finally:
+        parser.set_backend("torch")
+
+    report = started.get_nowait()
+    assert report.pid == os.getpid()
+    assert report.error is None
+    assert all(seconds >= 0 for seconds in report.timings)
+
+
+def test_pool_processes_report_failed_warm_ups(monkeypatch):
+    def _fail():
+        raise ImportError("no torch")
+
+    monkeypatch.setattr(parser, "_get_model", _fail)
+    started = SimpleQueue()
+    try:
+        _init_worker("torch", {}, parser.get_decode_settings(), started)
+    finally:
+        parser.set_backend("torch")
+
+    assert started.get_nowait()[1:] == (None, "no torch")
+
+
+@pytest.mark.skipif(unique_memory_bytes(os.getpid()) is None, reason="needs /proc/<pid>/smaps_rollup")
+def test_unique_memory_counts_private_pages():
+    before = unique_memory_bytes(os.getpid())
+    block = bytearray(64 * 1024 * 1024)
+
+    assert unique_memory_bytes(os.getpid()) >= before + len(block) // 2